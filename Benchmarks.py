@@ -0,0 +1,515 @@
+# -*- coding: utf-8 -*-
+"""
+@author: cariefrantz
+
+Benchmarks the question bank generator and Pretty4Canvas on synthetic
+workloads.
+
+Synthetic inputs are generated at each size (number of questions, or number
+of pages for Pretty4Canvas): rock model tables for the 3D rock bank types,
+question tables for GenericMC, Respondus tables for build_MC_bank, and
+Canvas-pasted HTML documents with headers, text and tables for Pretty4Canvas.
+Each case runs in its own Python process, so that its peak memory use
+(resident set size) can be measured on its own.
+
+Results are saved to a JSON file. If a baseline results file is given, each
+case is compared with it, and any case that is slower or uses more memory
+than the baseline by more than the tolerance is flagged as a regression.
+Baselines depend on the machine, so none is kept in the repository: save
+one on the machine first with --save-baseline.
+
+Example in command line:
+    python Benchmarks.py
+    python Benchmarks.py --sizes 1000 10000 --save-baseline
+    python Benchmarks.py --sizes 1000 10000 --baseline Benchmarks_baseline.json
+    python Benchmarks.py --cases build_MC_bank format_GenericMC --sizes 100000
+
+"""
+
+####################
+# IMPORTS
+####################
+import os
+import csv
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+
+
+####################
+# VARIABLES
+####################
+default_sizes = [1000, 10000, 100000, 1000000]
+default_pages = [100, 300]
+default_tolerance = 0.2
+
+# Synthetic input table used by each bank type. LogScaleIntensity makes the
+#   same number of questions whatever the size, so the template engine it
+#   uses is benchmarked instead (see case_generateTemplateBank).
+bank_inputs = {
+    'RockOrMineral3D'           : 'rocks',
+    'RockCycleClassification3D' : 'rocks',
+    'IgneousClassification3D'   : 'rocks',
+    'GenericMC'                 : 'generic'
+    }
+
+rock_types = [
+    'mineral', 'sedimentary', 'extrusive igneous', 'intrusive igneous',
+    'metamorphic']
+compositions = ['felsic', 'intermediate', 'mafic']
+difficulties = ['easy', 'moderate', 'hard']
+n_models = 500      # Distinct 3D models, so embeds repeat like real banks
+magnitude_answers = [
+    '3 x', '10 x', '30 x', '100 x', '1,000 x', '10,000 x', '33,000 x',
+    '100,000 x', '1,000,000 x']
+
+
+####################
+# SYNTHETIC INPUTS
+####################
+def embedCode(i):
+    '''
+    Returns the embed code for synthetic 3D model number i.
+    '''
+    return ('<iframe title="Rock ' + str(i % n_models) + '" frameborder="0" '
+            'allowfullscreen width="640" height="480" '
+            'src="https://sketchfab.com/models/' + format(i % n_models, '032x')
+            + '/embed"></iframe>')
+
+
+def makeRockTable(n, fpath):
+    '''
+    Saves a synthetic rock and mineral 3D model list with n rows, with the
+    columns used by the 3D rock bank types.
+    '''
+    with open(fpath, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            ['Type', 'Felsic-Mafic', 'Difficulty', 'Embed', 'Description'])
+        for i in range(n):
+            rock_type = rock_types[i % len(rock_types)]
+            writer.writerow([
+                rock_type, compositions[i % len(compositions)],
+                difficulties[(i // len(rock_types)) % len(difficulties)],
+                embedCode(i),
+                'Sample ' + str(i) + ' is a ' + rock_type + ' with visible '
+                'grains and a distinctive texture.'])
+
+
+def makeGenericTable(n, fpath):
+    '''
+    Saves a synthetic multiple choice question table with n rows, with the
+    columns used by format_GenericMC.
+    '''
+    with open(fpath, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            ['Question group', 'Difficulty', 'Points', 'Question',
+             'Choice 1', 'Choice 2', 'Choice 3', 'Choice 4', 'Choice 5',
+             'Correct Answer', 'General'])
+        for i in range(n):
+            writer.writerow([
+                'Synthetic questions', difficulties[i % len(difficulties)], 1,
+                'Question ' + str(i) + ': which of these is answer '
+                + str(i % 4 + 1) + '?',
+                'first ' + str(i), 'second ' + str(i), 'third ' + str(i),
+                'fourth ' + str(i), '', i % 4 + 1,
+                'Feedback for question ' + str(i) + '.'])
+
+
+def makeRespondusTable(n):
+    '''
+    Returns a synthetic Respondus table (QuestionStore) with n questions,
+    with embeds in the wording, five choices and feedback.
+    '''
+    from GenerateQuestionBanks import newRespondusTable
+    Respondus_table = newRespondusTable()
+    Respondus_table['Type'] = ['MC'] * n
+    Respondus_table['Title/ID'] = ['Synthetic bank'] * n
+    Respondus_table['Points'] = [1] * n
+    Respondus_table['Question Wording'] = [
+        '[HTML]<p>What kind of rock is this?</p>' + embedCode(i) + '[/HTML]'
+        for i in range(n)]
+    for c, rock_type in enumerate(rock_types):
+        Respondus_table['Choice ' + str(c + 1)] = rock_type
+    Respondus_table['Correct Answer'] = [i % 5 + 1 for i in range(n)]
+    Respondus_table['General Feedback'] = [
+        'Sample ' + str(i) + ' feedback.' for i in range(n)]
+    return Respondus_table
+
+
+def makeCanvasHTML(pages, fpath, tables = 2, rows = 8, paragraphs = 6):
+    '''
+    Saves a synthetic Canvas-pasted HTML document with the given number of
+    pages (top-level headers), each with subheaders, paragraphs with spans,
+    and tables with a header row, a subheader row and multi-line cells.
+    '''
+    with open(fpath, 'w', encoding='utf-8') as f:
+        for p in range(pages):
+            f.write('<h1>P' + str(p) + '. Page ' + str(p) + '</h1>\n')
+            for s in range(paragraphs):
+                if s % 3 == 0:
+                    f.write('<h2>Section ' + str(s) + '</h2>\n')
+                f.write('<p><span style="font-weight: 400;">Paragraph '
+                        + str(s) + ' of page ' + str(p) + ', with some '
+                        'text to format.</span></p>\n')
+            for t in range(tables):
+                f.write('<table>\n<tbody>\n')
+                for r in range(rows):
+                    f.write('<tr>\n')
+                    if r == 2:
+                        f.write('<td colspan="3">\n<p>Subheader ' + str(r)
+                                + '</p>\n</td>\n')
+                    elif r == 0:
+                        # Header row, in bold as Google Docs marks it
+                        for c in range(3):
+                            f.write('<td>\n<p><span style="font-weight: 700;">'
+                                    'Heading ' + str(c) + '</span></p>\n'
+                                    '</td>\n')
+                    else:
+                        for c in range(3):
+                            f.write('<td>\n<p>Cell ' + str(r) + ',' + str(c)
+                                    + '</p>\n<p>Second line</p>\n</td>\n')
+                    f.write('</tr>\n')
+                f.write('</tbody>\n</table>\n')
+
+
+def getInput(kind, n, workdir):
+    '''
+    Returns the path to a synthetic input file of a kind ('rocks', 'generic'
+    or 'html') and size, generating it if it isn't in workdir yet.
+    '''
+    makers = {'rocks' : (makeRockTable, '.csv'),
+              'generic' : (makeGenericTable, '.csv'),
+              'html' : (makeCanvasHTML, '.html')}
+    maker, ext = makers[kind]
+    fpath = os.path.join(workdir, kind + '_' + str(n) + ext)
+    if not os.path.exists(fpath):
+        maker(n, fpath)
+    return fpath
+
+
+def clearInputCache(fpath):
+    '''
+    Removes the parsed-table cache of an input table (see
+    GenerateQuestionBanks.readInputCSV), if it has one.
+    '''
+    dirPath, name = os.path.split(os.path.abspath(fpath))
+    for cache_path in ['.' + name + '.cache', '.' + name + '.cache.json']:
+        try:
+            os.remove(os.path.join(dirPath, cache_path))
+        except FileNotFoundError:
+            pass
+
+
+####################
+# BENCHMARK CASES
+####################
+# Each case is run as case(size, workdir) and returns the number of items
+#   (questions or pages) it processed and the seconds it took. Synthetic
+#   inputs are made, and slow imports done, before the case is timed.
+
+def case_build_MC_bank(n, workdir):
+    from RespondusText import build_MC_bank
+    Respondus_table = makeRespondusTable(n)
+    start = time.perf_counter()
+    build_MC_bank(Respondus_table, os.path.join(workdir, 'bank.txt'))
+    return n, time.perf_counter() - start
+
+
+def case_genRandomAnswerSet(n, workdir):
+    import numpy as np
+    from GenerateQuestionBanks import genRandomAnswerSet
+    rng = np.random.default_rng(0)
+    correct = [magnitude_answers[i % len(magnitude_answers)]
+               for i in range(n)]
+    start = time.perf_counter()
+    for answer in correct:
+        genRandomAnswerSet(magnitude_answers, answer, 5, rng)
+    return n, time.perf_counter() - start
+
+
+def case_genRandomAnswerSets(n, workdir):
+    import numpy as np
+    from GenerateQuestionBanks import genRandomAnswerSets
+    rng = np.random.default_rng(0)
+    correct = [magnitude_answers[i % len(magnitude_answers)]
+               for i in range(n)]
+    start = time.perf_counter()
+    genRandomAnswerSets(magnitude_answers, correct, 5, rng)
+    return n, time.perf_counter() - start
+
+
+def caseFormatBank(bank_type):
+    '''
+    Returns the benchmark case for a question bank type's format_ script.
+    '''
+    def case(n, workdir):
+        import pandas
+        import RunSettings
+        import GenerateQuestionBanks as gqb
+        RunSettings.HEADLESS = True
+        input_file = getInput(bank_inputs[bank_type], n, workdir)
+        # The bank types share their inputs, so time a parse of the input
+        #   table every time rather than a hit on the cache left by
+        #   whichever case ran first
+        clearInputCache(input_file)
+        start = time.perf_counter()
+        gqb.getBankType(bank_type)(
+            input_file = input_file, difficulty = 'all',
+            out_path = os.path.join(workdir, 'Respondus_' + bank_type))
+        return n, time.perf_counter() - start
+    return case
+
+
+def case_generateTemplateBank(n, workdir):
+    from QuestionTemplates import LogScaleTemplates, generateTemplateBank
+    # About n questions: n // 40 for each of the 40 first magnitudes
+    template = LogScaleTemplates['Amplitude']
+    n_each = len(template['parameters'][template['each'][0]])
+    start = time.perf_counter()
+    Respondus_table = generateTemplateBank(
+        template, n = max(1, n // n_each), rng = 0)
+    return len(Respondus_table), time.perf_counter() - start
+
+
+def case_Pretty4Canvas(pages, workdir):
+    import Pretty4Canvas as p4c
+    fpath = getInput('html', pages, workdir)
+    start = time.perf_counter()
+    # Tables are classified each run (no decision cache)
+    p4c.convert_file(fpath, ask = False, table_cache = False)
+    return pages, time.perf_counter() - start
+
+
+def getCases():
+    '''
+    Returns a dict of case name : (case function, size kind), where the size
+    kind is 'questions' or 'pages'.
+    '''
+    from GenerateQuestionBanks import BankTypes
+    cases = {
+        'build_MC_bank'         : (case_build_MC_bank, 'questions'),
+        'genRandomAnswerSet'    : (case_genRandomAnswerSet, 'questions'),
+        'genRandomAnswerSets'   : (case_genRandomAnswerSets, 'questions'),
+        'generateTemplateBank'  : (case_generateTemplateBank, 'questions'),
+        }
+    for bank_type in BankTypes:
+        if bank_type in bank_inputs:
+            cases['format_' + bank_type] = (
+                caseFormatBank(bank_type), 'questions')
+    cases['Pretty4Canvas'] = (case_Pretty4Canvas, 'pages')
+    return cases
+
+
+####################
+# RUNNING
+####################
+def peakRSS():
+    '''
+    Returns the peak resident set size of this process in MB, or None where
+    it can't be measured.
+    '''
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kB, macOS reports bytes
+    if sys.platform == 'darwin':
+        return peak / 2**20
+    return peak / 2**10
+
+
+def runCase(name, size, workdir):
+    '''
+    Runs one benchmark case in this process and prints its result as JSON.
+    Used by measureCase.
+    '''
+    items, seconds = getCases()[name][0](size, workdir)
+    print(json.dumps({
+        'items' : items, 'seconds' : seconds, 'peak_rss_mb' : peakRSS()}))
+
+
+def measureCase(name, size, workdir):
+    '''
+    Runs one benchmark case in a fresh Python process.
+
+    Returns
+    -------
+    result : dict
+        The case name, size, number of items processed, seconds,
+        throughput (items per second) and peak memory use (MB).
+
+    '''
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__),
+         '--run-case', name, str(size), workdir],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True)
+    if proc.returncode:
+        raise RuntimeError(name + ' (' + str(size) + ') failed:\n'
+                           + proc.stderr)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result['throughput'] = result['items'] / max(result['seconds'], 1e-9)
+    return dict({'case' : name, 'size' : size}, **result)
+
+
+def runBenchmarks(cases = None, sizes = default_sizes,
+                  pages = default_pages, workdir = None):
+    '''
+    Runs the benchmark cases at every size.
+
+    Parameters
+    ----------
+    cases : list of str
+        Names of the cases to run. Defaults to all of them.
+    sizes : list of int
+        Numbers of questions to benchmark the question bank cases with.
+    pages : list of int
+        Numbers of pages to benchmark Pretty4Canvas with.
+    workdir : str
+        Directory for the synthetic inputs and outputs. Defaults to a
+        temporary directory that is deleted afterwards.
+
+    Returns
+    -------
+    report : dict
+        Information about the machine and a list of case results
+        (see measureCase).
+
+    '''
+    all_cases = getCases()
+    cases = cases or list(all_cases)
+    tmp = workdir is None
+    if tmp:
+        workdir = tempfile.mkdtemp(prefix='benchmarks_')
+    results = []
+    try:
+        for name in cases:
+            kind = all_cases[name][1]
+            case_sizes = {'questions' : sizes, 'pages' : pages}[kind]
+            for size in case_sizes:
+                result = measureCase(name, size, workdir)
+                print('{:<36}{:>9}  {:>9.3f} s  {:>12,.0f} /s  {:>8} MB'
+                      .format(name, size, result['seconds'],
+                              result['throughput'],
+                              '%.1f' % result['peak_rss_mb']
+                              if result['peak_rss_mb'] else '-'))
+                results.append(result)
+    finally:
+        if tmp:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        'date'      : time.strftime('%Y-%m-%d %H:%M:%S'),
+        'python'    : platform.python_version(),
+        'platform'  : platform.platform(),
+        'results'   : results}
+
+
+def compareBaseline(report, baseline, tolerance = default_tolerance):
+    '''
+    Compares benchmark results with a baseline.
+
+    Parameters
+    ----------
+    report, baseline : dict
+        Benchmark reports, as returned by runBenchmarks.
+    tolerance : float
+        Fraction by which a case can be slower (lower throughput) or use
+        more memory than the baseline before it counts as a regression.
+
+    Returns
+    -------
+    regressions : list of str
+        Description of each regression.
+
+    '''
+    base = {(r['case'], r['size']) : r for r in baseline['results']}
+    regressions = []
+    print('\nCompared with the baseline from ' + baseline['date'] + ':')
+    for r in report['results']:
+        b = base.get((r['case'], r['size']))
+        if b is None:
+            continue
+        speed = r['throughput'] / b['throughput']
+        line = '{:<36}{:>9}  {:>6.2f}x speed'.format(
+            r['case'], r['size'], speed)
+        if r['peak_rss_mb'] and b['peak_rss_mb']:
+            memory = r['peak_rss_mb'] / b['peak_rss_mb']
+            line = line + '  {:>6.2f}x memory'.format(memory)
+        else:
+            memory = 1
+        if speed < 1 - tolerance or memory > 1 + tolerance:
+            line = line + '  REGRESSION'
+            regressions.append(line.strip())
+        print(line)
+    return regressions
+
+
+#%%
+####################
+# MAIN FUNCTION
+####################
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--run-case']:
+        runCase(sys.argv[2], int(sys.argv[3]), sys.argv[4])
+        sys.exit()
+
+    parser = argparse.ArgumentParser(
+        description='Benchmarks the question bank generator and '
+        'Pretty4Canvas on synthetic workloads.')
+    parser.add_argument(
+        '--cases', nargs='+', default=None,
+        help='Cases to run (default: all). Options are: '
+        + ', '.join(getCases()))
+    parser.add_argument(
+        '--sizes', nargs='+', type=int, default=default_sizes,
+        help='Numbers of questions to benchmark with.')
+    parser.add_argument(
+        '--pages', nargs='+', type=int, default=default_pages,
+        help='Numbers of pages to benchmark Pretty4Canvas with.')
+    parser.add_argument(
+        '--out', default='Benchmarks_results.json',
+        help='JSON file to save the results to.')
+    parser.add_argument(
+        '--baseline', default=None,
+        help='JSON results file to compare the results with.')
+    parser.add_argument(
+        '--save-baseline', action='store_true',
+        help='Also save the results as Benchmarks_baseline.json.')
+    parser.add_argument(
+        '--tolerance', type=float, default=default_tolerance,
+        help='Fraction slower or larger than the baseline that counts as a '
+        'regression.')
+    parser.add_argument(
+        '--workdir', default=None,
+        help='Directory to keep the synthetic inputs in between runs.')
+    args = parser.parse_args()
+
+    report = runBenchmarks(args.cases, args.sizes, args.pages, args.workdir)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+    print('Saved the results to ' + args.out)
+    if args.save_baseline:
+        with open('Benchmarks_baseline.json', 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+        print('Saved the results as the baseline')
+    if args.baseline:
+        if not os.path.exists(args.baseline):
+            print('No baseline at ' + args.baseline + '. Baselines depend on '
+                  'the machine, so none is kept in the repository: run '
+                  'python Benchmarks.py --save-baseline (with the same '
+                  '--sizes and --pages) to make one first.')
+            sys.exit(2)
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compareBaseline(report, baseline, args.tolerance)
+        if regressions:
+            print(str(len(regressions)) + ' regression(s)')
+            sys.exit(1)
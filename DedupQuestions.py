@@ -0,0 +1,385 @@
+# -*- coding: utf-8 -*-
+"""
+@author: cariefrantz
+
+Finds duplicate and near-duplicate questions across question banks.
+
+Each question is fingerprinted from its wording, its set of possible answers
+and its correct answer (feedback is ignored, and so is the order of the
+possible answers):
+    - Exact duplicates have the same fingerprint after case and whitespace
+      are normalized.
+    - Near duplicates are found with MinHash signatures of the questions'
+      5-character shingles, indexed with locality-sensitive hashing (LSH)
+      bands. Questions that share a band are compared by their signatures
+      and joined into a cluster if their estimated similarity is above the
+      threshold.
+Shingling, hashing and band matching are done with numpy over chunks of
+questions, so the scan time grows roughly linearly with the number of
+questions.
+
+Arguments:  Respondus-formatted CSV files (such as the Respondus_*.csv files
+            saved by GenerateQuestionBanks.py) and/or Respondus text files
+
+Example in command line:
+    python DedupQuestions.py Respondus_Energy.csv Respondus_Amplitude.txt
+    python DedupQuestions.py *.csv --threshold 0.9 --out duplicates.csv
+
+"""
+
+####################
+# IMPORTS
+####################
+import os
+import csv
+import hashlib
+import argparse
+from functools import lru_cache
+import numpy as np
+from RespondusText import (
+    choice_columns, getColumn, countRows, isBlank, iterCSVTables,
+    iterMCTables)
+
+
+####################
+# VARIABLES
+####################
+shingle_size = 5            # Characters per shingle
+num_perm = 64               # Number of MinHash permutations
+bands = 16                  # LSH bands (num_perm / bands rows per band)
+bucket_window = 16          # Neighbours in an LSH bucket to compare with
+shingle_budget = 50000      # Shingles to hash at a time
+
+
+####################
+# FINGERPRINT SCRIPTS
+####################
+@lru_cache(maxsize=65536)
+def normalizeText(text):
+    '''
+    Normalizes text for comparison: case is ignored and any run of
+    whitespace becomes a single space. Choices repeat across questions, so
+    recent results are cached.
+    '''
+    if isBlank(text):
+        return ''
+    return ' '.join(str(text).split()).casefold()
+
+
+def questionKey(wording, choices, correct):
+    '''
+    Returns the text that a question is fingerprinted and shingled from: its
+    normalized wording, its possible answers (in sorted order) and the text
+    of its correct answer.
+
+    Parameters
+    ----------
+    wording : str
+        Question wording.
+    choices : list of str
+        Possible answers, in order. Empty choices are ignored.
+    correct : int
+        Number of the correct answer (1 for the first choice).
+
+    Returns
+    -------
+    key : str
+        The question's comparison text.
+
+    '''
+    choices = [normalizeText(x) for x in choices if not isBlank(x)]
+    try:
+        answer = choices[int(correct) - 1]
+    except (TypeError, ValueError, IndexError):
+        answer = ''
+    return ' | '.join(
+        [normalizeText(wording), ' ; '.join(sorted(choices)), answer])
+
+
+def iterBankKeys(fpath, chunk_size=10000):
+    '''
+    Reads a Respondus-formatted CSV file or Respondus text file in chunks
+    and yields the comparison text of each question (see questionKey), along
+    with its wording.
+    '''
+    if fpath.endswith('.txt'):
+        tables = iterMCTables(fpath, chunk_size)
+    else:
+        tables = iterCSVTables(fpath, chunk_size)
+    for table in tables:
+        n = countRows(table)
+        wordings = getColumn(table, 'Question Wording', 0, n)
+        corrects = getColumn(table, 'Correct Answer', 0, n)
+        choices = zip(*[getColumn(table, col, 0, n)
+                        for col in choice_columns])
+        for wording, correct, row in zip(wordings, corrects, choices):
+            yield questionKey(wording, row, correct), wording
+
+
+def minHashSignatures(keys, seed=0):
+    '''
+    Calculates the MinHash signature of each question's comparison text.
+
+    The texts are shingled and hashed in one numpy pass per chunk: each
+    shingle of shingle_size bytes is packed into an integer, mixed down to
+    32 bits, and put through num_perm random multiply-shift hash functions;
+    a question's signature is the smallest value of each hash function over
+    its shingles.
+
+    Parameters
+    ----------
+    keys : list of str
+        Comparison text of each question.
+    seed : int
+        Seed for the hash functions. Signatures are only comparable if they
+        were made with the same seed.
+
+    Returns
+    -------
+    signatures : numpy.ndarray of uint32
+        Array of shape (number of questions, num_perm).
+
+    '''
+    rng = np.random.default_rng(seed)
+    a = rng.integers(0, 2**63, num_perm, dtype=np.uint64)[:, None] * 2 + 1
+    b = rng.integers(0, 2**63, num_perm, dtype=np.uint64)[:, None]
+    pad = b'\0' * (shingle_size - 1)
+    signatures = np.empty((len(keys), num_perm), dtype=np.uint32)
+
+    start = 0
+    while start < len(keys):
+        # Take questions until the chunk has enough shingles
+        stop, size = start, 0
+        texts = []
+        while stop < len(keys) and (size < shingle_budget or not texts):
+            text = keys[stop].encode('utf-8') + pad
+            texts.append(text)
+            size = size + len(text)
+            stop = stop + 1
+
+        # Pack every shingle_size-byte window into an integer
+        buf = np.frombuffer(b''.join(texts), dtype=np.uint8).astype(np.uint64)
+        lengths = np.array([len(text) for text in texts])
+        n_windows = len(buf) - shingle_size + 1
+        windows = np.zeros(n_windows, dtype=np.uint64)
+        for k in range(shingle_size):
+            windows = (windows << np.uint64(8)) | buf[k:k + n_windows]
+        # Keep only the windows that start and end in the same question;
+        #   the padding gives every question at least one
+        question = np.repeat(np.arange(len(texts)), lengths)
+        keep = question[:n_windows] == question[shingle_size - 1:]
+        windows = windows[keep]
+        firsts = np.concatenate([[0], np.cumsum(lengths - shingle_size + 1)])
+
+        # Hash the shingles and take the minimum per question
+        x = (windows * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(32)
+        hashes = ((a * x + b) >> np.uint64(32)).astype(np.uint32)
+        signatures[start:stop] = np.minimum.reduceat(
+            hashes, firsts[:-1], axis=1).T
+        start = stop
+
+    return signatures
+
+
+def findNearPairs(signatures, threshold=0.9):
+    '''
+    Finds pairs of questions with similar MinHash signatures, using LSH.
+
+    Questions with the same signature are paired with the first question
+    that has it, and only one of them is indexed. The signatures are split
+    into bands; questions whose band values are all equal fall in the same
+    bucket. Each bucket is kept in signature order, and each question is
+    compared with the bucket_window questions after it. So every pair is
+    compared in buckets of up to bucket_window + 1 questions, the number of
+    comparisons stays linear in the number of questions, and the pairs
+    found do not depend on the order of the questions.
+
+    Parameters
+    ----------
+    signatures : numpy.ndarray
+        MinHash signatures, as returned by minHashSignatures.
+    threshold : float
+        Smallest estimated similarity (Jaccard index of the shingle sets)
+        for a pair to count as near duplicates.
+
+    Returns
+    -------
+    pairs : numpy.ndarray of int
+        Array of shape (number of pairs, 2) with the row numbers of each
+        pair of near duplicates, the smaller row number first.
+
+    '''
+    n = len(signatures)
+    rows = num_perm // bands
+
+    # Pair the questions that have the same signature
+    distinct, first_row, inverse = np.unique(
+        signatures, axis=0, return_index=True, return_inverse=True)
+    inverse = inverse.ravel()
+    same = first_row[inverse] != np.arange(n)
+    pairs = [np.column_stack([first_row[inverse][same], np.arange(n)[same]])]
+
+    m = len(distinct)
+    for band in range(bands):
+        # Hash the band's values to one 64-bit number per question
+        cols = distinct[:, band*rows:(band+1)*rows].astype(np.uint64)
+        band_hash = np.zeros(m, dtype=np.uint64)
+        for col in cols.T:
+            band_hash = (band_hash * np.uint64(1000003)) ^ col
+
+        # Group questions with the same band hash. The distinct signatures
+        #   are sorted, so each group is in signature order.
+        order = np.argsort(band_hash, kind='stable')
+        sorted_hash = band_hash[order]
+
+        # Compare each question with the ones up to bucket_window places
+        #   after it in its bucket
+        start = np.flatnonzero(sorted_hash[1:] == sorted_hash[:-1])
+        d = 1
+        while len(start) and d <= bucket_window:
+            a, b = order[start], order[start + d]
+            similarity = (distinct[a] == distinct[b]).mean(axis=1)
+            close = similarity >= threshold
+            pairs.append(first_row[np.column_stack([a[close], b[close]])])
+            d += 1
+            start = start[start + d < m]
+            start = start[sorted_hash[start + d] == sorted_hash[start]]
+
+    # Drop the pairs found in more than one band
+    pairs = np.sort(np.concatenate(pairs).astype(np.int64), axis=1)
+    pairs = np.unique(pairs[:, 0] * n + pairs[:, 1])
+    return np.column_stack([pairs // n, pairs % n])
+
+
+def clusterPairs(n, pairs):
+    '''
+    Joins pairs of row numbers into clusters (union-find).
+
+    Returns
+    -------
+    roots : list of int
+        Cluster label (the row number of a member) for each of n rows.
+
+    '''
+    parent = list(range(n))
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    for i, j in pairs.tolist():
+        ri, rj = root(i), root(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+    return [root(i) for i in range(n)]
+
+
+####################
+# REPORT SCRIPTS
+####################
+def findDuplicates(fpaths, threshold=0.9, chunk_size=10000):
+    '''
+    Scans question banks for duplicate and near-duplicate questions.
+
+    Parameters
+    ----------
+    fpaths : list of str
+        Respondus-formatted CSV files and/or Respondus text files.
+    threshold : float
+        Smallest estimated similarity for near duplicates (see
+        findNearPairs). Use 1 to only find exact duplicates.
+    chunk_size : int
+        Number of questions to read at a time.
+
+    Returns
+    -------
+    clusters : list of dict
+        One dict per cluster of two or more questions, largest first, with
+            'Kind'          'exact' for questions with the same fingerprint,
+                                or 'near' for near duplicates (which
+                                includes all exact duplicates of each)
+            'Questions'     List of (file, question number, wording)
+
+    '''
+    # Fingerprint every question; only one question per fingerprint needs a
+    #   MinHash signature
+    fingerprints = {}           # fingerprint : distinct question number
+    keys = []                   # Comparison text of each distinct question
+    questions = []              # (file, number, wording, distinct number)
+    for fpath in fpaths:
+        for number, (key, wording) in enumerate(
+                iterBankKeys(fpath, chunk_size), 1):
+            fingerprint = hashlib.blake2b(
+                key.encode('utf-8'), digest_size=16).digest()
+            d = fingerprints.setdefault(fingerprint, len(keys))
+            if d == len(keys):
+                keys.append(key)
+            questions.append((fpath, number, wording, d))
+
+    # Cluster the distinct questions that are near duplicates
+    if threshold < 1 and len(keys) > 1:
+        pairs = findNearPairs(minHashSignatures(keys), threshold)
+    else:
+        pairs = np.empty((0, 2), dtype=int)
+    roots = clusterPairs(len(keys), pairs)
+
+    # Collect the questions with each fingerprint, and the distinct
+    #   questions in each near-duplicate cluster
+    exact = {}
+    for fpath, number, wording, d in questions:
+        exact.setdefault(d, []).append((fpath, number, wording))
+    near = {}
+    for d in range(len(keys)):
+        near.setdefault(roots[d], []).append(d)
+    clusters = [{'Kind' : 'exact', 'Questions' : qs}
+                for qs in exact.values() if len(qs) > 1]
+    clusters.extend(
+        {'Kind' : 'near', 'Questions' : [q for d in ds for q in exact[d]]}
+        for ds in near.values() if len(ds) > 1)
+    clusters.sort(key=lambda c: len(c['Questions']), reverse=True)
+
+    return clusters
+
+
+def saveReport(clusters, fpath):
+    '''
+    Saves the duplicate clusters to a CSV file with one row per question,
+    with the columns Cluster, Kind, Size, File, Question and Wording.
+    '''
+    with open(fpath, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, lineterminator=os.linesep)
+        writer.writerow(
+            ['Cluster', 'Kind', 'Size', 'File', 'Question', 'Wording'])
+        for c, cluster in enumerate(clusters, 1):
+            for fpath_q, number, wording in cluster['Questions']:
+                writer.writerow([
+                    c, cluster['Kind'], len(cluster['Questions']),
+                    fpath_q, number, wording])
+
+
+#%%
+####################
+# MAIN FUNCTION
+####################
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Finds duplicate and near-duplicate questions across '
+        'question banks.')
+    parser.add_argument(
+        'files', nargs='+',
+        help='Respondus-formatted CSV files and/or Respondus text files.')
+    parser.add_argument(
+        '--threshold', type=float, default=0.9,
+        help='Smallest estimated similarity (0-1) for near duplicates. '
+        'Use 1 to only find exact duplicates.')
+    parser.add_argument(
+        '--out', default='Duplicates.csv',
+        help='CSV file to save the report to.')
+    args = parser.parse_args()
+
+    clusters = findDuplicates(args.files, args.threshold)
+    saveReport(clusters, args.out)
+    n_exact = sum(c['Kind'] == 'exact' for c in clusters)
+    print('Found ' + str(n_exact) + ' clusters of exact duplicates and '
+          + str(len(clusters) - n_exact) + ' clusters of near duplicates')
+    print('Saved the report to ' + args.out)
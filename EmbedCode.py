@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+@author: cariefrantz
+
+Normalizes and minifies HTML embed code, such as the iframes of the 3D rock
+models in the 'Embed' column of the input tables.
+
+Embed code copied from a model site carries whitespace, comments and
+attributes that do nothing (vendor-prefixed copies of allowfullscreen, bare
+flags that belong in the allow attribute, empty styles). Each question repeats
+its embed code in full in both the CSV file and the Respondus text file, so
+these add up across a bank. normalizeEmbed parses the embed code with the
+standard library's HTML parser and writes it back out without them:
+    - comments are dropped
+    - runs of whitespace become a single space, and whitespace next to block
+      tags (or at the start or end) is dropped; non-breaking spaces are kept
+      (as &nbsp;)
+    - tag and attribute names are lower case, attribute values are quoted
+      and their whitespace is collapsed (except in attributes whose text is
+      content, such as srcdoc; see verbatim_attrs)
+    - redundant attributes (see redundant_attrs) and repeated attributes are
+      dropped, and boolean attributes are written bare
+CDATA sections and processing instructions are kept as they are. The result
+displays the same as the original.
+
+Each distinct piece of embed code is only parsed once: results are cached by
+a hash of the embed code, so embeds that repeat within a bank or across bank
+types in the same run are reused. embed_stats counts the bytes before and
+after for a size report.
+
+This module only uses the standard library.
+
+Example in command line, to report the bytes saved for the Embed column of an
+input table:
+    python EmbedCode.py rock_models.csv Embed
+
+"""
+
+####################
+# IMPORTS
+####################
+import re
+import sys
+import csv
+import html
+import hashlib
+from html.parser import HTMLParser
+
+
+####################
+# VARIABLES
+####################
+# Attributes that do nothing, by tag ('*' for any tag)
+redundant_attrs = {
+    '*'         : ['mozallowfullscreen', 'webkitallowfullscreen',
+                   'msallowfullscreen', 'oallowfullscreen'],
+    # Flags that only work inside the allow attribute
+    'iframe'    : ['xr-spatial-tracking', 'execution-while-out-of-viewport',
+                   'execution-while-not-rendered', 'web-share'],
+    'script'    : ['language'],
+    }
+# Attributes whose values are content, kept exactly as they are
+verbatim_attrs = ['srcdoc', 'value', 'content', 'title', 'alt', 'placeholder']
+# Attributes that are dropped when empty
+empty_attrs = ['style', 'class', 'id']
+# Attributes that are on or off, written bare
+boolean_attrs = [
+    'allowfullscreen', 'async', 'autoplay', 'controls', 'defer', 'hidden',
+    'loop', 'muted', 'playsinline']
+# Tags whose surrounding whitespace does not display
+block_tags = [
+    'address', 'article', 'aside', 'blockquote', 'body', 'br', 'dd', 'div',
+    'dl', 'dt', 'figcaption', 'figure', 'footer', 'h1', 'h2', 'h3', 'h4',
+    'h5', 'h6', 'head', 'header', 'hr', 'html', 'li', 'link', 'main', 'meta',
+    'nav', 'ol', 'p', 'script', 'section', 'style', 'table', 'tbody', 'td',
+    'tfoot', 'th', 'thead', 'title', 'tr', 'ul']
+void_tags = [
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+    'meta', 'param', 'source', 'track', 'wbr']
+
+# HTML whitespace (not \s, which would also collapse non-breaking spaces)
+html_space = ' \t\n\r\f'
+space_re = re.compile('[' + html_space + ']+')
+style_re = re.compile(r'\s*([:;,])\s*')
+
+# Normalized embed code, by hash of the original
+embed_cache = {}
+# Size report for the embed code normalized in this process
+embed_stats = {'questions' : 0, 'distinct' : 0, 'bytes_in' : 0,
+               'bytes_out' : 0}
+
+
+####################
+# SCRIPTS
+####################
+class EmbedMinifier(HTMLParser):
+    '''
+    HTML parser that writes back out the HTML it is fed, minified (see
+    normalizeEmbed). The result is in self.out.
+    '''
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out = []
+        self.space = False          # Whitespace waiting to be written
+        self.after_block = True     # Whether a block tag was just written
+        self.raw = None             # Open script or style tag
+
+    def writeSpace(self, before_block):
+        # Whitespace only displays between inline tags and text
+        if self.space and not (before_block or self.after_block):
+            self.out.append(' ')
+        self.space = False
+
+    def writeTag(self, tag, text):
+        self.writeSpace(tag in block_tags)
+        self.out.append(text)
+        self.after_block = tag in block_tags
+
+    def handle_starttag(self, tag, attrs):
+        self.writeTag(tag, '<' + tag + self.formatAttrs(tag, attrs) + '>')
+        if tag in ('script', 'style'):
+            self.raw = tag
+
+    def handle_startendtag(self, tag, attrs):
+        self.writeTag(tag, '<' + tag + self.formatAttrs(tag, attrs)
+                      + ('>' if tag in void_tags else '/>'))
+
+    def handle_endtag(self, tag):
+        if tag in void_tags:
+            return
+        if tag == 'iframe':
+            # Nothing inside an iframe displays
+            self.space = False
+        self.raw = None
+        self.writeTag(tag, '</' + tag + '>')
+
+    def handle_data(self, data):
+        if self.raw:
+            # Script and style contents are kept as they are
+            self.out.append(data.strip() if self.raw == 'style' else data)
+            return
+        text = space_re.sub(' ', data)
+        if not text.strip(html_space):
+            self.space = self.space or bool(text)
+            return
+        self.space = self.space or text.startswith(' ')
+        self.writeSpace(False)
+        self.out.append(html.escape(text.strip(html_space), quote=False)
+                        .replace('\xa0', '&nbsp;'))
+        self.after_block = False
+        self.space = text.endswith(' ')
+
+    def handle_comment(self, data):
+        pass
+
+    def handle_decl(self, decl):
+        self.writeTag('!', '<!' + decl + '>')
+
+    def unknown_decl(self, data):
+        # CDATA and other marked sections
+        if data.lower().startswith(('if', 'else', 'endif')):
+            self.writeTag('!', '<![' + data + ']>')
+        else:
+            self.writeTag('!', '<![' + data + ']]>')
+
+    def handle_pi(self, data):
+        self.writeTag('?', '<?' + data + '>')
+
+    def formatAttrs(self, tag, attrs):
+        '''
+        Returns the attributes of a tag as minified HTML, starting with a
+        space if there are any.
+        '''
+        drop = set(redundant_attrs['*'] + redundant_attrs.get(tag, []))
+        seen = set()
+        text = ''
+        for name, value in attrs:
+            if name in drop or name in seen:
+                continue
+            seen.add(name)
+            if value is not None and name not in verbatim_attrs:
+                value = space_re.sub(' ', value).strip(html_space)
+                if name == 'style':
+                    value = style_re.sub(r'\1', value).rstrip(';')
+            if name in boolean_attrs:
+                if value not in (None, '', name, 'true'):
+                    # A value Respondus or Canvas might read; keep it
+                    text = text + ' ' + name + '="' + quoteAttr(value) + '"'
+                else:
+                    text = text + ' ' + name
+            elif value is None:
+                text = text + ' ' + name
+            elif value or name not in empty_attrs:
+                text = text + ' ' + name + '="' + quoteAttr(value) + '"'
+        return text
+
+
+def quoteAttr(value):
+    '''
+    Escapes an attribute value to go inside double quotes.
+    '''
+    return value.replace('&', '&amp;').replace('"', '&quot;')
+
+
+def minifyEmbed(embed):
+    '''
+    Returns embed code minified (see EmbedMinifier), without caching.
+    '''
+    parser = EmbedMinifier()
+    parser.feed(embed)
+    parser.close()
+    return ''.join(parser.out)
+
+
+def normalizeEmbed(embed):
+    '''
+    Returns a piece of embed code normalized and minified. Each distinct
+    piece of embed code is only parsed once; anything that isn't text (such
+    as an empty cell) is returned as is.
+
+    Parameters
+    ----------
+    embed : str
+        HTML embed code.
+
+    Returns
+    -------
+    embed : str
+        The normalized embed code.
+
+    '''
+    if not isinstance(embed, str):
+        return embed
+    key = hashlib.blake2b(embed.encode('utf-8'), digest_size=16).digest()
+    result = embed_cache.get(key)
+    if result is None:
+        result = embed_cache[key] = minifyEmbed(embed)
+        embed_stats['distinct'] = embed_stats['distinct'] + 1
+    return result
+
+
+def countEmbeds(embed, normalized, n = 1):
+    '''
+    Adds n questions with a piece of embed code to the size report.
+    '''
+    if not isinstance(embed, str):
+        return
+    embed_stats['questions'] = embed_stats['questions'] + n
+    embed_stats['bytes_in'] = (
+        embed_stats['bytes_in'] + n * len(embed.encode('utf-8')))
+    embed_stats['bytes_out'] = (
+        embed_stats['bytes_out'] + n * len(normalized.encode('utf-8')))
+
+
+def sizeReport(stats = None):
+    '''
+    Returns a line of text reporting the bytes saved by normalizing embed
+    code (by default, in this process; or for the embed_stats-like dict
+    given).
+    '''
+    if stats is None:
+        stats = embed_stats
+    saved = stats['bytes_in'] - stats['bytes_out']
+    return ('Normalized {:,} distinct embeds in {:,} questions: {:,} bytes '
+            '-> {:,} bytes per output file ({:,} bytes, {:.1%} saved)'.format(
+                stats['distinct'], stats['questions'], stats['bytes_in'],
+                stats['bytes_out'], saved,
+                saved / stats['bytes_in'] if stats['bytes_in'] else 0))
+
+
+#%%
+####################
+# MAIN FUNCTION
+####################
+if __name__ == '__main__':
+    column = sys.argv[2] if len(sys.argv) > 2 else 'Embed'
+    with open(sys.argv[1], newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            embed = row[column]
+            countEmbeds(embed, normalizeEmbed(embed))
+    print(sizeReport())
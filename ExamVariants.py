@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+"""
+@author: cariefrantz
+
+Generates randomized variants of a question bank, one per student, from a
+saved Respondus-formatted CSV file or Respondus text file.
+
+Each variant has the same questions as the bank, with the order of each
+question's possible answers shuffled. If a number of choices per question is
+given, each variant also keeps the correct answer plus a random sample of the
+question's other answers (distractors). The correct answer number of each
+question is updated to match, so each variant is a Respondus table that
+build_MC_bank writes out like any other.
+
+Distractors are only drawn from the answers saved with each question, not
+from the answers of the other questions in the bank: each saved answer can
+have its own feedback, and an answer to one question need not make sense as
+a wrong answer to another. To draw from a larger set of distractors, save
+more possible answers with each question and use --keep.
+
+The bank is read once and its possible answers are held as a matrix with one
+row per question; each variant is drawn for every question at once with numpy.
+Every variant has its own random stream, spawned from a single seed with
+numpy.random.SeedSequence, so a variant is the same however many variants are
+generated and however many processes write them. The variants are written by
+a pool of worker processes, each of which reads the bank once.
+
+Arguments:  Respondus-formatted CSV file or Respondus text file
+            Number of variants
+
+Example in command line:
+    python ExamVariants.py Respondus_Energy.csv 300 --seed 2024
+This saves Respondus_Energy_variants/Respondus_Energy_001.txt, ...,
+Respondus_Energy_300.txt.
+
+"""
+
+####################
+# IMPORTS
+####################
+import os
+import argparse
+import numpy as np
+from RespondusText import (
+    Respondus_columns, choice_columns, countRows, getColumn, isBlank,
+    build_MC_bank)
+from QTIExport import iterTables
+
+
+####################
+# VARIABLES
+####################
+feedback_columns = ['Feedback ' + str(n) for n in range(1, 11)]
+
+# The bank, as loaded by each worker process (see initWorker)
+worker_bank = None
+
+
+####################
+# SCRIPTS
+####################
+def loadBank(source, chunk_size = 10000):
+    '''
+    Reads a question bank and arranges its possible answers as matrices.
+
+    Parameters
+    ----------
+    source : str or Respondus table
+        Path to a Respondus-formatted CSV file or Respondus text file, or a
+        Respondus table (QuestionStore, pandas.DataFrame or dict of lists).
+    chunk_size : int
+        Number of questions to read at a time.
+
+    Returns
+    -------
+    bank : dict
+        'table'     The bank as a dict of lists (one list per Respondus
+                        column; empty cells are None)
+        'choices'   Object matrix of each question's possible answers, with
+                        the empty choices moved to the end (as None)
+        'feedbacks' Object matrix of the feedback for each possible answer,
+                        in the same order as 'choices'
+        'n_choices' Number of possible answers of each question
+        'correct'   Index in 'choices' of each question's correct answer
+                        (-1 if it has none)
+
+    '''
+    table = {col : [] for col in Respondus_columns}
+    for chunk in iterTables(source, chunk_size):
+        n = countRows(chunk)
+        for start in range(0, n, chunk_size):
+            for col in Respondus_columns:
+                table[col].extend(
+                    None if isBlank(x) else x for x in
+                    getColumn(chunk, col, start, start + chunk_size))
+    n_q = len(table['Type'])
+
+    choices = np.empty((n_q, len(choice_columns)), dtype=object)
+    feedbacks = np.empty((n_q, len(choice_columns)), dtype=object)
+    for k, (choice, feedback) in enumerate(
+            zip(choice_columns, feedback_columns)):
+        choices[:, k] = table[choice]
+        feedbacks[:, k] = table[feedback]
+
+    # Move the empty choices to the end of each row, keeping the order of the
+    #   others; the correct answer number counts the non-empty choices only
+    blank = np.equal(choices, None)
+    order = np.argsort(blank, axis=1, kind='stable')
+    choices = np.take_along_axis(choices, order, axis=1)
+    feedbacks = np.take_along_axis(feedbacks, order, axis=1)
+    n_choices = (~blank).sum(axis=1)
+
+    correct = np.array(
+        [-1 if x is None else int(float(x)) - 1
+         for x in table['Correct Answer']], dtype=int).reshape(-1)
+    correct[(correct < 0) | (correct >= n_choices)] = -1
+
+    return {'table' : table, 'choices' : choices, 'feedbacks' : feedbacks,
+            'n_choices' : n_choices, 'correct' : correct}
+
+
+def permuteChoices(n_choices, correct, rng, keep = None):
+    '''
+    Draws a random order of possible answers for every question at once.
+
+    Each question draws a random key for each of its possible answers. If
+    keep is given, the correct answer's key is forced to the front and the
+    keep smallest keys pick the answers to use; a second set of keys then
+    shuffles them. Otherwise the keys shuffle all of the question's answers.
+
+    Parameters
+    ----------
+    n_choices : numpy.ndarray of int
+        Number of possible answers of each question.
+    correct : numpy.ndarray of int
+        Index of each question's correct answer (-1 if it has none).
+    rng : numpy.random.Generator
+        Random number generator to draw with.
+    keep : int
+        Number of possible answers to keep per question (at most the number
+        it has), drawn from the question's own possible answers. If not
+        given, every answer is kept.
+
+    Returns
+    -------
+    order : numpy.ndarray of int
+        Matrix with one row per question of the indexes of its possible
+        answers in their new order. Positions past the kept answers are -1.
+    new_correct : numpy.ndarray of int
+        Number (from 1) of each question's correct answer in its new order,
+        or 0 if it has none.
+
+    '''
+    n_q = len(n_choices)
+    width = len(choice_columns)
+    rows = np.arange(n_q)
+    slots = np.arange(width)[None, :]
+
+    keys = rng.random((n_q, width))
+    keys[slots >= n_choices[:, None]] = 2
+    if keep is None:
+        n_kept = n_choices
+        order = np.argsort(keys, axis=1)
+    else:
+        n_kept = np.minimum(n_choices, keep)
+        has = correct >= 0
+        keys[rows[has], correct[has]] = -1
+        order = np.argsort(keys, axis=1)
+        # Shuffle the kept answers, so the correct answer isn't always first
+        keys = rng.random((n_q, width))
+        keys[slots >= n_kept[:, None]] = 2
+        order = np.take_along_axis(order, np.argsort(keys, axis=1), axis=1)
+    kept = slots < n_kept[:, None]
+    order[~kept] = -1
+
+    is_correct = (order == correct[:, None]) & kept & (correct[:, None] >= 0)
+    new_correct = np.where(
+        is_correct.any(axis=1), is_correct.argmax(axis=1) + 1, 0)
+
+    return order, new_correct
+
+
+def variantTable(bank, rng, keep = None):
+    '''
+    Returns one variant of a bank (see loadBank) as a Respondus table (dict
+    of lists). The columns that don't change are shared with the bank.
+    '''
+    order, new_correct = permuteChoices(
+        bank['n_choices'], bank['correct'], rng, keep)
+    kept = order >= 0
+    index = np.where(kept, order, 0)
+    choices = np.where(
+        kept, np.take_along_axis(bank['choices'], index, axis=1), None)
+    feedbacks = np.where(
+        kept, np.take_along_axis(bank['feedbacks'], index, axis=1), None)
+
+    table = dict(bank['table'])
+    for k, (choice, feedback) in enumerate(
+            zip(choice_columns, feedback_columns)):
+        table[choice] = choices[:, k].tolist()
+        table[feedback] = feedbacks[:, k].tolist()
+    table['Correct Answer'] = [
+        int(x) if x else old for x, old in
+        zip(new_correct, bank['table']['Correct Answer'])]
+    return table
+
+
+def variantPaths(source, n, out_dir = None):
+    '''
+    Returns the paths to save n variants of a bank to: <name>_001.txt, ...
+    in the folder out_dir (by default, <name>_variants next to the bank).
+    '''
+    base = os.path.splitext(source)[0]
+    if out_dir is None:
+        out_dir = base + '_variants'
+    name = os.path.basename(base)
+    width = max(3, len(str(n)))
+    return [os.path.join(out_dir, name + '_' + str(k+1).zfill(width) + '.txt')
+            for k in range(n)]
+
+
+def initWorker(source):
+    # Each worker process reads the bank once
+    global worker_bank
+    worker_bank = loadBank(source)
+
+
+def writeVariants(tasks, keep = None, qti = False, bank = None):
+    '''
+    Writes variants of a bank, each to its own Respondus text file (and QTI
+    package, if qti is True).
+
+    Parameters
+    ----------
+    tasks : list of (str, numpy.random.SeedSequence)
+        Path to save each variant to and the seed of its random stream.
+    keep : int
+        Number of possible answers to keep per question (see
+        permuteChoices).
+    qti : bool
+        Whether to also export each variant as a Canvas QTI package.
+    bank : dict
+        The bank (see loadBank). Defaults to the bank loaded by the worker
+        process.
+
+    Returns
+    -------
+    paths : list of str
+        Paths to the saved Respondus text files.
+
+    '''
+    if bank is None:
+        bank = worker_bank
+    for fpath, seed in tasks:
+        table = variantTable(bank, np.random.default_rng(seed), keep)
+        build_MC_bank(table, fpath)
+        if qti:
+            from QTIExport import build_QTI_package
+            build_QTI_package(
+                table, os.path.splitext(fpath)[0] + '.zip',
+                title = os.path.splitext(os.path.basename(fpath))[0])
+    return [fpath for fpath, seed in tasks]
+
+
+def saveVariants(source, n, seed = None, keep = None, out_dir = None,
+                 processes = None, qti = False):
+    '''
+    Generates n randomized variants of a question bank, one per student, and
+    saves each as a Respondus text file.
+
+    Parameters
+    ----------
+    source : str
+        Path to a Respondus-formatted CSV file or Respondus text file.
+    n : int
+        Number of variants.
+    seed : int
+        Random seed, for reproducible variants. Variant k is the same for the
+        same seed whatever n is.
+    keep : int
+        Number of possible answers to keep per question: the correct answer
+        plus keep-1 distractors drawn at random from the question's other
+        saved answers (not from other questions). If not given, every answer
+        is kept and only the order is shuffled.
+    out_dir : str
+        Folder to save the variants to. Defaults to <name>_variants next to
+        the bank.
+    processes : int
+        Number of worker processes. Defaults to the number of CPUs; 1 writes
+        the variants in this process.
+    qti : bool
+        Whether to also export each variant as a Canvas QTI package.
+
+    Returns
+    -------
+    paths : list of str
+        Paths to the saved Respondus text files, in variant order.
+
+    '''
+    from concurrent.futures import ProcessPoolExecutor
+    seq = np.random.SeedSequence(seed)
+    paths = variantPaths(source, n, out_dir)
+    os.makedirs(os.path.dirname(paths[0]) or os.getcwd(), exist_ok=True)
+    tasks = list(zip(paths, seq.spawn(n)))
+
+    if processes == 1:
+        writeVariants(tasks, keep, qti, bank = loadBank(source))
+    else:
+        # Split the variants into a few batches per worker
+        n_workers = processes or os.cpu_count() or 1
+        size = max(1, -(-n // (n_workers * 4)))
+        batches = [tasks[i:i+size] for i in range(0, n, size)]
+        with ProcessPoolExecutor(
+                max_workers = n_workers, initializer = initWorker,
+                initargs = (source,)) as pool:
+            for batch in pool.map(
+                    writeVariants, batches, [keep] * len(batches),
+                    [qti] * len(batches)):
+                pass
+
+    print('Saved ' + str(n) + ' variants of ' + os.path.basename(source)
+          + ' to ' + os.path.dirname(paths[0]) + ' (seed ' + str(seq.entropy)
+          + ')')
+    return paths
+
+
+#%%
+####################
+# MAIN FUNCTION
+####################
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Generates randomized variants of a question bank, one '
+        'per student.')
+    parser.add_argument(
+        'bank', help='Respondus-formatted CSV file or Respondus text file.')
+    parser.add_argument(
+        'n', type=int, help='Number of variants.')
+    parser.add_argument(
+        '--seed', type=int, default=None,
+        help='Random seed, for reproducible variants. If not given, one is '
+        'picked and printed.')
+    parser.add_argument(
+        '--keep', type=int, default=None,
+        help='Number of possible answers to keep per question: the correct '
+        'answer plus distractors drawn at random from the question\'s other '
+        'saved answers. By default, every answer is kept and only the order '
+        'is shuffled.')
+    parser.add_argument(
+        '--out', default=None,
+        help='Folder to save the variants to.')
+    parser.add_argument(
+        '--processes', type=int, default=None,
+        help='Number of worker processes (default: number of CPUs).')
+    parser.add_argument(
+        '--qti', action='store_true',
+        help='Also export each variant as a QTI package (zip file).')
+    args = parser.parse_args()
+
+    saveVariants(args.bank, args.n, args.seed, args.keep, args.out,
+                 args.processes, args.qti)
@@ -15,41 +15,82 @@ but could be repurposed for other types of questions.
 # IMPORTS
 ####################
 import os
-import pandas as pd
-from tkinter import *
-from tkinter import filedialog
-import numpy as np
+import sys
+import csv
+import time
+import argparse
+import importlib
+# Respondus text output only needs the standard library
+from RespondusText import (
+    Respondus_columns, MC_letters, build_MC_bank, build_MC_bank_incremental,
+    iterMCQuestions, writeMCQuestions, removeManifest)
+from QuestionStore import QuestionStore
+from EmbedCode import normalizeEmbed, countEmbeds, embed_stats, sizeReport
+# The run settings (HEADLESS, INCREMENTAL, QTI, MINIFY_EMBEDS) and the list
+#   of saved files
+#   are shared with the bank type modules through RunSettings
+import RunSettings
+# pandas and numpy are slow to import, so they are imported inside the
+#   scripts that use them rather than here
 
 
 ####################
 # VARIABLES
 ####################
-Respondus_columns=[
-    'Type', 'Title/ID', 'Points', 'Question Wording', 'Correct Answer', 
-    'Choice 1', 'Choice 2', 'Choice 3', 'Choice 4', 'Choice 5',
-    'Choice 6', 'Choice 7', 'Choice 8', 'Choice 9', 'Choice 10',
-    'General Feedback', 'Correct Feedback', 'Incorrect Feedback',
-    'Feedback 1', 'Feedback 2', 'Feedback 3', 'Feedback 4', 'Feedback 5',
-    'Feedback 6', 'Feedback 7', 'Feedback 8', 'Feedback 9', 'Feedback 10',
-    'Topic', 'Difficulty Level', 'Meta 1', 'Meta 2', 'Meta 3', 'Meta 4']
-Respondus_table = pd.DataFrame(columns=Respondus_columns)
-MC_letters = ['a','b','c','d','e','f','g','h','i','j']
-
 # These are the available types of question banks that this code supports.
-#   Each value in the list corresponds with a script (def) below.
-BankTypes = [
-    'RockOrMineral3D',
-    'RockCycleClassification3D',
-    'IgneousClassification3D',
-    'LogScaleIntensity',
-    'GenericMC'
-    ]
+#   Each value in the list corresponds with a module in the QuestionBanks
+#   folder, which is only imported when that bank type is used
+#   (see getBankType and QuestionBanks/__init__.py).
+bank_dir = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'QuestionBanks')
+BankTypes = sorted(
+    os.path.splitext(f)[0] for f in os.listdir(bank_dir)
+    if f.endswith('.py') and not f.startswith('_'))
+
+# Paths of the CSV, text and QTI files saved by saveBank in this process
+#   (the same list as RunSettings.saved_files)
+saved_files = RunSettings.saved_files
 
 
 ####################
 # GENERAL SCRIPTS
 ####################
-def getInputTable(title, directory = os.getcwd()):
+def pickInputFile(title, directory = os.getcwd(), filename = None):
+    '''
+    Has the user pick the spreadsheet used as the input table, unless a file
+    is already given.
+
+    Parameters
+    ----------
+    title : str
+        Title for the file selection user interface.
+    directory: str
+        Default directory to start in.
+    filename : str
+        Path to the table, if already known.
+
+    Returns
+    -------
+    filename : str
+        Path to the table.
+
+    '''
+    if not filename:
+        if RunSettings.HEADLESS:
+            raise ValueError('No input table given for: ' + title)
+        # Open user input file dialog to pick file
+        #   (tkinter is only imported when the dialog is actually needed)
+        from tkinter import Tk, filedialog
+        root=Tk()
+        filename=filedialog.askopenfilename(
+            initialdir=directory, title = title,
+            filetypes = [('CSV', '*.csv')])
+        root.destroy()
+    return filename
+
+
+def getInputTable(
+        title, directory = os.getcwd(), filename = None, cache = True):
     '''
     Loads the spreadsheet used as the input table.
 
@@ -59,6 +100,12 @@ def getInputTable(title, directory = os.getcwd()):
         Title for the file selection user interface.
     directory: str
         Default directory to start in.
+    filename : str
+        Path to the table. If not given, the user picks the file through a
+        file selection user interface.
+    cache : bool
+        Whether to load the table through the parsed-table cache (see
+        readInputCSV).
 
     Returns
     -------
@@ -69,100 +116,531 @@ def getInputTable(title, directory = os.getcwd()):
         saved to the same directory.
 
     '''
-    # Open user input file dialog to pick file
-    root=Tk()
-    filename=filedialog.askopenfilename(
-        initialdir=directory, title = title,
-        filetypes = [('CSV', '*.csv')])
+    filename = pickInputFile(title, directory, filename)
     dirPath = os.path.dirname(filename)     # Directory
-    root.destroy()
     
     # Read in the table
-    input_table = pd.read_csv(filename)
+    if cache:
+        input_table = readInputCSV(filename)
+    else:
+        import pandas as pd
+        input_table = pd.read_csv(filename)
     
     return input_table, dirPath
 
 
-def build_MC_bank(Respondus_table, fpath):
-    '''    
-    Generates a Respondus-formatted text file from a table containing
-    Respondus variables.
+def readInputCSV(filename):
+    '''
+    Reads an input table through a cache of the parsed table, saved in a
+    binary format next to the CSV file (as .<name>.cache, with its key in
+    .<name>.cache.json). Later runs, and other bank types that use the same
+    table, load the cache instead of parsing the CSV again.
+    
+    The cache is keyed by the CSV file's path, size, modification time and
+    content hash, so it is rebuilt automatically whenever the CSV changes.
+    It is saved in the Feather format if pyarrow is installed, and as a
+    pickle otherwise.
 
     Parameters
     ----------
-    Respondus_table : pandas.DataFrame
-        A Respondus-formatted table for all of the questions to format to a
-        text file
-        
-    fpath : str
-        Filepath to save the text file to
+    filename : str
+        Path to the CSV file.
 
     Returns
     -------
-    None.
+    input_table : pandas.DataFrame
+        The loaded table.
 
     '''
-    text = ''
+    import json
+    import hashlib
+    import pandas as pd
     
-    # Loop through each question in the question table and format
-    for i in range(len(Respondus_table)):
-        
-        # Question text
-        question = Respondus_table.loc[i].copy()
-        q_text = (
-            'Points: ' + str(question['Points']) + '\n\n'
-            'Title: ' + question['Title/ID'] + '\n' +
-            str(i+1) + ') ' + question['Question Wording'] + '\n\n')
-        
-        # Feedback text
-        # General feedback
-        #   Note: Due to quirks with Respondus, there is no general feedback
-        #           allowed in multiple choice questions.
-        #           If general feedback is present in the table, it will be
-        #           overwritten by any Correct and Incorrect Feedback.
-        feedback = {
-            'correct'   : '',
-            'incorrect' : ''
-            }
-        if str(question['General Feedback']) != 'nan':
-            feedback['correct']     = question['General Feedback']
-            feedback['incorrect']   = question['General Feedback']
-        if str(question['Correct Feedback']) != 'nan':
-            feedback['correct']     = question['Correct Feedback']
-        if str(question['Incorrect Feedback']) != 'nan':
-            feedback['incorrect']   = question['Incorrect Feedback']
-        # Write the feedback
-        if feedback['correct']:
-                q_text = q_text + '~ ' + feedback['correct'] + '\n'
-        if feedback['incorrect']:
-                q_text = q_text + '@ ' + feedback['incorrect'] + '\n'
-        if any(feedback.values()):
-            q_text = q_text + '\n'
-            
-        # Possible answer text
-        answers = [x for x in question[['Choice 1', 'Choice 2', 'Choice 3',
-                                        'Choice 4', 'Choice 5', 'Choice 6',
-                                        'Choice 7', 'Choice 8', 'Choice 9',
-                                        'Choice 10']] if str(x) != 'nan']
-        for n, answer in enumerate(answers):
-            # Generic answer text
-            ans_text = MC_letters[n] + ') ' + answer + '\n'
-            # Add a * for correct answers
-            if n+1 == question['Correct Answer']:
-                q_text = q_text + '*' + ans_text
-            # Don't for incorrect answers
+    dirPath, name = os.path.split(os.path.abspath(filename))
+    cache_path = os.path.join(dirPath, '.' + name + '.cache')
+    key_path = cache_path + '.json'
+    stat = os.stat(filename)
+    key = {
+        'path'      : os.path.abspath(filename),
+        'size'      : stat.st_size,
+        'mtime_ns'  : stat.st_mtime_ns,
+        'pandas'    : pd.__version__
+        }
+    
+    # Load the key of the existing cache, if there is one
+    try:
+        with open(key_path, encoding='utf-8') as f:
+            cached_key = json.load(f)
+    except (OSError, ValueError):
+        cached_key = {}
+    
+    # Only hash the file if its size and modification time don't match
+    fresh = all(cached_key.get(k) == v for k, v in key.items())
+    if not fresh:
+        sha256 = hashlib.sha256()
+        with open(filename, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha256.update(block)
+        key['sha256'] = sha256.hexdigest()
+        fresh = (cached_key.get('sha256') == key['sha256'] and
+                 cached_key.get('size') == key['size'] and
+                 cached_key.get('pandas') == key['pandas'])
+    else:
+        key['sha256'] = cached_key['sha256']
+    
+    if fresh:
+        try:
+            if cached_key.get('format') == 'feather':
+                input_table = pd.read_feather(cache_path)
             else:
-                q_text = q_text + ans_text
-                
-        text = text + q_text + '\n'
-    
-    # Save text to a text file
-    with open(fpath, 'w', encoding='utf-8') as f:
-        f.write(text)
-        f.close()
-        
-        
-def genRandomAnswerSet(all_possible_answers, correct_answer, n):
+                input_table = pd.read_pickle(cache_path)
+            if cached_key.get('mtime_ns') != key['mtime_ns']:
+                # Same content, new modification time: update the key
+                key['format'] = cached_key.get('format')
+                writeCacheKey(key_path, key)
+            return input_table
+        except Exception:
+            # Unreadable cache: fall back to parsing the CSV
+            pass
+    
+    # Parse the CSV and save the cache
+    #   Both files are written under temporary names and then moved into
+    #   place, so that parallel jobs never read a half-written cache.
+    input_table = pd.read_csv(filename)
+    tmp_path = cache_path + '.' + str(os.getpid())
+    try:
+        try:
+            input_table.to_feather(tmp_path)
+            key['format'] = 'feather'
+        except (ImportError, ValueError, TypeError):
+            input_table.to_pickle(tmp_path, compression=None)
+            key['format'] = 'pickle'
+        os.replace(tmp_path, cache_path)
+        writeCacheKey(key_path, key)
+    except OSError:
+        # The cache is optional; carry on if it can't be saved
+        pass
+    
+    return input_table
+
+
+def writeCacheKey(key_path, key):
+    '''
+    Saves the key of a parsed-table cache (see readInputCSV).
+    '''
+    import json
+    tmp_path = key_path + '.' + str(os.getpid())
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(key, f)
+    os.replace(tmp_path, key_path)
+
+
+def iterInputTable(filename, usecols = None, difficulty = None,
+                   type_contains = None, chunksize = 10000):
+    '''
+    Reads the input table in chunks, keeping only the columns that are
+    needed and only the rows that pass the filters, so that memory use is
+    bounded by the chunk size rather than the size of the file.
+
+    Parameters
+    ----------
+    filename : str
+        Path to the table.
+    usecols : list of str
+        Columns to read. Defaults to all of them.
+    difficulty : str
+        Difficulty level to keep (see trimDifficulty).
+    type_contains : str
+        If given, only rows whose 'Type' contains this text are kept.
+    chunksize : int
+        Number of rows to read at a time.
+
+    Yields
+    ------
+    in_table : pandas.DataFrame
+        The next chunk of trimmed rows, re-indexed from 0.
+
+    '''
+    import pandas as pd
+    for chunk in pd.read_csv(filename, usecols=usecols, chunksize=chunksize):
+        if type_contains:
+            chunk = chunk[chunk['Type'].str.contains(type_contains)==True]
+        yield trimDifficulty(chunk, difficulty)
+
+
+def readDifficultyLevels(filename, chunksize = 100000):
+    '''
+    Returns the set of difficulty levels in an input table, reading only its
+    'Difficulty' column, in chunks.
+    '''
+    levels = set()
+    for chunk in iterInputTable(filename, ['Difficulty'], chunksize=chunksize):
+        levels.update(chunk['Difficulty'])
+    return levels
+
+
+def selectDifficulty(input_table, difficulty = None, levels = None):
+    '''
+    Has the user select the difficulty from the difficulty list present in
+    the input table, unless a difficulty level is already given.
+
+    Parameters
+    ----------
+    input_table : pandas.DataFrame
+        The loaded input table, containing a 'Difficulty' column.
+    difficulty : str
+        Difficulty level to use. If not given, the user is asked.
+    levels : set of str
+        Difficulty levels to offer, if the input table isn't loaded.
+
+    Returns
+    -------
+    difficulty : str
+        The selected difficulty level.
+
+    '''
+    if difficulty is None:
+        if RunSettings.HEADLESS:
+            return 'all'
+        if levels is None:
+            levels = set(input_table['Difficulty'])
+        diff_levels = ', '.join(list(levels))
+        difficulty = input(
+            'Select the difficulty level for the question bank. Options are:  '
+            + 'all, ' + diff_levels + '\n')
+    return difficulty
+
+
+def trimDifficulty(in_table, difficulty):
+    '''
+    Trims a table to the rows with the designated difficulty level.
+    A difficulty level of 'all' (or None) keeps all rows.
+
+    Parameters
+    ----------
+    in_table : pandas.DataFrame
+        Table with a 'Difficulty' column.
+    difficulty : str
+        Difficulty level to keep.
+
+    Returns
+    -------
+    in_table : pandas.DataFrame
+        The trimmed table, re-indexed from 0.
+
+    '''
+    if difficulty not in (None, 'all'):
+        in_table = in_table[in_table['Difficulty']==difficulty]
+    return in_table.reset_index(drop=True)
+
+
+def newRespondusTable():
+    '''
+    Returns a new, empty Respondus table. Each question bank is built in its
+    own table so that banks generated in the same run don't share state.
+    
+    The table is a QuestionStore, which is filled like a DataFrame but
+    stores repeated values and empty columns compactly.
+    '''
+    return QuestionStore(Respondus_columns)
+
+
+def saveBank(Respondus_table, bank_name, dirPath, fname, out_path = None):
+    '''
+    Saves a Respondus table as a CSV file and as a Respondus-formatted
+    text file.
+
+    Parameters
+    ----------
+    Respondus_table : QuestionStore
+        The Respondus table to save.
+    bank_name : str
+        Name of the question bank, used for the status message.
+    dirPath : str
+        Default directory to save to.
+    fname : str
+        Default file name (without extension) to save to.
+    out_path : str
+        Path to save to instead of the default. Any .csv or .txt extension
+        is replaced.
+
+    Returns
+    -------
+    csv_path : str
+        Path to the saved CSV file.
+    txt_path : str
+        Path to the saved Respondus text file.
+
+    '''
+    if out_path:
+        dirPath, fname = os.path.split(os.path.splitext(out_path)[0])
+    base = os.path.join(dirPath, fname)
+    
+    # Save the Respondus table file
+    Respondus_table.to_csv(base + '.csv', index=False)
+    print('Generated ' + bank_name + ' question bank and saved it to ' + 
+          base + '.csv')
+    
+    # Build and save the Respondus text file
+    if RunSettings.INCREMENTAL:
+        n_rendered, n_reused = build_MC_bank_incremental(
+            Respondus_table, base + '.txt')
+        print(' and ' + fname + '.txt (' + str(n_rendered) + ' rendered, '
+              + str(n_reused) + ' unchanged)')
+    else:
+        build_MC_bank(Respondus_table, base + '.txt')
+        print(' and ' + fname + '.txt')
+    saved_files.extend([base + '.csv', base + '.txt'])
+    
+    # Export the Canvas QTI package
+    if RunSettings.QTI:
+        saveQTI(Respondus_table, bank_name, base)
+    
+    return base + '.csv', base + '.txt'
+
+
+def saveBankChunks(Respondus_tables, bank_name, dirPath, fname,
+                   out_path = None):
+    '''
+    Saves a question bank that is built a chunk at a time, appending each
+    chunk's Respondus table to the CSV file and to the Respondus-formatted
+    text file as it arrives.
+
+    Parameters
+    ----------
+    Respondus_tables : iterable of QuestionStore
+        Respondus tables for consecutive chunks of the question bank.
+    bank_name, dirPath, fname, out_path
+        As for saveBank.
+
+    Returns
+    -------
+    n : int
+        Number of questions saved.
+
+    '''
+    if out_path:
+        dirPath, fname = os.path.split(os.path.splitext(out_path)[0])
+    base = os.path.join(dirPath, fname)
+    
+    n = 0
+    removeManifest(base + '.txt')
+    with open(base + '.txt', 'w', encoding='utf-8') as f:
+        # Write the header even if there are no questions
+        newRespondusTable().to_csv(base + '.csv', index=False)
+        for Respondus_table in Respondus_tables:
+            Respondus_table.to_csv(
+                base + '.csv', index=False, mode='a', header=False)
+            n = n + writeMCQuestions(
+                f, iterMCQuestions(Respondus_table), start = n+1)
+    print('Generated ' + bank_name + ' question bank (' + str(n) +
+          ' questions) and saved it to ' + base + '.csv')
+    print(' and ' + fname + '.txt')
+    saved_files.extend([base + '.csv', base + '.txt'])
+    
+    # Export the Canvas QTI package, reading the questions back from the
+    #   CSV file a chunk at a time
+    if RunSettings.QTI:
+        saveQTI(base + '.csv', bank_name, base)
+    
+    return n
+
+
+def saveQTI(source, bank_name, base):
+    '''
+    Exports a question bank as a Canvas QTI package, saved to base + '.zip'.
+    source is a Respondus table or the path to its CSV file.
+    '''
+    from QTIExport import build_QTI_package
+    n, n_embeds = build_QTI_package(
+        source, base + '.zip', title = os.path.basename(base))
+    print(' and ' + os.path.basename(base) + '.zip (QTI, ' + str(n_embeds)
+          + ' shared embeds)')
+    saved_files.append(base + '.zip')
+
+
+def buildBank(fill, bank_name, fname, title, input_file = None,
+              difficulty = None, out_path = None, chunksize = None,
+              usecols = None, type_contains = None, levels_optional = False):
+    '''
+    Loads an input table, trims it to the designated difficulty level, and
+    fills in and saves a Respondus table from it.
+    
+    If chunksize is given, the input table is streamed instead: it is read
+    chunksize rows at a time, only the columns in usecols are read, the
+    filters are applied to each chunk as it is read, and each chunk's
+    questions are saved before the next chunk is read.
+
+    Parameters
+    ----------
+    fill : function
+        Function(in_table, difficulty) that fills in and returns a Respondus
+        table from (a chunk of) the trimmed input table.
+    bank_name : str
+        Name of the question bank, used for the status message.
+    fname : str
+        Default file name (without extension) to save to.
+    title : str
+        Title for the file selection user interface.
+    input_file, difficulty, out_path
+        As for the format_* scripts.
+    chunksize : int
+        Number of rows to read at a time. If not given, the whole input
+        table is loaded at once.
+    usecols : list of str
+        Columns of the input table that fill uses.
+    type_contains : str
+        If given, only rows whose 'Type' contains this text are kept.
+    levels_optional : bool
+        If True, the difficulty level is only used when the input table has
+        more than one; otherwise difficulty is set to None and all rows kept.
+
+    Returns
+    -------
+    Respondus_table : QuestionStore
+        The generated Respondus table, or None if the input was streamed.
+
+    '''
+    if chunksize:
+        filename = pickInputFile(title, filename = input_file)
+        dirPath = os.path.dirname(filename)
+        if difficulty is None or levels_optional:
+            levels = readDifficultyLevels(filename)
+            if levels_optional and len(levels) <= 1:
+                difficulty = None
+            else:
+                difficulty = selectDifficulty(None, difficulty, levels)
+        chunks = iterInputTable(
+            filename, usecols, difficulty, type_contains, chunksize)
+        saveBankChunks((fill(in_table, difficulty) for in_table in chunks),
+                       bank_name, dirPath, fname, out_path)
+        return None
+    
+    # Get input table
+    input_table, dirPath = getInputTable(title, filename = input_file)
+    
+    # Have user select the difficulty from the difficulty list present in
+    #   the input table
+    if levels_optional and len(set(input_table['Difficulty'])) <= 1:
+        difficulty = None
+    else:
+        difficulty = selectDifficulty(input_table, difficulty)
+    
+    # Trim the table to the designated type and difficulty level
+    if type_contains:
+        input_table = input_table[
+            input_table['Type'].str.contains(type_contains)==True]
+    in_table = trimDifficulty(input_table, difficulty)
+    
+    # Fill in Respondus table
+    Respondus_table = fill(in_table, difficulty)
+    
+    # Save the Respondus table file and the Respondus text file
+    saveBank(Respondus_table, bank_name, dirPath, fname, out_path)
+    
+    return Respondus_table
+
+
+def mapAnswerKey(labels, answer_key, default = None, label_name = 'Type'):
+    '''
+    Maps the labels in an input table column (such as rock types) to the
+    numbers of the choices that are the correct answers, all at once.
+    Each distinct label is looked up in the answer key only once.
+
+    Parameters
+    ----------
+    labels : pandas.Series or list
+        Label of each question.
+    answer_key : dict
+        Dict of label : choice number. Several labels (such as
+        'sedimentary' and 'sedimentary rock') can map to the same choice.
+    default : int
+        Choice number for labels that are not in the answer key. If not
+        given, any label that is not in the answer key is an error.
+    label_name : str
+        Name of the labels, used in the error message.
+
+    Raises
+    ------
+    ValueError
+        If any labels are not in the answer key, listing every such label
+        and how many questions have it.
+
+    Returns
+    -------
+    answers : numpy.ndarray of int
+        The correct choice number of each question.
+
+    '''
+    import numpy as np
+    import pandas as pd
+    codes, uniques = pd.factorize(pd.Series(labels), use_na_sentinel=False)
+    uniques = list(uniques)
+    
+    # Look up each distinct label
+    missing = [label for label in uniques if label not in answer_key]
+    if missing and default is None:
+        counts = np.bincount(codes, minlength=len(uniques))
+        raise ValueError(
+            'No answer for ' + label_name + ' label(s) '
+            + ', '.join(repr(label) + ' (' + str(counts[uniques.index(label)])
+                        + ' questions)' for label in missing)
+            + '. Expected one of: ' + ', '.join(map(repr, answer_key)))
+    choices = np.array([answer_key.get(label, default) for label in uniques],
+                       dtype=int)
+    
+    return choices[codes]
+
+
+def normalizeEmbeds(embeds):
+    '''
+    Normalizes and minifies the embed code of each question (see
+    EmbedCode.py), parsing each distinct embed only once. Embeds are cached
+    across chunks and bank types for the rest of the run, and the bytes
+    saved are added to EmbedCode.embed_stats. If RunSettings.MINIFY_EMBEDS
+    is off, the embed code is returned as it is.
+
+    Parameters
+    ----------
+    embeds : pandas.Series
+        Embed code of each question (such as the 'Embed' column of an input
+        table).
+
+    Returns
+    -------
+    embeds : pandas.Series
+        The normalized embed code of each question, with the same index.
+
+    '''
+    import numpy as np
+    import pandas as pd
+    embeds = pd.Series(embeds)
+    if not RunSettings.MINIFY_EMBEDS:
+        return embeds
+    codes, uniques = pd.factorize(embeds, use_na_sentinel=False)
+    counts = np.bincount(codes, minlength=len(uniques))
+    normalized = np.empty(len(uniques), dtype=object)
+    for k, embed in enumerate(uniques):
+        normalized[k] = normalizeEmbed(embed)
+        countEmbeds(embed, normalized[k], int(counts[k]))
+    return pd.Series(normalized[codes], index=embeds.index)
+
+
+def getRNG(rng = None):
+    '''
+    Returns a numpy Generator to draw random answers with. rng can be a
+    Generator (returned as is) or a seed for one. If it is not given, the
+    Generator is seeded from numpy's global random state, which
+    genRandomAnswerSet also draws from, so that numpy.random.seed (set by the
+    --seed argument) makes every random draw reproducible.
+    '''
+    import numpy as np
+    if rng is None:
+        rng = np.random.randint(2**32, dtype=np.int64)
+    return np.random.default_rng(rng)
+
+
+def genRandomAnswerSet(all_possible_answers, correct_answer, n, rng = None):
     '''
     Generates a random set of n answers from a list of possible answers
     for a question given one correct answer.
@@ -176,6 +654,9 @@ def genRandomAnswerSet(all_possible_answers, correct_answer, n):
         The correct answer to include.
     n_answers : int
         Number of answers to return.
+    rng : numpy.random.Generator
+        Random number generator to draw with, for reproducible answer sets.
+        Defaults to numpy's global random state.
 
     Returns
     -------
@@ -185,493 +666,425 @@ def genRandomAnswerSet(all_possible_answers, correct_answer, n):
         Index in the return list of the correct answer
 
     '''
+    import numpy as np
+    if rng is None: rng = np.random
     a = list(range(len(all_possible_answers)))
     index_correct = all_possible_answers.index(correct_answer)
     a.remove(a[index_correct])
-    ans_list = list(np.random.choice(a,n-1,replace=False))
+    ans_list = list(rng.choice(a,n-1,replace=False))
     ans_list.append(index_correct)
     ans_list.sort()
     return_list = [all_possible_answers[x] for x in ans_list]
     i = return_list.index(correct_answer)
     
     return return_list, i
-        
 
-####################
-# QUESTION BANK SCRIPTS
-####################
 
-def format_RockOrMineral3D():
+def genRandomAnswerSets(all_possible_answers, correct_answers, n, rng = None):
     '''
-    Formats a Respondus-formatted text file
-    for a "Rock or mineral?" question set that uses interactive 3D rock models.
+    Generates random sets of n answers for many questions at once, in one
+    vectorized operation. This gives the same kind of answer sets as calling
+    genRandomAnswerSet for each question.
     
-    Copy and modify this def to create new question bank types.
-    
-    This example imports a spreadsheet with the columns
-        'Type' (type of rock that students need to identify)
-        'Difficulty' (difficulty of the identification, which is used in this
-                      script to trim the question set to just questions with
-                      a designated difficulty level)
-        'Embed' (the HTML embed code containing the 3D rock model that students
-                 will identify)
-        'Description' (text that forms the general feedback for the question)
-        
-    It then generates Respondus-formatted multiple choice questions that test
-    students' ability to identify the rocks they are shown.
+    Each question draws a random key for every possible answer, with the
+    correct answer's key forced to the front; the n smallest keys (found with
+    argpartition) pick the answer set, which is then put back in the order of
+    the list of possible answers.
+
+    Parameters
+    ----------
+    all_possible_answers : list of str
+        List of all possible answers to draw from. If sorted output sets are
+        desired, the input list should be already sorted.
+    correct_answers : list of str
+        The correct answer to include for each question.
+    n : int
+        Number of answers per question.
+    rng : numpy.random.Generator or int
+        Random number generator to draw with, or a seed for one, for
+        reproducible answer sets. Defaults to a Generator seeded from numpy's
+        global random state (see getRNG).
+
+    Returns
+    -------
+    choices : numpy.ndarray
+        Matrix with one row of n answers for each question.
+    i : numpy.ndarray of int
+        Index in each row of the correct answer.
+
     '''
-    # Get input table
-    input_table, dirPath = getInputTable(
-        'Select rock and mineral 3D model list for the question bank (CSV)')
+    import numpy as np
+    rng = getRNG(rng)
+    pool = np.asarray(all_possible_answers, dtype=object)
     
-    # Have user select the difficulty from the difficulty list present in
-    #   the input table
-    diff_levels = ', '.join(list(set(input_table['Difficulty'])))
-    difficulty = input(
-        'Select the difficulty level for the question bank. Options are:  '
-        + 'all, ' + diff_levels + '\n')
-    
-    # Trim the table based on the difficulty level
-    in_table = input_table.copy()
-    if difficulty == 'easy':
-        in_table = in_table[in_table['Difficulty']=='easy']
-    elif difficulty == 'moderate':
-        in_table = in_table[in_table['Difficulty']=='moderate']
-    in_table = in_table.reset_index(drop=True)
+    # Find each correct answer in the list of possible answers
+    #   (looking up each distinct answer only once)
+    index = {ans : k for k, ans in enumerate(all_possible_answers)}
+    answers, inverse = np.unique(
+        np.asarray(correct_answers, dtype=object).astype(str),
+        return_inverse=True)
+    missing = [ans for ans in answers if ans not in index]
+    if missing:
+        raise ValueError(
+            'Correct answers not in the list of possible answers: '
+            + ', '.join(missing))
+    correct_idx = np.array(
+        [index[ans] for ans in answers], dtype=int)[inverse.reshape(-1)]
     
-    # Fill in Respondus table
-    # Type of question
-    Respondus_table['Type'] = ['MC'] * len(in_table)
-    # Question title
-    Respondus_table['Title/ID'] = (
-        ['Rock or mineral? Level ' + difficulty] * len(in_table))
-    # Number of points per question
-    Respondus_table['Points'] = [1] * len(in_table)
-    # Wording of the question
-    Respondus_table['Question Wording'] = (
-        "[HTML]<p>Is this a rock or a mineral?</p>"
-        + in_table['Embed'] + '[/HTML]')
-    # Multiple choice possible answers
-    Respondus_table['Choice 1'] = ['rock'] * len(in_table)
-    Respondus_table['Choice 2'] = ['mineral'] * len(in_table)
-    # Feedback
-    Respondus_table['General Feedback'] = in_table['Description']
-    
-    # Generate correct answers from values in the input table
-    answers = in_table['Type'].values
-    for i in range(len(answers)):
-        if answers[i]=='mineral':
-            answers[i] = 2
-        else:
-            answers[i] = 1
-    Respondus_table['Correct Answer'] = answers
+    # Pick the correct answer plus n-1 random others for each question
+    rows = np.arange(len(correct_idx))
+    keys = rng.random((len(correct_idx), len(pool)))
+    keys[rows, correct_idx] = -1
+    selected = np.argpartition(keys, n-1, axis=1)[:, :n]
+    selected.sort(axis=1)
     
-    # Save the Respondus table file
-    fname = 'Respondus_RockOrMineral'    
-    Respondus_table.to_csv(dirPath + '/' + fname + '.csv',
-                           index=False)
-    print('Generated RockOrMineral question bank and saved it to ' + 
-          dirPath + '/' + fname + '.csv')
+    choices = pool[selected]
+    i = (selected == correct_idx[:, None]).argmax(axis=1)
     
-    # Build and save the Respondus text file
-    build_MC_bank(Respondus_table, dirPath + '/' + fname + '.txt')
-    print(' and ' + fname + '.txt')
-    
-    return Respondus_table
+    return choices, i
+        
 
+####################
+# QUESTION BANK SCRIPTS
+####################
 
-def format_RockCycleClassification3D():
+def getBankType(bank_type):
     '''
-    Formats a Respondus-formatted text file
-    for a rock cycle classification question set that uses
-    interactive 3D rock models.
-    
-    This example imports a spreadsheet with the columns
-        'Type' (type of rock that students need to identify)
-        'Difficulty' (difficulty of the identification, which is used in this
-                      script to trim the question set to just questions with
-                      a designated difficulty level)
-        'Embed' (the HTML embed code containing the 3D rock model that students
-                 will identify)
-        'Description' (text that forms the general feedback for the question)
-        
-    It then generates Respondus-formatted multiple choice questions that test
-    students' ability to classify the rocks they are shown as being
-    sedimentary, extrusive igneous, intrusive igneous, metamorphic, or mineral.
+    Imports the module for a type of question bank and returns its script.
+
+    Parameters
+    ----------
+    bank_type : str
+        Type of question bank (one of BankTypes).
+
+    Returns
+    -------
+    format_bank : function
+        The format_ script that generates that type of question bank.
+
     '''
-    # Get input table
-    input_table, dirPath = getInputTable(
-        'Select rock and mineral 3D model list for the question bank (CSV)')
-    
-    # Have user select the difficulty from the difficulty list present in
-    #   the input table
-    diff_levels = ', '.join(list(set(input_table['Difficulty'])))
-    difficulty = input(
-        'Select the difficulty level for the question bank. Options are:  '
-        + 'all, ' + diff_levels + '\n')
-    
-    # Trim the table based on the difficulty level
-    in_table = input_table.copy()
-    if difficulty == 'easy':
-        in_table = in_table[in_table['Difficulty']=='easy']
-    elif difficulty == 'moderate':
-        in_table = in_table[in_table['Difficulty']=='moderate']
-    in_table = in_table.reset_index(drop=True)
-    
-    # Fill in Respondus table
-    # Type of question
-    Respondus_table['Type'] = ['MC'] * len(in_table)
-    # Question title
-    Respondus_table['Title/ID'] = (
-        ['Rock Cycle Rock Classification Level ' + difficulty] * len(in_table))
-    # Number of points per question
-    Respondus_table['Points'] = [1] * len(in_table)
-    # Wording of the question
-    Respondus_table['Question Wording'] = (
-        "[HTML]<p>What kind of rock is this?</p>"
-        + in_table['Embed'] + '[/HTML]')
-    # Multiple choice possible answers
-    Respondus_table['Choice 1'] = ['mineral'] * len(in_table)
-    Respondus_table['Choice 2'] = ['sedimentary'] * len(in_table)
-    Respondus_table['Choice 3'] = ['extrusive igenous'] * len(in_table)
-    Respondus_table['Choice 4'] = ['intrusive igenous'] * len(in_table)
-    Respondus_table['Choice 5'] = ['metamorphic'] * len(in_table)
-    # Feedback
-    Respondus_table['General Feedback'] = in_table['Description']
-    
-    # Generate correct answers from values in the input table
-    answers = in_table['Type'].values
-    for i in range(len(answers)):
-        if answers[i]=='mineral':
-            answers[i] = 1
-        if answers[i]=='sedimentary rock':
-            answers[i] = 2
-        if answers[i]=='extrusive igneous':
-            answers[i] = 3
-        if answers[i]=='intrusive igneous':
-            answers[i] = 4
-        if answers[i]=='metamorphic':
-            answers[i] = 5
-    Respondus_table['Correct Answer'] = answers
-    
-    # Save the Respondus table file
-    fname = 'Respondus_RockCycleClassification'    
-    Respondus_table.to_csv(dirPath + '/' + fname + '.csv',
-                           index=False)
-    print('Generated RockCycleClassification question bank and saved it to ' + 
-          dirPath + '/' + fname + '.csv')
-    
-    # Build and save the Respondus text file
-    build_MC_bank(Respondus_table, dirPath + '/' + fname + '.txt')
-    print(' and ' + fname + '.txt')
-    
-    return Respondus_table
+    if bank_type not in BankTypes:
+        raise ValueError(
+            'Unknown question bank type: ' + bank_type + '. Options are: '
+            + ', '.join(BankTypes))
+    module = importlib.import_module('QuestionBanks.' + bank_type)
+    return getattr(module, 'format_' + bank_type)
+
+
+def __getattr__(name):
+    # Bank type scripts can still be used as GenerateQuestionBanks.format_*,
+    #   but their modules are only imported on first use
+    if name.startswith('format_') and name[len('format_'):] in BankTypes:
+        return getBankType(name[len('format_'):])
+    raise AttributeError(
+        'module ' + repr(__name__) + ' has no attribute ' + repr(name))
 
 
-def format_IgneousClassification3D():
+####################
+# BATCH SCRIPTS
+####################
+
+def readManifest(manifest_path):
     '''
-    Formats a Respondus-formatted text file
-    for an igneous rock classification question set that uses
-    interactive 3D rock models.
+    Reads a batch manifest listing the question banks to generate.
     
-    This example imports a spreadsheet with the columns
-        'Type' (type of rock that students need to identify)
-        'Felsic-Mafic' (whether the rock composition is felsic, mafic, or 
-                        intermediate)
-        'Difficulty' (difficulty of the identification, which is used in this
-                      script to trim the question set to just questions with
-                      a designated difficulty level)
-        'Embed' (the HTML embed code containing the 3D rock model that students
-                 will identify)
-        'Description' (text that forms the general feedback for the question)
-        
-    It then generates Respondus-formatted multiple choice questions that test
-    students' ability to classify the igneous rocks they are shown as being
-    extrusive or intrusive and felsic, intermediate, or mafic.
+    The manifest is a CSV file with the columns
+        'BankType'      Type of question bank (one of BankTypes)
+        'Input'         Path to the input table (blank for banks generated
+                            de novo)
+        'Difficulty'    Difficulty level (blank for all)
+        'Output'        Path to save the question bank to (blank for the
+                            default location)
+    Relative paths are relative to the manifest's directory. A Difficulty of
+    '*' generates the bank at every difficulty level (see expandJobs).
+
+    Parameters
+    ----------
+    manifest_path : str
+        Path to the manifest CSV file.
+
+    Returns
+    -------
+    jobs : list of dict
+        One dict per question bank, keyed by the manifest columns.
+
     '''
-    # Get input table
-    input_table, dirPath = getInputTable(
-        'Select rock and mineral 3D model list for the question bank (CSV)')
-    
-    # Have user select the difficulty from the difficulty list present in
-    #   the input table
-    diff_levels = ', '.join(list(set(input_table['Difficulty'])))
-    difficulty = input(
-        'Select the difficulty level for the question bank. Options are:  '
-        + 'all, ' + diff_levels + '\n')
-    
-    # Trim the table to igneous rocks only
-    in_table = input_table.copy()
-    in_table = in_table[in_table['Type'].str.contains('igneous')==True]
-    
-    # Trim the table based on the difficulty level
-    if difficulty == 'easy':
-        in_table = in_table[in_table['Difficulty']=='easy']
-    elif difficulty == 'moderate':
-        in_table = in_table[in_table['Difficulty']=='moderate']
-    in_table = in_table.reset_index(drop=True)
-    
-    # Fill in Respondus table
-    # Type of question
-    Respondus_table['Type'] = ['MC'] * len(in_table)
-    # Question title
-    Respondus_table['Title/ID'] = (
-        ['Igneous Rock Classification Level ' + difficulty] * len(in_table))
-    # Number of points per question
-    Respondus_table['Points'] = [1] * len(in_table)
-    # Wording of the question
-    Respondus_table['Question Wording'] = (
-        "[HTML]<p>How did this rock form?</p>"
-        + in_table['Embed'] + '[/HTML]')
-    
-    # Multiple choice possible answers
-    answer_set = {
-        'extrusive igneous felsic'          :  {
-            'choice'        : 1,
-            'type'          : 'extrusive igneous',
-            'composition'   : 'felsic',
-            'formation'     : ('Formed during an eruption ' + 
-                               '(extrusive igneous) of felsic lava')
-            },
-        'extrusive igneous intermediate'    :  {
-            'choice'        : 2,
-            'type'          : 'extrusive igneous',
-            'composition'   : 'intermediate',
-            'formation'     : ('Formed during an eruption ' + 
-                               '(extrusive igneous) of lava ' +
-                               'of intermediate composition')
-            },
-        'extrusive igneous mafic'           :  {
-            'choice'        : 3,
-            'type'          : 'extrusive igneous',
-            'composition'   : 'mafic',
-            'formation'     : ('Formed during an eruption ' + 
-                               '(extrusive igneous) of mafic lava')
-            },
-        'intrusive igneous felsic'          :  {
-            'choice'        : 4,
-            'type'          : 'intrusive igneous',
-            'composition'   : 'felsic',
-            'formation'     : ('Felsic magma cooled slowly inside the Earth')
-            },
-        'intrusive igneous intermediate'    :  {
-            'choice'        : 5,
-            'type'          : 'intrusive igneous',
-            'composition'   : 'intermediate',
-            'formation'     : ('Intermediate composition magma ' +
-                               ' cooled slowly inside the Earth')
-            },
-        'intrusive igneous mafic'           :  {
-            'choice'        : 6,
-            'type'          : 'intrusive igneous',
-            'composition'   : 'mafic',
-            'formation'     : ('Mafic magma cooled slowly inside the Earth')
-            }
-        }
-    for ans in answer_set:
-        Respondus_table['Choice ' + str(answer_set[ans]['choice'])] = (
-            answer_set[ans]['formation']
-            )
+    manifest_dir = os.path.dirname(os.path.abspath(manifest_path))
+    jobs = []
+    with open(manifest_path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            job = {col : (row.get(col) or '').strip()
+                   for col in ['BankType', 'Input', 'Difficulty', 'Output']}
+            if job['BankType'] not in BankTypes:
+                raise ValueError(
+                    'Unknown bank type in manifest: ' + job['BankType'])
+            for col in ['Input', 'Output']:
+                if job[col]:
+                    job[col] = os.path.join(manifest_dir, job[col])
+            jobs.append(job)
+    return jobs
 
-    # Feedback
-    Respondus_table['General Feedback'] = in_table['Description'].values
-    
-    # Generate correct answers from values in the input table
-    for i in in_table.index:
-        ans = in_table.loc[i]['Type'] + ' ' + in_table.loc[i]['Felsic-Mafic']
-        Respondus_table.at[i,'Correct Answer'] = answer_set[ans]['choice']
-    
-    # Save the Respondus table file
-    fname = 'Respondus_IgneousClassification'    
-    Respondus_table.to_csv(dirPath + '/' + fname + '.csv',
-                           index=False)
-    print('Generated IgneousClassification question bank and saved it to ' + 
-          dirPath + '/' + fname + '.csv')
-    
-    # Build and save the Respondus text file
-    build_MC_bank(Respondus_table, dirPath + '/' + fname + '.txt')
-    print(' and ' + fname + '.txt')
-    
-    return Respondus_table
+
+def runJob(job):
+    '''
+    Generates the question bank for one batch job (a dict as returned by
+    readManifest) without prompting the user. The run settings are put back
+    as they were once the job is done.
+    '''
+    settings = (RunSettings.HEADLESS, RunSettings.INCREMENTAL,
+                RunSettings.QTI, RunSettings.MINIFY_EMBEDS)
+    RunSettings.HEADLESS = True
+    RunSettings.INCREMENTAL = bool(
+        job.get('Incremental', RunSettings.INCREMENTAL))
+    RunSettings.QTI = bool(job.get('QTI', RunSettings.QTI))
+    RunSettings.MINIFY_EMBEDS = bool(
+        job.get('MinifyEmbeds', RunSettings.MINIFY_EMBEDS))
+    # Each job starts from the same random state, whichever process runs it
+    if job.get('Seed') is not None:
+        import numpy as np
+        np.random.seed(job['Seed'])
+    try:
+        return getBankType(job['BankType'])(
+            input_file = job['Input'] or None,
+            difficulty = job['Difficulty'] or 'all',
+            out_path = job['Output'] or None,
+            chunksize = job.get('Chunksize'))
+    finally:
+        (RunSettings.HEADLESS, RunSettings.INCREMENTAL, RunSettings.QTI,
+         RunSettings.MINIFY_EMBEDS) = settings
 
 
-def format_LogScaleIntensity():
+def expandJobs(jobs):
     '''
-    Formats a Respondus-formatted text file
-    for a question set that asks students to interpret earthquake magnitude
-    scales in light of logarithmic changes.
-    
-    This example does not require any imports, but generates the question
-    set de novo.
+    Expands batch jobs with a Difficulty of '*' into one job per difficulty
+    level found in the input table, plus one job for 'all'. Each expanded job
+    gets its own output path, with the difficulty level appended to the file
+    name, so that the jobs can run side by side.
+
+    Parameters
+    ----------
+    jobs : list of dict
+        Batch jobs as returned by readManifest.
+
+    Returns
+    -------
+    expanded : list of dict
+        Batch jobs with a single difficulty level each.
+
     '''
-    # Generate start values
-    startvals = [x/10 for x in range(30,70,1)]
-    itervals = [1,2,3,4]
-    poss_answers = ['3 x', '10 x', '30 x', '100 x', '1,000 x', '10,000 x',
-                    '33,000 x', '100,000 x', '1,000,000 x']
-    amplitude_key = {
-        32      : '30 x',
-        1024    : '1,000 x',
-        32768   : '33,000 x',
-        1048576 : '1,000,000 x'
-        }
-    
-    # Build questions
-    questions = pd.DataFrame(
-        index = list(range(len(startvals))),
-        columns=['x1', 'x2', 'ans', 'Q_Amplitude', 'A_Amplitude',
-                 'Q_Energy', 'A_Energy'])
-    for n in range(len(startvals)):
-        x = startvals[n]
-        i = np.random.choice(itervals)
-        a = itervals.index(i) + 1
-        if x + i <10:
-            x2 = x + i
-        else:
-            x2 = x + np.random.choice([1,2])
-        questions.loc[n]['x1'] = x
-        questions.loc[n]['x2'] = x2
-        questions.loc[n]['ans'] = a
-        questions.loc[n]['Q_Amplitude'] = ( 
-            'Two earthquakes occur in a city. The first measures ' +
-            str(x) + ' on the Richter scale. The second measures ' +
-            str(x2) + '. How much larger is the amplitude of shaking in the '
-            'second earthquake compared to the first?' )
-        questions.loc[n]['A_Amplitude'] =  '{:,}'.format(int(10**i)) + ' x'
-        questions.loc[n]['Q_Energy'] = (
-            'Two earthquakes occur in a city. The first has a moment magnitude'
-            ' of ' + str(x) + '. The second has a moment magnitude of ' +
-            str(x2) + '. Roughly how much more energy was released in the '
-            'second earthquake compared to the first?' )
-        questions.loc[n]['A_Energy'] = amplitude_key[int(32**i)]
-    
-    # Fill in Respondus tables
-    for t in ['Amplitude', 'Energy']:
-        # Question type
-        Respondus_table['Type'] = ['MC'] * len(questions)
-        # Question title
-        Respondus_table['Title/ID'] = [t + ' scale'] * len(questions)
-        # Number of points per question
-        Respondus_table['Points'] = [1] * len(questions)
-        # Wording of the question
-        Respondus_table['Question Wording'] = questions['Q_' + t]
-        
-        # Multiple choice possible answers
-        # Select random incorrect answers
-        n_ans = 5
-        for q in list(questions.index):
-            ans_set, i = genRandomAnswerSet(
-                poss_answers, questions.loc[q]['A_'+ t], n_ans)
-            for n in list(range(n_ans)):
-                Respondus_table.at[q, 'Choice ' + str(n + 1)] = ans_set[n]
-            Respondus_table.at[q, 'Correct Answer'] = i+1
-            
-        # Reset the index
-        Respondus_table.reset_index(inplace=True)
-    
-        # Save the Respondus table file
-        fname = 'Respondus_'     + t
-        dirPath = os.getcwd()
-        Respondus_table.to_csv(dirPath + '/' + fname + '.csv', index=False)
-        print('Generated ' + t + ' question bank and saved it to ' + 
-              dirPath + '/' + fname + '.csv')
-        
-        # Build and save the Respondus text file
-        build_MC_bank(Respondus_table, dirPath + '/' + fname + '.txt')
-        print(' and ' + fname + '.txt')
-        
+    import pandas as pd
+    expanded = []
+    for job in jobs:
+        if job['Difficulty'] != '*':
+            expanded.append(job)
+            continue
+        if job['Input']:
+            levels = pd.read_csv(job['Input'], usecols=['Difficulty'])
+            levels = ['all'] + sorted(set(levels['Difficulty'].dropna()))
+        else: levels = ['all']
+        for level in levels:
+            if job['Output']:
+                out_path = os.path.splitext(job['Output'])[0] + '_' + level
+            else:
+                out_path = os.path.join(
+                    os.path.dirname(job['Input']) or os.getcwd(),
+                    'Respondus_' + job['BankType'] + '_' + level)
+            expanded.append(dict(job, Difficulty = level, Output = out_path))
+    return expanded
 
 
-def format_GenericMC():
-    '''
-    Formats a Respondus-formatted text file for a multiple choice question
-    set imported from a table.
-    
-    This example imports a spreadsheet with the columns
-        'Question group'    Title of question (this part is the same for each
-                               question in the set)
-        'Difficulty'        Question difficulty (can be used to create
-                                different sets based on difficulty)
-        'Points'            Points to award
-        'Question'          Question text
-        'Choice 1'          First possible choice
-        'Choice 2'          Second possible choice
-        'Choice 3'          Third possible choice
-        'Choice 4'          Fourth possible choice
-        'Choice 5'          Fifth possible choice
-        'General'           General feedback for the question
-        
-    It then generates Respondus-formatted multiple choice questions for the set
+def timeJob(job):
     '''
-    # Get input table
-    input_table, dirPath = getInputTable(
-        'Select table containing the question set (CSV)')
-    
-    # Have user select the difficulty from the difficulty list present in
-    #   the input table       
-    # Trim the table based on the difficulty level
-    in_table = input_table.copy()
-    diff_levels = list(set(input_table['Difficulty']))
-    if len(diff_levels)>1:
-        diff_levels = ', '.join(list(set(input_table['Difficulty'])))
-        difficulty = input(
-            'Select the difficulty level for the question bank. Options are:  '
-            + 'all, ' + diff_levels + '\n')
-        if difficulty == 'easy':
-            in_table = in_table[in_table['Difficulty']=='easy']
-        elif difficulty == 'moderate':
-            in_table = in_table[in_table['Difficulty']=='moderate']
-        difficulty_title = ' Level ' + difficulty
-    else: difficulty_title = ''
-    in_table = in_table.reset_index(drop=True)
-    
-    # Fill in Respondus table
-    # Type of question
-    Respondus_table['Type'] = ['MC'] * len(in_table)
-    # Question title
-    Respondus_table['Title/ID'] = (
-        [in_table.iloc[0]['Question group'] + difficulty_title]
-        * len(in_table))
-    # Number of points per question
-    Respondus_table['Points'] = [in_table.iloc[0]['Points']] * len(in_table)
-    # Wording of the question
-    Respondus_table['Question Wording'] = (
-        '[HTML]<p><em>' + in_table['Question group'] + '</em></p>' +
-        '<p>' + in_table['Question'] + '</p>[/HTML]'
-        )
-    # Multiple choice possible answers
-    Respondus_table['Choice 1'] = in_table['Choice 1']
-    Respondus_table['Choice 2'] = in_table['Choice 2']
-    Respondus_table['Choice 3'] = in_table['Choice 3']
-    Respondus_table['Choice 4'] = in_table['Choice 4']
-    #Respondus_table['Choice 5'] = in_table['Choice 5']
-    
-    # Correct answer
-    Respondus_table['Correct Answer'] = in_table['Correct Answer']
-    
-    # Feedback
-    Respondus_table['General Feedback'] = in_table['General']
-    
-    # Save the Respondus table file
-    fname = 'Respondus_RockCycleClassification'    
-    Respondus_table.to_csv(dirPath + '/' + fname + '.csv',
-                           index=False)
-    print('Generated RockCycleClassification question bank and saved it to ' + 
-          dirPath + '/' + fname + '.csv')
+    Runs one batch job and records how long it took, which files it saved
+    and the bytes saved by normalizing its embed code. Used as the worker
+    function for runParallel.
+    '''
+    del saved_files[:]
+    embed_stats.update(dict.fromkeys(embed_stats, 0))
+    start = time.perf_counter()
+    runJob(job)
+    return dict(job, Seconds = time.perf_counter() - start,
+                Files = list(saved_files), Embeds = dict(embed_stats))
+
+
+def runBatch(manifest_path, incremental = False, chunksize = None,
+             qti = False, minify_embeds = False, seed = None):
+    '''
+    Generates every question bank listed in a batch manifest in a single run,
+    without any dialogs or prompts.
+
+    Parameters
+    ----------
+    manifest_path : str
+        Path to the manifest CSV file (see readManifest).
+    incremental : bool
+        Whether to only re-render the questions that changed since each
+        bank was last built.
+    chunksize : int
+        If given, input tables are streamed this many rows at a time.
+    qti : bool
+        Whether to also export each bank as a Canvas QTI package.
+    minify_embeds : bool
+        Whether to normalize and minify the embed code in each question.
+    seed : int
+        Random seed, for reproducible question banks. Each job's random
+        state is seeded with it.
+
+    Returns
+    -------
+    None.
+
+    '''
+    jobs = expandJobs(readManifest(manifest_path))
+    for n, job in enumerate(jobs):
+        job['Incremental'] = incremental
+        job['Chunksize'] = chunksize
+        job['QTI'] = qti
+        job['MinifyEmbeds'] = minify_embeds
+        job['Seed'] = seed
+        print('[' + str(n+1) + '/' + str(len(jobs)) + '] ' + job['BankType'])
+        runJob(job)
+
+
+def runParallel(manifest_path, processes = None, incremental = False,
+                chunksize = None, qti = False, minify_embeds = False,
+                seed = None):
+    '''
+    Generates every question bank listed in a batch manifest, fanning the
+    jobs out across a pool of worker processes. Each worker builds its
+    questions in its own Respondus table.
+
+    Parameters
+    ----------
+    manifest_path : str
+        Path to the manifest CSV file (see readManifest).
+    processes : int
+        Number of worker processes. Defaults to the number of CPUs.
+    incremental : bool
+        Whether to only re-render the questions that changed since each
+        bank was last built.
+    chunksize : int
+        If given, input tables are streamed this many rows at a time.
+    qti : bool
+        Whether to also export each bank as a Canvas QTI package.
+    minify_embeds : bool
+        Whether to normalize and minify the embed code in each question.
+    seed : int
+        Random seed, for reproducible question banks. Each job's random
+        state is seeded with it.
+
+    Returns
+    -------
+    results : list of dict
+        The batch jobs, in manifest order, with the time each took
+        ('Seconds'), the files each saved ('Files') and the size report for
+        its embed code ('Embeds').
+
+    '''
+    from concurrent.futures import ProcessPoolExecutor
+    jobs = [dict(job, Incremental = incremental, Chunksize = chunksize,
+                 QTI = qti, MinifyEmbeds = minify_embeds, Seed = seed)
+            for job in expandJobs(readManifest(manifest_path))]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers = processes) as pool:
+        results = list(pool.map(timeJob, jobs))
+    elapsed = time.perf_counter() - start
     
-    # Build and save the Respondus text file
-    build_MC_bank(Respondus_table, dirPath + '/' + fname + '.txt')
-    print(' and ' + fname + '.txt')
+    # Summarize the jobs
+    for result in results:
+        print('{:>8.2f} s  {} ({})'.format(
+            result['Seconds'], result['BankType'], result['Difficulty']))
+        for fpath in result['Files']:
+            print('            ' + fpath)
+    print('Generated {} question banks in {:.2f} s ({:.2f} s of work)'.format(
+        len(results), elapsed, sum(r['Seconds'] for r in results)))
+    embeds = {key : sum(r['Embeds'][key] for r in results)
+              for key in embed_stats}
+    if embeds['questions']:
+        print(sizeReport(embeds))
     
-    return Respondus_table
+    return results
+
+
 #%%
 ####################
 # MAIN FUNCTION
 ####################
 if __name__ == '__main__':
-    bank_type = input(
-        'What type of question bank do you want to generate? Options are: ' +
-        ', '.join(BankTypes) + '\n')
+    # The bank type modules import their shared scripts from
+    #   GenerateQuestionBanks, so make sure they get this module and its
+    #   settings rather than a second copy
+    sys.modules['GenerateQuestionBanks'] = sys.modules[__name__]
     
-    Respondus_table = globals()['format_'+ bank_type]()
-
+    parser = argparse.ArgumentParser(
+        description='Generates Respondus-formatted question banks.')
+    parser.add_argument(
+        '--batch', metavar='MANIFEST',
+        help='Generate every question bank listed in a manifest CSV file '
+        '(columns BankType, Input, Difficulty, Output) without prompting. '
+        'A Difficulty of * generates the bank at every difficulty level.')
+    parser.add_argument(
+        '--parallel', action='store_true',
+        help='Generate the question banks in the manifest in parallel.')
+    parser.add_argument(
+        '--processes', type=int, default=None,
+        help='Number of worker processes for --parallel '
+        '(default: number of CPUs).')
+    parser.add_argument(
+        '--incremental', action='store_true',
+        help='Only re-render the questions that changed since each Respondus '
+        'text file was last built.')
+    parser.add_argument(
+        '--chunksize', type=int, default=None,
+        help='Stream input tables this many rows at a time instead of '
+        'loading them whole, to bound memory use on very large tables.')
+    parser.add_argument(
+        '--qti', action='store_true',
+        help='Also export each question bank as a QTI package (zip file) '
+        'that can be imported straight into Canvas.')
+    parser.add_argument(
+        '--minify-embeds', action='store_true',
+        help='Normalize and minify the embed code in each question, instead '
+        'of keeping it exactly as it is in the input table.')
+    parser.add_argument(
+        '--variants', type=int, default=None, metavar='N',
+        help='Also save N randomized variants of each question bank, one per '
+        'student, with the possible answers shuffled (see ExamVariants.py).')
+    parser.add_argument(
+        '--seed', type=int, default=None,
+        help='Random seed, for reproducible question banks and variants.')
+    args = parser.parse_args()
+    RunSettings.INCREMENTAL = args.incremental
+    RunSettings.QTI = args.qti
+    RunSettings.MINIFY_EMBEDS = args.minify_embeds
+    
+    if args.batch and args.parallel:
+        results = runParallel(args.batch, args.processes, args.incremental,
+                              args.chunksize, args.qti,
+                              args.minify_embeds, args.seed)
+        saved_files.extend(
+            fpath for result in results for fpath in result['Files'])
+    elif args.batch:
+        runBatch(args.batch, args.incremental, args.chunksize, args.qti,
+                 args.minify_embeds, args.seed)
+    else:
+        if args.seed is not None:
+            import numpy as np
+            np.random.seed(args.seed)
+        bank_type = input(
+            'What type of question bank do you want to generate? Options are: '
+            + ', '.join(BankTypes) + '\n')
+        
+        Respondus_table = getBankType(bank_type)(
+            chunksize = args.chunksize)
+    if embed_stats['questions']:
+        print(sizeReport())
+    
+    # Save the per-student variants of each bank from its saved CSV file,
+    #   rather than generating the bank again for each student
+    if args.variants:
+        from ExamVariants import saveVariants
+        for fpath in saved_files:
+            if fpath.endswith('.csv'):
+                saveVariants(fpath, args.variants, seed = args.seed,
+                             processes = args.processes, qti = args.qti)
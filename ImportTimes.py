@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+@author: cariefrantz
+
+Reports how long each script in this repository, and each of the heavy
+packages they depend on, takes to import. Each module is imported in a fresh
+Python process (using python -X importtime), so the times are the cost a
+short run pays at startup.
+
+Arguments:  Optional list of modules to measure (defaults to the list below)
+
+Example in command line:
+    python ImportTimes.py
+    python ImportTimes.py GenerateQuestionBanks pandas
+
+"""
+
+####################
+# IMPORTS
+####################
+import os
+import sys
+import subprocess
+
+
+####################
+# VARIABLES
+####################
+# Modules to measure by default
+default_modules = [
+    'RespondusText', 'GenerateQuestionBanks', 'Pretty4Canvas',
+    'pandas', 'numpy', 'tkinter']
+
+
+####################
+# SCRIPTS
+####################
+def measureImport(module):
+    '''
+    Imports a module in a fresh Python process and measures its import cost.
+
+    Parameters
+    ----------
+    module : str
+        Name of the module to import.
+
+    Returns
+    -------
+    cumulative : float
+        Time to import the module and everything it imports, in ms.
+    children : dict
+        Cumulative import time (ms) of each module imported directly by it.
+
+    '''
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True)
+    if result.returncode:
+        raise ImportError(result.stderr.strip().splitlines()[-1])
+    
+    # Lines look like "import time:  self [us] | cumulative | imported package"
+    #   with nested imports indented under the module that imported them
+    cumulative = 0.0
+    children = {}
+    pending = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumul_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        if name == module and depth == 0:
+            cumulative = int(cumul_us) / 1000
+            children = pending
+        elif depth == 1:
+            pending[name] = int(cumul_us) / 1000
+        elif depth == 0:
+            pending = {}
+    return cumulative, children
+
+
+def reportImportTimes(modules = default_modules, n_children = 3):
+    '''
+    Prints the import cost of each module, with its most expensive direct
+    imports.
+    '''
+    for module in modules:
+        try:
+            cumulative, children = measureImport(module)
+        except ImportError as e:
+            print('{:<24} not available ({})'.format(module, e))
+            continue
+        print('{:<24} {:>9.1f} ms'.format(module, cumulative))
+        top = sorted(children.items(), key=lambda x: -x[1])[:n_children]
+        for name, ms in top:
+            print('    {:<20} {:>9.1f} ms'.format(name, ms))
+
+
+#%%
+####################
+# MAIN FUNCTION
+####################
+if __name__ == '__main__':
+    reportImportTimes(sys.argv[1:] or default_modules)
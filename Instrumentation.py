@@ -0,0 +1,353 @@
+# -*- coding: utf-8 -*-
+"""
+@author: cariefrantz
+
+Opt-in timing and memory instrumentation for GenerateQuestionBanks.py and
+Pretty4Canvas.py.
+
+The stages of each pipeline (listed in pipeline_stages below) are wrapped
+by name when the script is run through this module, so the scripts
+themselves don't change. For each stage and each input file, it records
+    - the number of calls
+    - the wall time spent in the stage (including any stages it calls; for
+      a stage that streams its results, the time spent producing them)
+    - the peak memory allocated during the stage (with --memory; measured
+      with tracemalloc, which slows the run down)
+and saves them as a JSON report.
+
+A profiler hook can also be attached to every stage: with --profile DIR,
+each stage is profiled with cProfile and its stats saved to DIR/<stage>.prof
+(open them with pstats or snakeviz). Other hooks can be passed to Recorder
+in code.
+
+Only the main process is instrumented, so run batches without --parallel.
+
+Example in command line:
+    python Instrumentation.py --report stages.json GenerateQuestionBanks.py --batch manifest.csv
+    python Instrumentation.py --memory --profile prof Pretty4Canvas.py
+
+"""
+
+####################
+# IMPORTS
+####################
+import os
+import sys
+import ast
+import json
+import time
+import inspect
+import functools
+import importlib
+import contextlib
+
+
+####################
+# VARIABLES
+####################
+# The stages of each pipeline, by module. Dotted names are methods.
+pipeline_stages = {
+    'GenerateQuestionBanks' : [
+        'runJob', 'pickInputFile', 'getInputTable', 'readInputCSV',
+        'selectDifficulty', 'trimDifficulty', 'buildBank', 'mapAnswerKey',
+        'normalizeEmbeds', 'genRandomAnswerSet', 'genRandomAnswerSets',
+        'saveBank', 'saveBankChunks', 'saveQTI', 'build_MC_bank',
+        'build_MC_bank_incremental', 'QuestionStore.to_csv'],
+    'Pretty4Canvas' : [
+        'convert_file', 'read_file', 'rewrite_tags', 'tokenize_html',
+        'delete_tags', 'format_tables', 'format_table', 'format_table_heads',
+        'render_html', 'find_headers', 'create_tabs', 'create_content',
+        'create_pages', 'split_page', 'create_index', 'save_pages',
+        'body_formatting']
+    }
+
+# The stage of each pipeline that starts work on a new input file. The file
+#   is the stage's first argument if it is a file that exists (so the stage's
+#   own time counts toward it), or else its return value if it is a path.
+file_stages = {
+    'GenerateQuestionBanks' : 'pickInputFile',
+    'Pretty4Canvas'         : 'convert_file'
+    }
+
+# Stages that start a new unit of work, which may not have an input file
+#   (such as a batch job for a bank that is generated de novo)
+scope_stages = ['runJob']
+
+
+####################
+# SCRIPTS
+####################
+class Recorder:
+    '''
+    Records the calls, wall time and peak memory of each stage, per input
+    file.
+
+    Parameters
+    ----------
+    memory : bool
+        Whether to measure peak memory with tracemalloc.
+    hook : function
+        Optional profiler hook, called as hook(stage, file) around every call
+        to a stage; it must return a context manager.
+    '''
+
+    def __init__(self, memory = False, hook = None):
+        self.memory = memory
+        self.hook = hook
+        self.file = ''
+        self.stats = {}         # file : stage : stats
+        self._stack = []        # Memory of the stages being run
+        self.start = time.perf_counter()
+        if memory:
+            import tracemalloc
+            tracemalloc.start()
+
+    def _enter(self):
+        # Track the peak memory of nested stages: the peak is reset for each
+        #   stage, and the peak so far is passed on to the stage around it
+        if not self.memory:
+            return
+        import tracemalloc
+        current, peak = tracemalloc.get_traced_memory()
+        if self._stack:
+            self._stack[-1]['child_peak'] = max(
+                self._stack[-1]['child_peak'], peak)
+        tracemalloc.reset_peak()
+        self._stack.append({'start' : current, 'child_peak' : 0})
+
+    def _exit(self):
+        if not self.memory:
+            return None
+        import tracemalloc
+        peak = max(tracemalloc.get_traced_memory()[1],
+                   self._stack[-1]['child_peak'])
+        frame = self._stack.pop()
+        if self._stack:
+            self._stack[-1]['child_peak'] = max(
+                self._stack[-1]['child_peak'], peak)
+        return peak - frame['start']
+
+    def wrap(self, func, stage, file_stage = False):
+        '''
+        Returns func wrapped to record its calls as the named stage. If
+        file_stage is True, each call also starts a new input file.
+        '''
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if stage in scope_stages:
+                self.file = ''
+            if (file_stage and args and isinstance(args[0], str)
+                    and os.path.isfile(args[0])):
+                self.file = args[0]
+            hook = (self.hook(stage, self.file) if self.hook
+                    else contextlib.nullcontext())
+            self._enter()
+            start = time.perf_counter()
+            try:
+                with hook:
+                    result = func(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                peak = self._exit()
+            if file_stage and isinstance(result, str):
+                self.file = result
+            if inspect.isgenerator(result):
+                return self.wrapGenerator(result, stage)
+            self.record(stage, seconds, peak)
+            return result
+        wrapper.__wrapped_stage__ = stage
+        return wrapper
+
+    def wrapGenerator(self, generator, stage):
+        '''
+        Returns a generator stage's results wrapped to record the time spent
+        producing them, once they have all been used. Streaming stages run
+        interleaved, so their memory is not measured.
+        '''
+        seconds = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(generator)
+                except StopIteration:
+                    break
+                finally:
+                    seconds = seconds + time.perf_counter() - start
+                yield item
+        finally:
+            self.record(stage, seconds)
+
+    def record(self, stage, seconds, peak = None):
+        '''
+        Adds one call of a stage to the stats for the current file.
+        '''
+        stats = self.stats.setdefault(self.file, {}).setdefault(
+            stage, {'calls' : 0, 'seconds' : 0.0, 'peak_kb' : None})
+        stats['calls'] = stats['calls'] + 1
+        stats['seconds'] = stats['seconds'] + seconds
+        if peak is not None:
+            stats['peak_kb'] = max(stats['peak_kb'] or 0, peak / 1024)
+
+    def instrument(self, module, stages = None):
+        '''
+        Wraps the stages of a module (by default, its pipeline_stages) in
+        place, so calls made through the module's globals are recorded.
+        '''
+        name = module.__name__.split('.')[-1]
+        if name == '__main__':
+            name = os.path.splitext(os.path.basename(module.__file__))[0]
+        if stages is None:
+            stages = pipeline_stages[name]
+        for stage in stages:
+            owner = module
+            *path, attr = stage.split('.')
+            for part in path:
+                owner = getattr(owner, part, None)
+            func = getattr(owner, attr, None)
+            if func is None or hasattr(func, '__wrapped_stage__'):
+                continue
+            setattr(owner, attr, self.wrap(
+                func, stage, stage == file_stages.get(name)))
+
+    def report(self):
+        '''
+        Returns the stats as a dict: the total wall time, the stats per file
+        and stage, and the totals per stage over all files.
+        '''
+        totals = {}
+        for stages in self.stats.values():
+            for stage, stats in stages.items():
+                total = totals.setdefault(
+                    stage, {'calls' : 0, 'seconds' : 0.0, 'peak_kb' : None})
+                total['calls'] = total['calls'] + stats['calls']
+                total['seconds'] = total['seconds'] + stats['seconds']
+                if stats['peak_kb'] is not None:
+                    total['peak_kb'] = max(
+                        total['peak_kb'] or 0, stats['peak_kb'])
+        return {
+            'total_seconds' : time.perf_counter() - self.start,
+            'files'         : self.stats,
+            'stages'        : totals}
+
+    def save(self, fpath):
+        '''
+        Saves the report as a JSON file and prints the totals per stage.
+        '''
+        report = self.report()
+        with open(fpath, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+        print('\n{:<28}{:>8}{:>12}{:>14}'.format(
+            'Stage', 'Calls', 'Seconds', 'Peak (kB)'))
+        for stage, stats in sorted(report['stages'].items(),
+                                   key=lambda x: -x[1]['seconds']):
+            print('{:<28}{:>8}{:>12.3f}{:>14}'.format(
+                stage, stats['calls'], stats['seconds'],
+                '-' if stats['peak_kb'] is None
+                else format(stats['peak_kb'], ',.0f')))
+        print('Total: {:.3f} s. Saved the report to {}'.format(
+            report['total_seconds'], fpath))
+        if hasattr(self.hook, 'save'):
+            self.hook.save()
+
+
+class ProfileHook:
+    '''
+    Profiler hook for Recorder that profiles each stage with cProfile. A
+    nested stage pauses the profile of the stage around it, so each stage's
+    stats only cover its own code.
+
+    Parameters
+    ----------
+    directory : str
+        Directory to save the stats to, as <stage>.prof.
+    '''
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.profiles = {}
+        self._stack = []
+
+    @contextlib.contextmanager
+    def __call__(self, stage, file):
+        import cProfile
+        profile = self.profiles.setdefault(stage, cProfile.Profile())
+        if self._stack:
+            self._stack[-1].disable()
+        self._stack.append(profile)
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1].enable()
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        for stage, profile in self.profiles.items():
+            profile.dump_stats(os.path.join(self.directory, stage + '.prof'))
+        print('Saved the stage profiles to ' + self.directory)
+
+
+def runScript(script, args, recorder):
+    '''
+    Runs a script's main function with its stages instrumented.
+
+    The script is imported as a module (which defines its scripts without
+    running them), its stages are wrapped, and then the body of its
+    "if __name__ == '__main__':" block is run in the module with sys.argv
+    set to the script and its arguments.
+    '''
+    script_dir = os.path.dirname(os.path.abspath(script))
+    name = os.path.splitext(os.path.basename(script))[0]
+    sys.path.insert(0, script_dir)
+    module = importlib.import_module(name)
+    recorder.instrument(module)
+
+    # Find the main block
+    with open(script, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), script)
+    main = [node for node in tree.body if isinstance(node, ast.If)
+            and "__name__ == '__main__'" in ast.unparse(node.test)
+            .replace('"', "'")]
+    if not main:
+        raise ValueError(script + ' has no main block')
+    code = compile(ast.Module(body=main[0].body, type_ignores=[]),
+                   script, 'exec')
+    sys.argv = [script] + list(args)
+    exec(code, module.__dict__)
+
+
+#%%
+####################
+# MAIN FUNCTION
+####################
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Runs GenerateQuestionBanks.py or Pretty4Canvas.py with '
+        'per-stage timing and memory instrumentation.')
+    parser.add_argument(
+        '--report', default='Instrumentation_report.json',
+        help='JSON file to save the report to.')
+    parser.add_argument(
+        '--memory', action='store_true',
+        help='Also measure the peak memory of each stage (slower).')
+    parser.add_argument(
+        '--profile', metavar='DIR', default=None,
+        help='Profile each stage with cProfile and save the stats to DIR.')
+    parser.add_argument(
+        'script', help='Script to run.')
+    parser.add_argument(
+        'args', nargs=argparse.REMAINDER,
+        help='Arguments for the script.')
+    args = parser.parse_args()
+
+    hook = ProfileHook(args.profile) if args.profile else None
+    recorder = Recorder(args.memory, hook)
+    try:
+        runScript(args.script, args.args, recorder)
+    finally:
+        recorder.save(args.report)
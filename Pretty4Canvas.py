@@ -10,10 +10,12 @@ Created on Sat Jan 15 09:18:31 2022
 Converts formatted Google Docs to pretty Canvas pages... sort of
 This is still somewhat buggy
 
-Arguments:  None
+Arguments:  Optional: HTML files to convert (if none are given, a dialog
+            asks for them)
 
 Example in command line:
     python Pretty4Canvas.py
+    python Pretty4Canvas.py --parallel course_export/*.html
 
 Dependencies Install:
     sudo apt-get install python3-pip python3-dev
@@ -53,13 +55,24 @@ First steps:
         Try https://www.gdoctohtml.com/), save the file.
     5. Run this script.
         You can select multiple files, and it will process all of them.
-        The interface will ask you about tables and whether you want to
-        format them or not. If the table is for page structure,
-        not for display, choose N. If the table has a first row with headers,
-        choose Y.
+        (Or give the files on the command line; with --parallel, they are
+        converted across a pool of processes.)
+        Each table without a header row is classified automatically:
+        a table for page structure (not for display) is left as it is, and
+        a table of data gets its first row formatted as a header. Tables
+        the script is unsure of are left as they are (a bold first row, as
+        Google Docs makes it, helps).
+        The decisions are saved next to each file (as .<filename>.tables.json)
+        and reused on every rerun; to change one, set its "header" to
+        true or false in that file. To be asked about the tables the script
+        is unsure of instead, set ask_tables = True below.
     6. Open the file generated (the raw filename + _prettified.txt).
         Select everything (Ctrl+A), and paste it into a blank HTML editor
         for a Canvas page. Save the page.
+        For a long document, run the script with --pages instead: each tab
+        is saved as its own page in a folder (the raw filename + _pages),
+        with an index page linking them. Make a Canvas page for each file,
+        titled as listed on the index page, so the links work.
     7. Edit the HTML or Canvas file as needed. There will likely be errors
         because this script is still kind of buggy.
         But it hopefully saves a lot of manual coding work and Canvas
@@ -72,9 +85,13 @@ First steps:
 # IMPORTS
 ####################
 import os
-from tkinter import *
-from tkinter import filedialog
-
+import re
+import time
+import json
+import hashlib
+from functools import lru_cache
+from collections import namedtuple
+from html.parser import HTMLParser
 
 
 ####################
@@ -90,6 +107,10 @@ fmt_table_head_color_text = "#ffffff"
 fmt_table_subhead_color_bg = "#a391b1"
 fmt_table_subehad_color_text = "#000000"
 # fmt_table_border = 1 # Canvas overwrites table borders
+
+# Whether to ask about tables that the classifier is unsure of (see
+#   classify_table); otherwise no questions are asked
+ask_tables = False
       
 
 ####################
@@ -103,6 +124,27 @@ tab_html_head = '''
 '''
 tab_html_prefix = '  <li><a href="#tab-'
 
+# One piece of the document: a start tag, end tag, self-closing tag, text
+#   ('data') or anything else ('other', such as comments). attrs are the
+#   attributes of a start tag; raw is the node's exact text in the document.
+Node = namedtuple('Node', ['kind', 'tag', 'attrs', 'raw'])
+
+# Table start and end tags, skipping comments, scripts and styles (see
+#   find_tables)
+table_re = re.compile(
+    r'<!--.*?-->|<(script|style)\b.*?</\1\s*>'
+    r'|<(/?)table\b(?:[^>"\']|"[^"]*"|\'[^\']*\')*>',
+    re.DOTALL | re.IGNORECASE)
+
+# Tag rewrites applied to the whole document (see compile_rules)
+header_shift = 1            # Increase header levels to fit Canvas pages
+strip_tags = ('span',)      # Delete these tags, keeping what is inside them
+
+# Page output (see create_pages): each tab is saved as its own page, and a
+#   tab bigger than page_size (bytes of HTML) is split at its h3 headers
+#   (and its smaller headers, where a section is still too big)
+page_size = 200000
+
 
 
 ####################
@@ -112,6 +154,8 @@ tab_html_prefix = '  <li><a href="#tab-'
 ## IMPORTS
 def select_files():
     # Select raw HTML files from directory (UI)
+    #   (tkinter is only imported when the dialog is actually needed)
+    from tkinter import Tk, filedialog
     root = Tk()
     fileList = filedialog.askopenfilenames(
         initialdir=os.getcwd(),
@@ -124,7 +168,7 @@ def select_files():
 
 def read_file(filepath):
     # Read in the text
-    with open(file, encoding="utf8") as f:
+    with open(filepath, encoding="utf8") as f:
         lines=f.readlines()
     return lines
 
@@ -133,7 +177,7 @@ def read_file(filepath):
 ## FILE PARSING
 
 def find_header(html, level):
-    heads = [x for x in lines if "<h" + str(level) + ">" in x]
+    heads = [x for x in html if "<h" + str(level) + ">" in x]
     return heads
 
     
@@ -148,6 +192,140 @@ def parse_header(header, delim=delim_h1_title):
 
 
 
+## HTML PARSING
+
+class NodeParser(HTMLParser):
+    # Records each piece of the document as it is parsed, with where it starts
+    def __init__(self):
+        super().__init__(convert_charrefs=False)
+        self.events = []
+
+    def add(self, kind, tag=None, attrs=None):
+        self.events.append((kind, tag, attrs) + self.getpos())
+
+    def handle_starttag(self, tag, attrs):
+        self.add('start', tag, attrs)
+
+    def handle_startendtag(self, tag, attrs):
+        self.add('startend', tag, attrs)
+
+    def handle_endtag(self, tag):
+        self.add('end', tag)
+
+    def handle_data(self, data):
+        self.add('data')
+
+    def handle_entityref(self, name):
+        self.add('data')
+
+    def handle_charref(self, name):
+        self.add('data')
+
+    def handle_comment(self, data):
+        self.add('other')
+
+    def handle_decl(self, decl):
+        self.add('other')
+
+    def handle_pi(self, data):
+        self.add('other')
+
+    def unknown_decl(self, data):
+        self.add('other')
+
+
+def tokenize_html(text):
+    # Parse the document once into a list of nodes. Each node keeps its exact
+    #   text, so joining them gives back the document.
+    parser = NodeParser()
+    parser.feed(text)
+    parser.close()
+    
+    # Convert the parser's (line, column) positions to offsets in the text
+    line_starts = [0] + [m.end() for m in re.finditer('\n', text)]
+    offsets = [line_starts[line-1] + col
+               for kind, tag, attrs, line, col in parser.events]
+    ends = offsets[1:] + [len(text)]
+    
+    nodes = []
+    if offsets and offsets[0] > 0:
+        nodes.append(Node('data', None, None, text[:offsets[0]]))
+    for (kind, tag, attrs, line, col), start, end in zip(
+            parser.events, offsets, ends):
+        raw = text[start:end]
+        # Join up text that the parser split at character references
+        if kind == 'data' and nodes and nodes[-1].kind == 'data':
+            nodes[-1] = nodes[-1]._replace(raw=nodes[-1].raw + raw)
+        else:
+            nodes.append(Node(kind, tag, attrs, raw))
+    if not nodes and text:
+        nodes.append(Node('data', None, None, text))
+    return nodes
+
+
+def render_html(nodes):
+    # Join the nodes back up into HTML text
+    return ''.join(node.raw for node in nodes)
+
+
+def is_tag(node, tag, kind='start'):
+    return node.kind == kind and node.tag == tag
+
+
+def rename_tag(node, tag):
+    # Change the name of a start or end tag, keeping its attributes
+    prefix = '</' if node.kind == 'end' else '<'
+    return node._replace(
+        tag=tag, raw=prefix + tag + node.raw[len(prefix)+len(node.tag):])
+
+
+def add_style(node, styling):
+    # Add styling (as made by gen_styling) to a start tag. Any style the tag
+    #   already has is kept, but the new styling takes precedence.
+    styles = find_between(styling, 'style="', '"')
+    attrs = list(node.attrs)
+    old = [value for name, value in attrs if name == 'style']
+    if not old:
+        return node._replace(attrs=attrs + [('style', styles)],
+                             raw=node.raw[:-1] + styling + '>')
+    attrs = [(name, value) for name, value in attrs if name != 'style']
+    attrs.append(('style', (old[0] or '').strip().rstrip(';') + '; ' + styles))
+    raw = '<' + node.tag + ''.join(
+        ' ' + name + ('' if value is None else '="' + value.replace(
+            '&', '&amp;').replace('"', '&quot;') + '"')
+        for name, value in attrs) + '>'
+    return node._replace(attrs=attrs, raw=raw)
+
+
+def node_text(nodes):
+    # Text content of a list of nodes, with whitespace collapsed (and any
+    #   line breaks added by break_lines read as spaces)
+    import html
+    return ' '.join(html.unescape(''.join(
+        node.raw for node in nodes if node.kind == 'data')
+        .replace('<br />', ' ')).split())
+
+
+def find_rows(nodes):
+    # Find the (start, end) indices of the rows of a table (not counting the
+    #   rows of any tables inside it)
+    rows = []
+    depth = 0
+    start = None
+    for i, node in enumerate(nodes):
+        if is_tag(node, 'table'):
+            depth = depth + 1
+        elif is_tag(node, 'table', 'end'):
+            depth = depth - 1
+        elif depth == 1 and is_tag(node, 'tr'):
+            start = i
+        elif depth == 1 and is_tag(node, 'tr', 'end') and start is not None:
+            rows.append((start, i))
+            start = None
+    return rows
+
+
+
 ## HTML GENERATION
    
 def find_between(text, delim1, delim2):
@@ -159,57 +337,208 @@ def find_between(text, delim1, delim2):
         return ""
     
 
+def find_headers(html, level=2):
+    # Find the lines that start a header of the given level (with or without
+    #   attributes) in one pass, returning their line numbers and the lines
+    head_re = re.compile(r'<h' + str(level) + r'[\s/>]', re.IGNORECASE)
+    head_index = [i for i, line in enumerate(html) if head_re.search(line)]
+    return head_index, [html[i] for i in head_index]
+
+
+def header_text(header, level=2):
+    # The text inside the header tag on a header line
+    match = re.search(
+        r'<h' + str(level) + r'\b[^>]*>(.*?)</h' + str(level) + r'\s*>',
+        header, re.IGNORECASE)
+    return match.group(1) if match else ''
+
+
 def create_tabs(headers):
     # Create a list of tabs
     tablist = []
     for h in headers:
-        header = find_between(h,"<h2>","</h2>")
+        header = header_text(h)
         listval, title = parse_header(header)
         tablist.append(listval)
     
     # Build the HTML
-    html = '''
+    html = ['''
 <div class="enhanceable_content tabs">
   
   <ul>
-'''
+''']
     for tab in tablist:
-        html = html + '''
-    <li><a href="#tab-''' + tab + '">' + tab + '</a></li>'
-    html = html + '''
+        html.append('''
+    <li><a href="#tab-''' + tab + '">' + tab + '</a></li>')
+    html.append('''
   </ul>
-'''
-    return tablist, html
+''')
+    return tablist, ''.join(html)
 
 
-def create_content(html_orig, headlist, tablist):
-    content_html=''
-    for i  in list(range(len(headlist))):
-        index1 = html_orig.index(headlist[i])
-        if i == len(headlist)-1: index2 = len(html_orig)-1
-        else: index2 = html_orig.index(headlist[i+1])
-        content_html = content_html+'''
-  <div id = "tab-''' + tablist[i] + '''">
-'''
-        for line in html_orig[index1:index2]:
-            content_html = content_html + '    ' + line
-        content_html = content_html + '''
+def create_content(html_orig, headlist, tablist, head_index=None):
+    # Build each tab's content from the lines between its header and the next
+    #   one. head_index is the line number of each header (from find_headers);
+    #   if not given, each header line is looked up in a single pass. Note
+    #   that the last line of the document is left out.
+    if head_index is None:
+        first = {}
+        wanted = set(headlist)
+        for i, line in enumerate(html_orig):
+            if line in wanted and line not in first:
+                first[line] = i
+        head_index = [first[h] for h in headlist]
+    ends = list(head_index[1:]) + [len(html_orig)-1]
+    
+    # Write the tab divs to a buffer, and join it once at the end
+    content_html = []
+    for tab, index1, index2 in zip(tablist, head_index, ends):
+        content_html.append('''
+  <div id = "tab-''' + tab + '''">
+''')
+        content_html.extend('    ' + line for line in html_orig[index1:index2])
+        content_html.append('''
   </div>
-'''
-    return content_html
+''')
+    return ''.join(content_html)
+
+
+
+## PAGE GENERATION
+
+def create_pages(html_orig, headlist, head_index, budget=page_size):
+    # Build a page for each tab: the lines between its header and the next
+    #   one, or the end of the document for the last tab (unlike
+    #   create_content, no line is left out). A page bigger than the budget
+    #   (in bytes) is split at its h3 headers into parts that fit, where it
+    #   can be. Returns the (title, html) of each page.
+    ends = list(head_index[1:]) + [len(html_orig)]
+    pages = []
+    for header, index1, index2 in zip(headlist, head_index, ends):
+        title = page_title(header_text(header))
+        parts = split_page(html_orig[index1:index2], budget)
+        for k, part in enumerate(parts):
+            if len(parts) > 1:
+                part_title = title + ' (' + str(k+1) + ' of ' + str(
+                    len(parts)) + ')'
+            else:
+                part_title = title
+            pages.append((part_title, ''.join(part)))
+            # A section with no smaller headers can't be split any further
+            part_size = sum(len(line.encode('utf-8')) for line in part)
+            if part_size > budget:
+                print('Warning: page "' + part_title + '" is '
+                      + str(part_size) + ' bytes, over the page size of '
+                      + str(budget) + ', and has no headers to split it at')
+    
+    # Pages need different titles to have different addresses
+    seen = {}
+    for k, (title, page_html) in enumerate(pages):
+        seen[title] = seen.get(title, 0) + 1
+        if seen[title] > 1:
+            pages[k] = (title + ' (' + str(seen[title]) + ')', page_html)
+    return pages
+
+
+def split_page(lines, budget, level=3):
+    # Split a page's lines at its headers of the given level into parts of
+    #   at most budget bytes, keeping each section (and anything before the
+    #   first header) whole where it fits (see split_sections)
+    parts = []
+    size = 0
+    for section in split_sections(lines, budget, level):
+        section_size = sum(len(line.encode('utf-8')) for line in section)
+        if parts and size + section_size <= budget:
+            parts[-1].extend(section)
+            size = size + section_size
+        else:
+            parts.append(section)
+            size = section_size
+    return parts or [lines]
+
+
+def split_sections(lines, budget, level=3):
+    # Split lines into sections at their headers of the given level. A
+    #   section bigger than the budget is split again at its headers of the
+    #   next level down, as far as h6.
+    head_index, heads = find_headers(lines, level)
+    starts = [0] + [i for i in head_index if i > 0]
+    sections = []
+    for start, end in zip(starts, starts[1:] + [len(lines)]):
+        section = lines[start:end]
+        if level < 6 and sum(
+                len(line.encode('utf-8')) for line in section) > budget:
+            sections.extend(split_sections(section, budget, level + 1))
+        else:
+            sections.append(section)
+    return sections
+
+
+def page_title(header):
+    # Page title from the HTML inside a header
+    import html
+    return ' '.join(html.unescape(re.sub(r'<[^>]*>', '', header)).split())
+
+
+def page_slug(title):
+    # The page's address in Canvas, which is made from its title
+    return re.sub(r'[^a-z0-9]+', '-', title.lower()).strip('-') or 'page'
+
+
+def create_index(pages, intro=''):
+    # Build an index page that links to each page (by the address Canvas
+    #   gives it), after any content from before the first tab
+    html = [intro, '''
+<ul>
+''']
+    for title, page_html in pages:
+        html.append('  <li><a href="' + page_slug(title) + '">'
+                    + title.replace('&', '&amp;').replace('<', '&lt;')
+                    + '</a></li>\n')
+    html.append('</ul>\n')
+    return ''.join(html)
+
+
+def save_pages(filepath, pages, index_html):
+    # Save each page and the index page to a folder next to the file, as
+    #   00_index.txt, 01_<page>.txt, ... Returns the path to the index page.
+    #   The names of the pages saved are kept in the folder, so that the
+    #   pages an earlier run saved and this one doesn't can be removed;
+    #   any other files in the folder are left alone.
+    out_dir = os.path.splitext(filepath)[0] + '_pages'
+    os.makedirs(out_dir, exist_ok=True)
+    record_path = os.path.join(out_dir, '.pages.json')
+    try:
+        with open(record_path, encoding='utf-8') as f:
+            old_names = json.load(f)
+    except (OSError, ValueError):
+        old_names = []
+    width = max(2, len(str(len(pages))))
+    names = ['0'.zfill(width) + '_index.txt'] + [
+        str(k+1).zfill(width) + '_' + page_slug(title) + '.txt'
+        for k, (title, page_html) in enumerate(pages)]
+    for name, page_html in zip(
+            names, [index_html] + [page_html for title, page_html in pages]):
+        with open(os.path.join(out_dir, name), 'wb') as f:
+            f.write(page_html.encode('utf-8'))
+    # Remove the pages saved by an earlier run that this run didn't save
+    for name in old_names:
+        if name not in names and os.path.basename(name) == name:
+            try:
+                os.remove(os.path.join(out_dir, name))
+            except OSError:
+                pass
+    with open(record_path, 'w', encoding='utf-8') as f:
+        json.dump(names, f, indent=1)
+    return os.path.join(out_dir, names[0])
 
 
 
 ## STYLING - WHOLE DOCUMENT
             
-def increase_hlevel(html):
-    # Find and increase all of the headers in the html
-    delims = ['<h','</h']
-    for n in list(range(8,0,-1)):
-        for delim in delims:
-            html = [
-                s.replace(delim+str(n)+">",delim+str(n+1)+">") for s in html]
-    return html
+def increase_hlevel(html, levels=1):
+    # Find and increase all of the headers in the html (h1 becomes h2, etc.)
+    return rewrite_tags(html, compile_rules(header_shift=levels))
     
 
 def gen_styling(
@@ -229,14 +558,20 @@ def gen_styling(
     return style_text
 
 
-def body_formatting(html, fmt_map):
+def body_formatting(html, fmt_map=None):
     # do stuff
     return html
 
 
 # STYLING - TABLES
-def format_tables(html):
+def format_tables(nodes, decisions=None, originals=None):
+    # decisions is the table decision cache for the document (see
+    #   load_table_cache); new decisions are added to it. originals is the
+    #   text of each table as it was before any tags were stripped (see
+    #   find_tables), which is what tables are classified by.
     # Generate styling
+    table_styling = (' style="border-collapse: collapse; width: 100%; '
+                     + 'border-color: black; border-style: solid;"')
     th_styling = gen_styling(
         text_color = fmt_table_head_color_text,
         background_color = fmt_table_head_color_bg, text_align='left',
@@ -244,197 +579,600 @@ def format_tables(html):
     td_s_styling = gen_styling(
         text_color = fmt_table_subehad_color_text,
         background_color = fmt_table_subhead_color_bg)
+    td_styling = ' style="vertical-align: top"'
     
-    # Loop through and look for tables
-    table_starts, table_ends = find_sections(html, 'table')
+    # Pass the document through, collecting each table to format it
+    table = []
+    depth = 0
+    k = 0
+    for node in nodes:
+        if is_tag(node, 'table'):
+            depth = depth + 1
+        if not depth:
+            yield node
+            continue
+        table.append(node)
+        if is_tag(node, 'table', 'end'):
+            depth = depth - 1
+            if not depth:
+                original = originals[k] if originals else None
+                yield from format_table(
+                    table, table_styling, th_styling, td_s_styling,
+                    td_styling, decisions, original)
+                table = []
+                k = k + 1
+    # A table that is never closed is left as it is
+    yield from table
+
+
+def format_table(table, table_styling, th_styling, td_s_styling,
+                 td_styling, decisions=None, original=None):
+    # Identify the table by its content, as it was before formatting
+    key = table_key(table)
     
-    # Format each table
-    for table, start in enumerate(table_starts):
-        table_lines = html[start:table_ends[table]+1].copy()
-        
-        # Format the table
-        table_lines = [
-            x.replace(
-                '<table>',
-                '<table style="border-collapse: collapse; width: 100%; '
-                + 'border-color: black; border-style: solid;">')
-            for x in table_lines]
-        table_lines = delete_tags(table_lines, ['p'])
-        table_lines = format_td(table_lines)
-
-        # Format table heads
-        table_lines = format_table_heads(table_lines, th_styling, td_s_styling)
-        
-        # Format all cells
-        table_lines = [
-            x.replace('<td>','<td style="vertical-align: top">')
-            for x in table_lines]
-        
-        # Remove old table HTML
-        html=html[0:start] + table_lines + html[table_ends[table]+1:]
-        
-        
-        table_starts, table_ends = find_sections(html, 'table')
-       
-    return html
+    # Format the table
+    table[0] = add_style(table[0], table_styling)
+    table = list(delete_tags(table, ['p']))
+    table = format_td(table)
+    
+    # Format table heads
+    table = format_table_heads(
+        table, th_styling, td_s_styling, key, decisions, original)
+    
+    # Format all cells that aren't already styled
+    return [add_style(x, td_styling)
+            if is_tag(x, 'td') and not any(a[0] == 'style' for a in x.attrs)
+            else x for x in table]
 
-def format_table_heads(table_html, th_styling, td_s_styling):
-    # Get row starts
-    row_starts, row_ends = find_sections(table_html, 'tr')
+
+def format_table_heads(table, th_styling, td_s_styling, key=None,
+                       decisions=None, original=None):
+    # Get rows
+    rows = find_rows(table)
     
-    # If there is no existing header row, make it the first row
-    if not find_indices(table_html, '<thead>'):
-         # Ask the user if the first row should be formatted
-         firstrowtext = ' | '.join(table_html[row_starts[0]:row_ends[0]])
-         questiontext = '''Format the first row in the table below as a header?
-''' + firstrowtext + '''
-Enter Y or N.  > '''         
-         # If yes, format it
-         if input(questiontext) in ['Y','y']:
-             table_html = format_th(table_html, row_starts, row_ends)
+    # If there is no existing header row, make it the first row if it is a
+    #   table of data (see decide_header)
+    if rows and not any(is_tag(x, 'thead') for x in table):
+        if decide_header(table, rows, key, decisions, original):
+            table = format_th(table, rows)
     
     # Format any th
-    table_html = [
-            x.replace('<th>','<th' + th_styling + '>') for x in table_html]
+    table = [add_style(x, th_styling) if is_tag(x, 'th') else x
+             for x in table]
     
     # Identify and format any subheader rows
-    row_starts, row_ends = find_sections(table_html, 'tr')
-    table_html = format_subhead(table_html, row_starts, row_ends, td_s_styling)
-                    
-    return table_html
-
-
-def format_th(table_html, row_starts, row_ends):
-    # Define the first row as the header row
-    table_html.insert(row_starts[0],"<thead" + ">")
-    table_html.insert(row_ends[0]+2,"</thead>")
-    ctr = 3
-    # In the header row, replace all td with formatted th in the header row
-    table_html[row_starts[0]:row_ends[0]+ctr] = [
-        x.replace('<td>','<th>').replace('</td>','</th>') for x in
-        table_html[row_starts[0]:row_ends[0]+ctr]]
+    table = format_subhead(table, find_rows(table), td_s_styling)
+    
+    return table
+
+
+## TABLE CLASSIFICATION
+
+def decide_header(table, rows, key=None, decisions=None, original=None):
+    # Decide whether to format the first row of a table as a header: use the
+    #   cached decision for the table if there is one, otherwise classify it
+    #   (asking the user if ask_tables is on and the classifier is unsure).
+    #   If the table's original text is given, that is classified instead,
+    #   so that styles on tags that have since been stripped (such as bold
+    #   spans) still count.
+    if decisions is not None and key in decisions:
+        return decisions[key]['header']
+    start, end = rows[0]
+    firstrowtext = ' | '.join(
+        node_text(cell) for cell in split_cells(table[start:end+1]))
+    if original is not None:
+        original = tokenize_html(original)
+    if original and find_rows(original):
+        header, score = classify_table(original, find_rows(original))
+    else:
+        header, score = classify_table(table, rows)
+    by = 'auto'
+    if ask_tables and abs(score) < 3:
+        questiontext = '''Format the first row in the table below as a header?
+''' + firstrowtext + '''
+Enter Y or N.  > '''
+        header = input(questiontext) in ['Y','y']
+        by = 'user'
+    if decisions is not None and key is not None:
+        decisions[key] = {'header' : header, 'by' : by, 'score' : score,
+                          'first_row' : firstrowtext[:200]}
+    return header
+
+
+def classify_table(table, rows):
+    # Score a table as a table of data with a header row (3 or more) or a
+    #   table for page layout (-3 or less). In between is unsure, and the
+    #   table is left as it is. Returns whether the first row should be a
+    #   header and the score.
+    grid = [split_cells(table[start:end+1]) for start, end in rows]
+    widths = [sum(cell_span(x) for x in first_cells(table, row))
+              for row in rows]
+    
+    # A single row or column is page layout
+    if len(grid) < 2 or max(widths) < 2:
+        return False, -3
+    score = 0
+    
+    # Tables of data have the same number of columns in every row
+    most = max(set(widths), key=widths.count)
+    if widths.count(most) / len(widths) >= 0.75:
+        score = score + 1
+    else:
+        score = score - 2
+    # Tables inside tables are page layout
+    if sum(is_tag(x, 'table') for x in table) > 1:
+        score = score - 2
+    
+    first = grid[0]
+    first_text = [node_text(cell) for cell in first]
+    body_text = [node_text(cell) for row in grid[1:] for cell in row]
+    # Header rows are already th, or bold when the rest of the table isn't
+    if all(x.tag == 'th' for x in first_cells(table, rows[0])):
+        score = score + 3
+    elif any(first_text) and all(
+            is_bold(cell) for cell, text in zip(first, first_text)
+            if text) and not all(is_bold(cell) for row in grid[1:]
+                                 for cell in row):
+        score = score + 3
+    # Header cells are filled in (except maybe the top left corner), short,
+    #   and words rather than numbers
+    if any(not text for text in first_text[1:]):
+        score = score - 1
+    if first_text and max(len(text) for text in first_text) <= 40 and (
+            mean_length(first_text) <= mean_length(body_text)):
+        score = score + 1
+    if not any(is_number(text) for text in first_text) and any(
+            is_number(text) for text in body_text):
+        score = score + 1
+    # Subheader rows (cells that span all columns) are only used in tables
+    #   of data
+    if any(len(row) == 1 and width == most and most > 1
+           for row, width in zip(grid[1:], widths[1:])):
+        score = score + 1
+    
+    return score >= 3, score
+
+
+def find_tables(html):
+    # The text of each table in a document (not counting tables inside
+    #   tables), in order, without parsing the rest of the document
+    tables = []
+    depth = 0
+    start = None
+    for match in table_re.finditer(html):
+        if match.group(2) is None:
+            # A comment, script or style
+            continue
+        if not match.group(2):
+            if not depth:
+                start = match.start()
+            depth = depth + 1
+        elif depth:
+            depth = depth - 1
+            if not depth:
+                tables.append(html[start:match.end()])
+    return tables
+
+
+def table_key(table):
+    # Hash of a table's content, with whitespace and case ignored
+    text = ' '.join(render_html(table).split()).casefold()
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def first_cells(table, row):
+    # Start tags of the cells in a row
+    start, end = row
+    return [x for x in table[start:end+1]
+            if x.kind == 'start' and x.tag in ('td', 'th')]
+
+
+def cell_span(node):
+    # Number of columns a cell spans, from its start tag
+    try:
+        return max(1, int(dict(node.attrs).get('colspan') or 1))
+    except ValueError:
+        return 1
+
+
+def is_bold(cell):
+    # Whether all of a cell's text is inside bold tags or bold styles
+    opened = []     # Whether each open tag is bold
+    text = False
+    for x in cell:
+        if x.kind == 'start':
+            opened.append((x.tag, x.tag in ('b', 'strong') or bool(
+                re.search(r'font-weight:\s*(bold|[6-9]00)',
+                          dict(x.attrs).get('style') or ''))))
+        elif x.kind == 'end':
+            # Close the tag (and any tags left open inside it)
+            for i in range(len(opened) - 1, -1, -1):
+                if opened[i][0] == x.tag:
+                    del opened[i:]
+                    break
+        elif x.kind == 'data' and x.raw.strip():
+            if not any(bold for tag, bold in opened):
+                return False
+            text = True
+    return text
+
+
+def is_number(text):
+    return bool(re.fullmatch(r'[-+$]?[\d.,]+%?', text.replace(' ', '')))
+
+
+def mean_length(texts):
+    return sum(len(x) for x in texts) / len(texts) if texts else 0
+
+
+def load_table_cache(filepath):
+    # Load the table decisions saved for a document, if there are any
+    try:
+        with open(table_cache_path(filepath), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_table_cache(filepath, decisions):
+    # Save the table decisions for a document, next to it
+    cache_path = table_cache_path(filepath)
+    tmp_path = cache_path + '.' + str(os.getpid())
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(decisions, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # The cache is optional; carry on if it can't be saved
+        pass
+
+
+def table_cache_path(filepath):
+    dirPath, name = os.path.split(os.path.abspath(filepath))
+    return os.path.join(dirPath, '.' + name + '.tables.json')
+
+
+def split_cells(row):
+    # Split the nodes of a table row into its cells
+    cells = []
+    for node in row:
+        if node.kind == 'start' and node.tag in ('td', 'th'):
+            cells.append([])
+        elif cells:
+            cells[-1].append(node)
+    return cells
+
+
+def format_th(table, rows):
+    # Define the first row as the header row, with th in place of td
+    start, end = rows[0]
+    head = [rename_tag(x, 'th') if x.kind in ('start', 'end')
+            and x.tag == 'td' else x for x in table[start:end+1]]
+    before = table[:start]
+    after = table[end+1:]
+    
     # Move tbody
-    # Delete existing tbody
-    tbody = find_indices(table_html, '<tbody>')
-    if tbody:                    
-        table_html.pop(tbody[0])
-        ctr=ctr-1
+    # Delete existing tbody (and its line break)
+    tbody = [i for i, x in enumerate(before) if is_tag(x, 'tbody')]
+    if tbody:
+        i = tbody[0]
+        before.pop(i)
+        if i < len(before) and before[i].kind == 'data' and (
+                before[i].raw.startswith('\n')):
+            before[i] = before[i]._replace(raw=before[i].raw[1:])
     else:
-        table_html.insert(row_ends[-1]+ctr,"</tbody>")
-    # Add in tbody to the end
-    table_html.insert(row_ends[0]+ctr,"<tbody>")
+        # Close the new tbody after the last row
+        last = rows[-1][1] - end
+        after[last:last] = [Node('data', None, None, '\n'),
+                            Node('end', 'tbody', None, '</tbody>')]
     
-    # Return
-    return table_html
+    return (before
+            + [Node('start', 'thead', [], '<thead>'),
+               Node('data', None, None, '\n')]
+            + head
+            + [Node('data', None, None, '\n'),
+               Node('end', 'thead', None, '</thead>'),
+               Node('data', None, None, '\n'),
+               Node('start', 'tbody', [], '<tbody>')]
+            + after)
+
 
+def format_subhead(table, rows, td_s_styling):
+    for start, end in rows:
+        # If the first cell spans columns, it is a subheader row
+        cells = [i for i in range(start, end+1)
+                 if table[i].kind == 'start' and table[i].tag in ('td', 'th')]
+        if cells and table[cells[0]].tag == 'td' and any(
+                a[0] == 'colspan' for a in table[cells[0]].attrs):
+            for i in cells:
+                if table[i].tag == 'td':
+                    table[i] = add_style(table[i], td_s_styling)
+    return table
 
-def format_subhead(table_html, row_starts, row_ends, td_s_styling):
-    for j, row in enumerate(row_starts):
-        # If the first line indicates a subheader, format it
-        if '<td colspan=' in table_html[row+1]:
-            row_html = table_html[row:row_ends[j]+1]
-            td_starts, td_ends = find_sections(row_html, 'td', flex=True)
-            for k, td in enumerate(td_starts):
-                td_pieces = row_html[td].split('>')
-                row_html[td] = td_pieces[0] + ' ' + td_s_styling + '>' + td_pieces[1]
-            table_html[row:row_ends[j]+1] = row_html
-    return table_html
 
+def format_td(table):
+    # In each cell, line break all but the last line of text: a line break
+    #   goes in wherever a new line starts between two pieces of content
+    cell = None
+    for i, node in enumerate(table):
+        if is_tag(node, 'td'):
+            cell = []
+        elif is_tag(node, 'td', 'end') and cell is not None:
+            break_lines(table, cell)
+            cell = None
+        elif cell is not None:
+            cell.append(i)
+    return table
 
-def format_td(table_html):
-    td_starts, td_ends = find_sections(table_html, 'td')
-    th_starts, th_ends = find_sections(table_html, 'th')
+
+def break_lines(table, cell):
+    # Find the new lines in the cell, and whether there is content before
+    #   and after each
+    pieces = []         # (index, position in the text) of each new line
+    content = []        # Number of pieces of content before each new line
+    n = 0
+    last_br = False
+    for i in cell:
+        node = table[i]
+        if node.kind != 'data':
+            if node.kind in ('start', 'startend'):
+                n = n + 1
+                last_br = node.tag == 'br'
+            continue
+        for part_start, part in enumerate_lines(node.raw):
+            if part.strip():
+                n = n + 1
+                last_br = False
+            if part.endswith('\n'):
+                pieces.append((i, part_start + len(part) - 1, last_br))
+                content.append(n)
     
-    for i, start in enumerate(td_starts):
-        # If there is more than one line, line break all but the last
-        if td_ends[i]-start > 1:
-            lines = [x.replace('\n','<br />\n') for x in table_html[start+1:td_ends[i]-1]]
-            table_html[start+1:td_ends[i]-1] = lines
-    return table_html
+    # Break the lines that have content on both sides
+    breaks = {}
+    for (i, pos, after_br), before in zip(pieces, content):
+        if before and before < n and not after_br:
+            breaks.setdefault(i, []).append(pos)
+    for i, positions in breaks.items():
+        text = table[i].raw
+        for pos in reversed(positions):
+            text = text[:pos] + '<br />' + text[pos:]
+        table[i] = table[i]._replace(raw=text)
+
+
+def enumerate_lines(text):
+    # Yield (start, line) for each line of text, keeping the line endings
+    start = 0
+    for line in text.splitlines(keepends=True):
+        yield start, line
+        start = start + len(line)
 
 
 ## FIND & REPLACE
 
-def find_sections(html, tag, flex=False):
-    if flex: end = ''
-    else: end = '>'
-    starts = find_indices(html, '<' + tag + end)
-    ends = find_indices(html, '</' + tag)
-    return starts, ends
-
-
-def find_indices(str_list, search_str):
-    indices = []
-    for i, string in enumerate(str_list):
-        if search_str in string:
-            indices.append(i)
-    return indices
-
-
-def delete_tags(html, tags, flex=False):
-    for tag in tags:
-        if flex:
-            # Search for the tag in any rows
-            tag_starts, tag_ends = find_sections(html, tag, flex=True)
-            rows = list(set(tag_starts + tag_ends))
-            for row in rows:
-                row_text = html[row]
-                # Split up all tags
-                splits = row_text.split('<' + tag)                    
-                clean_text=splits[0]
-                for s in splits[1:]:
-                    junk, s = s.split('>',1)
-                    clean_text = clean_text + s.replace('</' + tag + '>','')
-                html[row] = clean_text
-        else:
-            html = [x.replace('<' + tag + '>','') for x in html]
-            html = [x.replace('</' + tag + '>', '') for x in html]
-    return html
+@lru_cache()
+def compile_rules(header_shift=0, strip_tags=()):
+    # Compile header level shifts and tag removals into one pattern that
+    #   finds every tag to rewrite, and a table of what each tag becomes
+    #   (None to delete it)
+    table = {}
+    if header_shift:
+        for n in range(1, 9):
+            table['h' + str(n)] = 'h' + str(n + header_shift)
+    for tag in strip_tags:
+        table[tag.lower()] = None
+    if not table:
+        return None, table
+    # Comments, scripts and styles are matched too, so that nothing inside
+    #   them is rewritten. Attribute values may contain '>'.
+    pattern = re.compile(
+        r'<!--.*?-->|<(script|style)\b.*?</\1\s*>'
+        + r'|<(/?)(' + '|'.join(sorted(table, key=len, reverse=True))
+        + r')\b((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>',
+        re.DOTALL | re.IGNORECASE)
+    return pattern, table
 
-#%%
-####################
-# MAIN FUNCTION
-####################
-if __name__ == '__main__': 
+
+def rewrite_tags(html, rules):
+    # Apply compiled rules to the html text in a single pass
+    pattern, table = rules
+    if pattern is None:
+        return html
+    def rewrite(match):
+        tag = match.group(3)
+        if tag is None:
+            return match.group(0)
+        new_tag = table[tag.lower()]
+        if new_tag is None:
+            return ''
+        return '<' + match.group(2) + new_tag + match.group(4) + '>'
+    return pattern.sub(rewrite, html)
+
+
+def delete_tags(nodes, tags):
+    # Remove the tags (with any attributes), keeping what is inside them
+    for node in nodes:
+        if node.kind in ('start', 'end', 'startend') and node.tag in tags:
+            continue
+        yield node
+
+
+
+## CONVERSION
+
+def output_path(filepath):
+    # Where to save the prettified version of a file
+    return os.path.splitext(filepath)[0] + '_prettified.txt'
+
+
+def convert_file(filepath, ask=None, table_cache=True, pages=False,
+                 budget=page_size):
+    # Convert one file and save it (see output_path), returning a summary.
+    #   Everything the conversion needs is passed in or read from the file,
+    #   so files can be converted in separate processes. ask sets ask_tables
+    #   (which is kept as it is if not given); with table_cache off, the
+    #   tables are classified from scratch and the decisions aren't saved.
+    #   With pages on, each tab is saved as its own page instead, with pages
+    #   over the budget (in bytes) split (see create_pages and save_pages).
+    global ask_tables
+    if ask is not None:
+        ask_tables = ask
+    start = time.perf_counter()
     
-    # Select files (UI)
-    fileList, dirPath = select_files()
+    # Read in the file
+    lines = read_file(filepath)
     
-    # Read in and parse files
-    for file in fileList:
-        print('Processing ' + file)
-        
-        # Read in the file
-        lines = read_file(file)
-        
-        # Clean up the formatting
-        # Incerase the header levels to account for Canvas formatting
-        html = increase_hlevel(lines)
-        # Delete any spans
-        html = delete_tags(html,['span'],flex=True)
-        
-        # Format tables
-        html = format_tables(html)
-        
-        # Find the top level headers
-        headers = [x for x in html if "<h2>" in x]
-        
+    # Clean up the formatting in one pass through the text: increase the
+    #   header levels to account for Canvas formatting and delete any spans
+    text = ''.join(lines)
+    html = rewrite_tags(text, compile_rules(header_shift, strip_tags))
+    
+    # Parse the document and format tables, using the decisions saved for
+    #   the document's tables on earlier runs. New tables are classified as
+    #   they were before spans were stripped, since Google Docs marks bold
+    #   text with spans.
+    decisions = load_table_cache(filepath) if table_cache else {}
+    nodes = tokenize_html(html)
+    tables = count_tables(nodes)
+    originals = find_tables(text)
+    if len(originals) != tables:
+        originals = None
+    html = render_html(format_tables(nodes, decisions, originals)).splitlines(
+        keepends=True)
+    if table_cache:
+        save_table_cache(filepath, decisions)
+    
+    # Find the top level headers
+    head_index, headers = find_headers(html)
+    
+    if pages:
+        # Build a page for each tab, and an index page with anything before
+        #   the first tab
+        page_list = [(title, body_formatting(page_html)) for title, page_html
+                     in create_pages(html, headers, head_index, budget)]
+        intro = ''.join(html[:head_index[0]] if head_index else html)
+        html_text = create_index(page_list, intro)
+        out_path = save_pages(filepath, page_list, html_text)
+        n_bytes = sum(len(x.encode('utf-8')) for title, x in page_list)
+    else:
         # Build the tabs
         tablist, tab_html = create_tabs(headers)
         
         # Build the content
-        content_html = create_content(html, headers, tablist)
-
+        content_html = create_content(html, headers, tablist, head_index)
+        
         # More formatting
-        content_html = body_formatting(content_html, fmt_map)
+        content_html = body_formatting(content_html)
         
         # Finish HTML
         html_text = tab_html + content_html + '''
 </div>
-'''       
-        
+'''
         
         # Save the HTML
-        with open(file.split('.')[0]+'_prettified.txt','wb') as f:
+        out_path = output_path(filepath)
+        with open(out_path, 'wb') as f:
             f.write(html_text.encode('utf-8'))
-            
+        page_list = [('', html_text)]
+        n_bytes = 0
+    n_bytes = n_bytes + len(html_text.encode('utf-8'))
+    
+    return {'file' : filepath, 'output' : out_path, 'tabs' : len(headers),
+            'pages' : len(page_list), 'tables' : tables,
+            'distinct' : len(decisions),
+            'headers' : sum(v['header'] for v in decisions.values()),
+            'bytes' : n_bytes,
+            'seconds' : time.perf_counter() - start}
+
+
+def count_tables(nodes):
+    # Number of tables in a document, not counting tables inside tables
+    tables = 0
+    depth = 0
+    for node in nodes:
+        if is_tag(node, 'table'):
+            tables = tables + (depth == 0)
+            depth = depth + 1
+        elif is_tag(node, 'table', 'end') and depth:
+            depth = depth - 1
+    return tables
+
+
+def convert_files(fileList, processes=None, parallel=False, pages=False,
+                  budget=page_size):
+    # Convert each file, one after another or (if parallel) across a pool of
+    #   worker processes, and print a summary of each. The results are in
+    #   the order of fileList either way. Workers can't ask about tables.
+    start = time.perf_counter()
+    n = len(fileList)
+    if parallel and n > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = list(pool.map(
+                convert_file, fileList, [False] * n, [True] * n,
+                [pages] * n, [budget] * n))
+    else:
+        results = []
+        for file in fileList:
+            print('Processing ' + file)
+            results.append(convert_file(
+                file, pages=pages, budget=budget))
+    elapsed = time.perf_counter() - start
+    
+    # Summarize the files
+    for result in results:
+        print('{:>8.2f} s  {} -> {}'.format(
+            result['seconds'], result['file'], result['output']))
+        print('            {} tabs, {} tables ({} distinct without a header '
+              'row, {} given one), {:,} bytes'.format(
+                  result['tabs'], result['tables'], result['distinct'],
+                  result['headers'], result['bytes'])
+              + (', {} pages'.format(result['pages']) if pages else ''))
+    print('Converted {} files in {:.2f} s ({:.2f} s of work)'.format(
+        len(results), elapsed, sum(r['seconds'] for r in results)))
+    return results
+
+
+#%%
+####################
+# MAIN FUNCTION
+####################
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Converts HTML documents to pretty Canvas pages.')
+    parser.add_argument(
+        'files', nargs='*',
+        help='HTML files to convert. If none are given, a dialog asks for '
+        'them.')
+    parser.add_argument(
+        '--parallel', action='store_true',
+        help='Convert the files in parallel. Tables are never asked about.')
+    parser.add_argument(
+        '--processes', type=int, default=None,
+        help='Number of worker processes for --parallel '
+        '(default: number of CPUs).')
+    parser.add_argument(
+        '--pages', action='store_true',
+        help='Save each tab as its own page, with an index page linking '
+        'them, instead of one page of tabs.')
+    parser.add_argument(
+        '--page-size', type=int, default=page_size,
+        help='Most bytes of HTML per page for --pages; bigger tabs are split '
+        'at their h3 headers (default: %(default)s).')
+    parser.add_argument(
+        '--ask', action='store_true',
+        help='Ask about the tables the classifier is unsure of (see '
+        'ask_tables).')
+    args = parser.parse_args()
+    if args.ask:
+        ask_tables = True
+    
+    # Select files (UI) if none were given
+    if args.files:
+        fileList = args.files
+    else:
+        fileList, dirPath = select_files()
+    
+    # Read in, parse and save files
+    results = convert_files(fileList, args.processes, args.parallel,
+                            args.pages, args.page_size)
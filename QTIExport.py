@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+"""
+@author: cariefrantz
+
+Exports a Respondus table as a QTI 1.2 package (zip file) that can be
+imported straight into Canvas (Settings > Import Course Content > QTI .zip
+file), without the Respondus software.
+
+The package is written as a streaming zip: each question is rendered to XML
+and written to the zip as soon as it is read, so memory use does not grow
+with the size of the bank. Embed code (iframes, such as the 3D rock models
+from the 'Embed' column of the input tables) that appears in many questions
+is saved once in the package as a shared HTML file, and each question links
+to that file instead of repeating the embed code.
+
+This module only uses the standard library.
+
+Example in command line:
+    python QTIExport.py Respondus_Energy.csv Respondus_Energy.zip
+
+"""
+
+####################
+# IMPORTS
+####################
+import os
+import re
+import sys
+import html
+import hashlib
+import zipfile
+from RespondusText import (
+    choice_columns, countRows, getColumn, isBlank, iterCSVTables,
+    iterMCTables)
+
+
+####################
+# VARIABLES
+####################
+# Columns that go into a QTI multiple choice item
+QTI_columns = [
+    'Title/ID', 'Points', 'Question Wording', 'Correct Answer',
+    'General Feedback', 'Correct Feedback', 'Incorrect Feedback'
+    ] + choice_columns
+
+# Embed code that is saved once as a shared file
+embed_re = re.compile(r'<iframe\b.*?</iframe>', re.DOTALL | re.IGNORECASE)
+size_re = re.compile(r'\b(width|height)\s*=\s*"([^"]*)"', re.IGNORECASE)
+
+# Folder for the shared embed files. Canvas puts the package's
+#   web_resources folder in the course files, and replaces $IMS-CC-FILEBASE$
+#   in links with its location.
+embed_dir = 'web_resources/embeds/'
+filebase = '$IMS-CC-FILEBASE$/embeds/'
+
+assessment_head = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<questestinterop xmlns="http://www.imsglobal.org/xsd/ims_qtiasiv1p2">\n'
+    '  <assessment ident="{ident}" title="{title}">\n'
+    '    <section ident="root_section">\n')
+assessment_tail = (
+    '    </section>\n'
+    '  </assessment>\n'
+    '</questestinterop>\n')
+
+manifest_head = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<manifest identifier="{ident}_manifest" '
+    'xmlns="http://www.imsglobal.org/xsd/imsccv1p1/imscp_v1p1">\n'
+    '  <metadata>\n'
+    '    <schema>IMS Content</schema>\n'
+    '    <schemaversion>1.1.3</schemaversion>\n'
+    '  </metadata>\n'
+    '  <organizations/>\n'
+    '  <resources>\n'
+    '    <resource identifier="{ident}" type="imsqti_xmlv1p2">\n'
+    '      <file href="{ident}/{ident}.xml"/>\n'
+    '    </resource>\n')
+manifest_embed = (
+    '    <resource identifier="embed_{key}" type="webcontent" '
+    'href="{href}">\n'
+    '      <file href="{href}"/>\n'
+    '    </resource>\n')
+manifest_tail = (
+    '  </resources>\n'
+    '</manifest>\n')
+
+embed_page = (
+    '<!DOCTYPE html>\n'
+    '<html><head><meta charset="utf-8">'
+    '<style>html, body {{margin: 0; height: 100%;}} '
+    'iframe {{width: 100%; height: 100%; border: 0;}}</style></head>\n'
+    '<body>{embed}</body></html>\n')
+
+
+####################
+# SCRIPTS
+####################
+def iterTables(source, chunk_size=10000):
+    '''
+    Yields the Respondus table(s) to export. A source that is a path is read
+    in chunks, as a Respondus-formatted CSV file or a Respondus text file;
+    anything else is a Respondus table, yielded as is.
+    '''
+    if not isinstance(source, str):
+        yield source
+    elif source.endswith('.txt'):
+        yield from iterMCTables(source, chunk_size)
+    else:
+        yield from iterCSVTables(source, chunk_size)
+
+
+def iterRows(source, chunk_size=10000):
+    '''
+    Yields the QTI columns of each question in a source (see iterTables), as
+    a dict of column : value, reading chunk_size rows at a time.
+    '''
+    for table in iterTables(source, chunk_size):
+        n = countRows(table)
+        for start in range(0, n, chunk_size):
+            cols = [getColumn(table, col, start, start + chunk_size)
+                    for col in QTI_columns]
+            for row in zip(*cols):
+                yield dict(zip(QTI_columns, row))
+
+
+def embedKey(embed):
+    '''
+    Returns the name of the shared file for a piece of embed code.
+    '''
+    return hashlib.blake2b(embed.encode('utf-8'), digest_size=10).hexdigest()
+
+
+def toHTML(text):
+    '''
+    Converts Respondus text to HTML: text inside [HTML]...[/HTML] is used as
+    is, and plain text is escaped.
+    '''
+    text = str(text)
+    if text.startswith('[HTML]') and text.endswith('[/HTML]'):
+        return text[len('[HTML]'):-len('[/HTML]')]
+    return html.escape(text)
+
+
+def linkEmbeds(html_text):
+    '''
+    Replaces each piece of embed code in HTML with a link to its shared file
+    (an iframe of the same size).
+
+    Returns
+    -------
+    html_text : str
+        The HTML with the embeds replaced.
+    embeds : dict
+        Shared file name : embed code, for each embed replaced.
+
+    '''
+    embeds = {}
+    def link(match):
+        embed = match.group(0)
+        key = embedKey(embed)
+        embeds[key] = embed
+        size = ''.join(
+            ' ' + name.lower() + '="' + value + '"'
+            for name, value in size_re.findall(embed[:embed.find('>')]))
+        return ('<iframe src="' + filebase + key + '.html"' + size
+                + ' allowfullscreen></iframe>')
+    return embed_re.sub(link, html_text), embeds
+
+
+def feedbackXML(ident, text):
+    '''
+    Returns an itemfeedback element, or '' if there is no feedback.
+    '''
+    if isBlank(text) or text == '':
+        return ''
+    return (
+        '        <itemfeedback ident="' + ident + '">\n'
+        '          <flow_mat><material><mattext texttype="text/html">'
+        + html.escape(toHTML(text)) + '</mattext></material></flow_mat>\n'
+        '        </itemfeedback>\n')
+
+
+def itemXML(row, ident, share_embeds=True):
+    '''
+    Renders one question as a QTI multiple choice item.
+
+    Parameters
+    ----------
+    row : dict
+        The question's QTI columns (see iterRows).
+    ident : str
+        Unique identifier for the item.
+    share_embeds : bool
+        Whether to replace embed code with links to shared files.
+
+    Returns
+    -------
+    xml : str
+        The item element.
+    embeds : dict
+        Shared file name : embed code, for each embed in the question.
+
+    '''
+    wording = toHTML(row['Question Wording'])
+    embeds = {}
+    if share_embeds:
+        wording, embeds = linkEmbeds(wording)
+    title = row['Title/ID'] if not isBlank(row['Title/ID']) else ''
+    points = row['Points'] if not isBlank(row['Points']) else 1
+
+    # Possible answers
+    answers = [x for x in (row[col] for col in choice_columns)
+               if not isBlank(x)]
+    labels = ''.join(
+        '              <response_label ident="' + ident + '_' + str(n+1)
+        + '"><material><mattext texttype="text/plain">'
+        + html.escape(str(answer)) + '</mattext></material>'
+        '</response_label>\n'
+        for n, answer in enumerate(answers))
+
+    # Feedback
+    #   Unlike Respondus, Canvas allows general feedback alongside correct and
+    #   incorrect feedback
+    feedback = (feedbackXML('general_fb', row['General Feedback'])
+                + feedbackXML('correct_fb', row['Correct Feedback'])
+                + feedbackXML('general_incorrect_fb',
+                              row['Incorrect Feedback']))
+    def display(ident_fb):
+        if 'ident="' + ident_fb + '"' not in feedback:
+            return ''
+        return ('<displayfeedback feedbacktype="Response" linkrefid="'
+                + ident_fb + '"/>')
+
+    # Scoring
+    conditions = ''
+    if display('general_fb'):
+        conditions += (
+            '          <respcondition continue="Yes"><conditionvar><other/>'
+            '</conditionvar>' + display('general_fb') + '</respcondition>\n')
+    if not isBlank(row['Correct Answer']):
+        conditions += (
+            '          <respcondition continue="No"><conditionvar>'
+            '<varequal respident="response1">' + ident + '_'
+            + str(int(row['Correct Answer'])) + '</varequal></conditionvar>'
+            '<setvar action="Set" varname="SCORE">100</setvar>'
+            + display('correct_fb') + '</respcondition>\n')
+    if display('general_incorrect_fb'):
+        conditions += (
+            '          <respcondition continue="Yes"><conditionvar><other/>'
+            '</conditionvar>' + display('general_incorrect_fb')
+            + '</respcondition>\n')
+
+    xml = (
+        '      <item ident="' + ident + '" title="'
+        + html.escape(str(title)) + '">\n'
+        '        <itemmetadata><qtimetadata>\n'
+        '          <qtimetadatafield><fieldlabel>question_type</fieldlabel>'
+        '<fieldentry>multiple_choice_question</fieldentry>'
+        '</qtimetadatafield>\n'
+        '          <qtimetadatafield><fieldlabel>points_possible</fieldlabel>'
+        '<fieldentry>' + str(points) + '</fieldentry></qtimetadatafield>\n'
+        '        </qtimetadata></itemmetadata>\n'
+        '        <presentation>\n'
+        '          <material><mattext texttype="text/html">'
+        + html.escape(wording) + '</mattext></material>\n'
+        '          <response_lid ident="response1" rcardinality="Single">\n'
+        '            <render_choice>\n'
+        + labels +
+        '            </render_choice>\n'
+        '          </response_lid>\n'
+        '        </presentation>\n'
+        '        <resprocessing>\n'
+        '          <outcomes><decvar maxvalue="100" minvalue="0" '
+        'varname="SCORE" vartype="Decimal"/></outcomes>\n'
+        + conditions +
+        '        </resprocessing>\n'
+        + feedback +
+        '      </item>\n')
+    return xml, embeds
+
+
+def assessmentIdent(source, fpath, title):
+    '''
+    Returns the identifier of the assessment in a QTI package. Canvas matches
+    imported banks by identifier, so besides the title it depends on where
+    the questions come from (the source file, or the package's path for a
+    table) and on the first question's title, which holds the difficulty
+    level. Banks with the same title made from different files or at
+    different difficulty levels then do not replace each other.
+    '''
+    path = source if isinstance(source, str) else fpath
+    first = next(iterRows(source, 1), {'Title/ID' : ''})['Title/ID']
+    key = '\n'.join([title, os.path.abspath(path),
+                     '' if isBlank(first) else str(first)])
+    return 'g' + hashlib.blake2b(
+        key.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def build_QTI_package(source, fpath, title=None, share_embeds=True,
+                      chunk_size=10000):
+    '''
+    Generates a Canvas-importable QTI package (zip file) from a table
+    containing Respondus variables.
+
+    The zip is written as a stream. A first pass over the questions saves
+    each distinct piece of embed code once, as a shared HTML file; a second
+    pass renders each question and writes it to the assessment XML as it
+    goes. Only the names of the shared files are kept in memory.
+
+    Parameters
+    ----------
+    source : QuestionStore, pandas.DataFrame, dict of lists or str
+        A Respondus-formatted table for all of the questions to export, or
+        the path to a Respondus-formatted CSV file or Respondus text file.
+    fpath : str
+        Filepath to save the zip file to.
+    title : str
+        Title of the question bank in Canvas. Defaults to the file name.
+    share_embeds : bool
+        Whether to save embed code once as shared files. If False, each
+        question holds its own copy of its embed code.
+    chunk_size : int
+        Number of questions to read at a time.
+
+    Returns
+    -------
+    n : int
+        Number of questions written.
+    n_embeds : int
+        Number of shared embed files written.
+
+    '''
+    if title is None:
+        title = os.path.splitext(os.path.basename(fpath))[0]
+    ident = assessmentIdent(source, fpath, title)
+
+    n = 0
+    embed_keys = set()
+    with zipfile.ZipFile(fpath, 'w', zipfile.ZIP_DEFLATED) as zf:
+        # Save each distinct embed once
+        if share_embeds:
+            for row in iterRows(source, chunk_size):
+                if isBlank(row['Question Wording']):
+                    continue
+                for embed in embed_re.findall(str(row['Question Wording'])):
+                    key = embedKey(embed)
+                    if key not in embed_keys:
+                        embed_keys.add(key)
+                        zf.writestr(embed_dir + key + '.html',
+                                    embed_page.format(embed=embed))
+
+        # Stream the questions into the assessment
+        with zf.open(ident + '/' + ident + '.xml', 'w',
+                     force_zip64=True) as f:
+            f.write(assessment_head.format(
+                ident=ident, title=html.escape(title)).encode('utf-8'))
+            for n, row in enumerate(iterRows(source, chunk_size), 1):
+                xml = itemXML(row, ident + '_' + str(n), share_embeds)[0]
+                f.write(xml.encode('utf-8'))
+            f.write(assessment_tail.encode('utf-8'))
+
+        # List the package's files
+        with zf.open('imsmanifest.xml', 'w', force_zip64=True) as f:
+            f.write(manifest_head.format(ident=ident).encode('utf-8'))
+            for key in sorted(embed_keys):
+                f.write(manifest_embed.format(
+                    key=key, href=embed_dir + key + '.html').encode('utf-8'))
+            f.write(manifest_tail.encode('utf-8'))
+
+    return n, len(embed_keys)
+
+
+#%%
+####################
+# MAIN FUNCTION
+####################
+if __name__ == '__main__':
+    n, n_embeds = build_QTI_package(sys.argv[1], sys.argv[2])
+    print('Wrote ' + str(n) + ' questions (' + str(n_embeds)
+          + ' shared embeds) to ' + sys.argv[2])
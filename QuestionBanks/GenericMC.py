@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+@author: cariefrantz
+
+Question bank type GenericMC:
+Multiple choice questions imported from a table.
+
+"""
+
+####################
+# IMPORTS
+####################
+from GenerateQuestionBanks import buildBank, newRespondusTable
+
+
+####################
+# SCRIPTS
+####################
+def format_GenericMC(
+        input_file = None, difficulty = None, out_path = None,
+        chunksize = None):
+    '''
+    Formats a Respondus-formatted text file for a multiple choice question
+    set imported from a table.
+    
+    This example imports a spreadsheet with the columns
+        'Question group'    Title of question (this part is the same for each
+                               question in the set)
+        'Difficulty'        Question difficulty (can be used to create
+                                different sets based on difficulty)
+        'Points'            Points to award
+        'Question'          Question text
+        'Choice 1'          First possible choice
+        'Choice 2'          Second possible choice
+        'Choice 3'          Third possible choice
+        'Choice 4'          Fourth possible choice
+        'Choice 5'          Fifth possible choice
+        'General'           General feedback for the question
+        
+    It then generates Respondus-formatted multiple choice questions for the set
+
+    Parameters
+    ----------
+    input_file : str
+        Path to the input table. If not given, the user picks the file.
+    difficulty : str
+        Difficulty level for the question bank. If not given, the user is
+        asked to pick one.
+    out_path : str
+        Path to save the question bank to. Defaults to the input table's
+        directory.
+    chunksize : int
+        If given, the input table is streamed this many rows at a time
+        instead of being loaded all at once (see buildBank).
+
+    Returns
+    -------
+    Respondus_table : QuestionStore
+        The generated Respondus table, or None if the input was streamed.
+    '''
+    # Every question takes its title and points from the first row of the
+    #   trimmed input table, so when the table is streamed that row is kept
+    #   from the first chunk and passed on to the later ones
+    first = []
+    def fill(in_table, difficulty):
+        if not first and len(in_table):
+            first.append(in_table.iloc[0])
+        return fill_GenericMC(
+            in_table, difficulty, first[0] if first else None)
+    
+    # The difficulty level is only asked for if the input table has more
+    #   than one
+    return buildBank(
+        fill, 'GenericMC', 'Respondus_GenericMC',
+        'Select table containing the question set (CSV)',
+        input_file, difficulty, out_path, chunksize,
+        levels_optional = True)
+
+
+def fill_GenericMC(in_table, difficulty, first_row = None):
+    '''
+    Fills in the Respondus table for format_GenericMC from the trimmed input
+    table (or a chunk of it). If difficulty is None, the question title does
+    not include a difficulty level. The question title and points come from
+    first_row, the first row of the whole trimmed input table, which defaults
+    to the first row of in_table.
+    '''
+    if difficulty is None:
+        difficulty_title = ''
+    else:
+        difficulty_title = ' Level ' + difficulty
+    
+    # Fill in Respondus table
+    Respondus_table = newRespondusTable()
+    if not len(in_table):
+        return Respondus_table
+    if first_row is None:
+        first_row = in_table.iloc[0]
+    # Type of question
+    Respondus_table['Type'] = ['MC'] * len(in_table)
+    # Question title
+    Respondus_table['Title/ID'] = (
+        [first_row['Question group'] + difficulty_title]
+        * len(in_table))
+    # Number of points per question
+    Respondus_table['Points'] = [first_row['Points']] * len(in_table)
+    # Wording of the question
+    Respondus_table['Question Wording'] = (
+        '[HTML]<p><em>' + in_table['Question group'] + '</em></p>' +
+        '<p>' + in_table['Question'] + '</p>[/HTML]'
+        )
+    # Multiple choice possible answers
+    Respondus_table['Choice 1'] = in_table['Choice 1']
+    Respondus_table['Choice 2'] = in_table['Choice 2']
+    Respondus_table['Choice 3'] = in_table['Choice 3']
+    Respondus_table['Choice 4'] = in_table['Choice 4']
+    #Respondus_table['Choice 5'] = in_table['Choice 5']
+    
+    # Correct answer
+    Respondus_table['Correct Answer'] = in_table['Correct Answer']
+    
+    # Feedback
+    Respondus_table['General Feedback'] = in_table['General']
+    
+    return Respondus_table
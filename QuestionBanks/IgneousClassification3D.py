@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+@author: cariefrantz
+
+Question bank type IgneousClassification3D:
+Igneous rock classification questions that use interactive 3D rock
+models.
+
+"""
+
+####################
+# IMPORTS
+####################
+from GenerateQuestionBanks import (
+    buildBank, newRespondusTable, mapAnswerKey, normalizeEmbeds)
+
+
+####################
+# SCRIPTS
+####################
+def format_IgneousClassification3D(
+        input_file = None, difficulty = None, out_path = None,
+        chunksize = None):
+    '''
+    Formats a Respondus-formatted text file
+    for an igneous rock classification question set that uses
+    interactive 3D rock models.
+    
+    This example imports a spreadsheet with the columns
+        'Type' (type of rock that students need to identify)
+        'Felsic-Mafic' (whether the rock composition is felsic, mafic, or 
+                        intermediate)
+        'Difficulty' (difficulty of the identification, which is used in this
+                      script to trim the question set to just questions with
+                      a designated difficulty level)
+        'Embed' (the HTML embed code containing the 3D rock model that students
+                 will identify)
+        'Description' (text that forms the general feedback for the question)
+        
+    It then generates Respondus-formatted multiple choice questions that test
+    students' ability to classify the igneous rocks they are shown as being
+    extrusive or intrusive and felsic, intermediate, or mafic.
+
+    Parameters
+    ----------
+    input_file : str
+        Path to the input table. If not given, the user picks the file.
+    difficulty : str
+        Difficulty level for the question bank. If not given, the user is
+        asked to pick one.
+    out_path : str
+        Path to save the question bank to. Defaults to the input table's
+        directory.
+    chunksize : int
+        If given, the input table is streamed this many rows at a time
+        instead of being loaded all at once (see buildBank).
+
+    Returns
+    -------
+    Respondus_table : QuestionStore
+        The generated Respondus table, or None if the input was streamed.
+    '''
+    return buildBank(
+        fill_IgneousClassification3D, 'IgneousClassification',
+        'Respondus_IgneousClassification',
+        'Select rock and mineral 3D model list for the question bank (CSV)',
+        input_file, difficulty, out_path, chunksize,
+        usecols = ['Type', 'Felsic-Mafic', 'Difficulty', 'Embed',
+                   'Description'],
+        # Trim the table to igneous rocks only
+        type_contains = 'igneous')
+
+
+def fill_IgneousClassification3D(in_table, difficulty):
+    '''
+    Fills in the Respondus table for format_IgneousClassification3D from the
+    trimmed input table (or a chunk of it).
+    '''
+    # Fill in Respondus table
+    Respondus_table = newRespondusTable()
+    # Type of question
+    Respondus_table['Type'] = ['MC'] * len(in_table)
+    # Question title
+    Respondus_table['Title/ID'] = (
+        ['Igneous Rock Classification Level ' + difficulty] * len(in_table))
+    # Number of points per question
+    Respondus_table['Points'] = [1] * len(in_table)
+    # Wording of the question
+    Respondus_table['Question Wording'] = (
+        "[HTML]<p>How did this rock form?</p>"
+        + normalizeEmbeds(in_table['Embed']) + '[/HTML]')
+    
+    # Multiple choice possible answers
+    answer_set = {
+        'extrusive igneous felsic'          :  {
+            'choice'        : 1,
+            'type'          : 'extrusive igneous',
+            'composition'   : 'felsic',
+            'formation'     : ('Formed during an eruption ' + 
+                               '(extrusive igneous) of felsic lava')
+            },
+        'extrusive igneous intermediate'    :  {
+            'choice'        : 2,
+            'type'          : 'extrusive igneous',
+            'composition'   : 'intermediate',
+            'formation'     : ('Formed during an eruption ' + 
+                               '(extrusive igneous) of lava ' +
+                               'of intermediate composition')
+            },
+        'extrusive igneous mafic'           :  {
+            'choice'        : 3,
+            'type'          : 'extrusive igneous',
+            'composition'   : 'mafic',
+            'formation'     : ('Formed during an eruption ' + 
+                               '(extrusive igneous) of mafic lava')
+            },
+        'intrusive igneous felsic'          :  {
+            'choice'        : 4,
+            'type'          : 'intrusive igneous',
+            'composition'   : 'felsic',
+            'formation'     : ('Felsic magma cooled slowly inside the Earth')
+            },
+        'intrusive igneous intermediate'    :  {
+            'choice'        : 5,
+            'type'          : 'intrusive igneous',
+            'composition'   : 'intermediate',
+            'formation'     : ('Intermediate composition magma ' +
+                               ' cooled slowly inside the Earth')
+            },
+        'intrusive igneous mafic'           :  {
+            'choice'        : 6,
+            'type'          : 'intrusive igneous',
+            'composition'   : 'mafic',
+            'formation'     : ('Mafic magma cooled slowly inside the Earth')
+            }
+        }
+    for ans in answer_set:
+        Respondus_table['Choice ' + str(answer_set[ans]['choice'])] = (
+            answer_set[ans]['formation']
+            )
+
+    # Feedback
+    Respondus_table['General Feedback'] = in_table['Description'].values
+    
+    # Generate correct answers from values in the input table
+    Respondus_table['Correct Answer'] = mapAnswerKey(
+        in_table['Type'] + ' ' + in_table['Felsic-Mafic'],
+        {ans : answer_set[ans]['choice'] for ans in answer_set},
+        label_name = 'Type and Felsic-Mafic')
+    
+    return Respondus_table
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+@author: cariefrantz
+
+Question bank type LogScaleIntensity:
+Earthquake magnitude scale questions, generated de novo from the question
+templates in QuestionTemplates.py.
+
+"""
+
+####################
+# IMPORTS
+####################
+import os
+from GenerateQuestionBanks import getRNG, saveBank
+
+
+####################
+# SCRIPTS
+####################
+def format_LogScaleIntensity(
+        input_file = None, difficulty = None, out_path = None,
+        chunksize = None, seed = None):
+    '''
+    Formats a Respondus-formatted text file
+    for a question set that asks students to interpret earthquake magnitude
+    scales in light of logarithmic changes.
+    
+    This example does not read an input table, but generates the question
+    set de novo from the question templates in QuestionTemplates.py (which
+    needs numpy). It saves two question banks, one for amplitude and one for
+    energy, which ask about the same pairs of earthquakes.
+
+    Parameters
+    ----------
+    input_file : str
+        Not used; this question set is generated de novo.
+    difficulty : str
+        Not used; this question set has a single difficulty level.
+    out_path : str
+        Path to save the question banks to. The scale ('_Amplitude' or
+        '_Energy') is appended to the file name. Defaults to the working
+        directory.
+    chunksize : int
+        Not used; this question set has no input table.
+    seed : int
+        Random seed, for reproducible question banks. Defaults to drawing
+        from numpy's global random state (see getRNG).
+    '''
+    from QuestionTemplates import (
+        LogScaleTemplates, drawParameters, generateTemplateBank)
+    
+    # Draw the earthquake magnitudes once so both banks use the same pairs
+    rng = getRNG(seed)
+    params = drawParameters(LogScaleTemplates['Amplitude'], rng = rng)
+    
+    # Fill in Respondus tables
+    for t, template in LogScaleTemplates.items():
+        Respondus_table = generateTemplateBank(template, params, rng = rng)
+    
+        # Save the Respondus table file and the Respondus text file
+        #   Both banks share out_path, so each gets its scale as a suffix
+        if out_path:
+            t_path = os.path.splitext(out_path)[0] + '_' + t
+        else: t_path = None
+        saveBank(Respondus_table, t, os.getcwd(), 'Respondus_' + t, t_path)
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+@author: cariefrantz
+
+Question bank type RockCycleClassification3D:
+Rock cycle classification questions that use interactive 3D rock models.
+
+"""
+
+####################
+# IMPORTS
+####################
+from GenerateQuestionBanks import (
+    buildBank, newRespondusTable, mapAnswerKey, normalizeEmbeds)
+
+
+####################
+# SCRIPTS
+####################
+def format_RockCycleClassification3D(
+        input_file = None, difficulty = None, out_path = None,
+        chunksize = None):
+    '''
+    Formats a Respondus-formatted text file
+    for a rock cycle classification question set that uses
+    interactive 3D rock models.
+    
+    This example imports a spreadsheet with the columns
+        'Type' (type of rock that students need to identify)
+        'Difficulty' (difficulty of the identification, which is used in this
+                      script to trim the question set to just questions with
+                      a designated difficulty level)
+        'Embed' (the HTML embed code containing the 3D rock model that students
+                 will identify)
+        'Description' (text that forms the general feedback for the question)
+        
+    It then generates Respondus-formatted multiple choice questions that test
+    students' ability to classify the rocks they are shown as being
+    sedimentary, extrusive igneous, intrusive igneous, metamorphic, or mineral.
+
+    Parameters
+    ----------
+    input_file : str
+        Path to the input table. If not given, the user picks the file.
+    difficulty : str
+        Difficulty level for the question bank. If not given, the user is
+        asked to pick one.
+    out_path : str
+        Path to save the question bank to. Defaults to the input table's
+        directory.
+    chunksize : int
+        If given, the input table is streamed this many rows at a time
+        instead of being loaded all at once (see buildBank).
+
+    Returns
+    -------
+    Respondus_table : QuestionStore
+        The generated Respondus table, or None if the input was streamed.
+    '''
+    return buildBank(
+        fill_RockCycleClassification3D, 'RockCycleClassification',
+        'Respondus_RockCycleClassification',
+        'Select rock and mineral 3D model list for the question bank (CSV)',
+        input_file, difficulty, out_path, chunksize,
+        usecols = ['Type', 'Difficulty', 'Embed', 'Description'])
+
+
+def fill_RockCycleClassification3D(in_table, difficulty):
+    '''
+    Fills in the Respondus table for format_RockCycleClassification3D from the
+    trimmed input table (or a chunk of it).
+    '''
+    # Fill in Respondus table
+    Respondus_table = newRespondusTable()
+    # Type of question
+    Respondus_table['Type'] = ['MC'] * len(in_table)
+    # Question title
+    Respondus_table['Title/ID'] = (
+        ['Rock Cycle Rock Classification Level ' + difficulty] * len(in_table))
+    # Number of points per question
+    Respondus_table['Points'] = [1] * len(in_table)
+    # Wording of the question
+    Respondus_table['Question Wording'] = (
+        "[HTML]<p>What kind of rock is this?</p>"
+        + normalizeEmbeds(in_table['Embed']) + '[/HTML]')
+    # Multiple choice possible answers
+    Respondus_table['Choice 1'] = ['mineral'] * len(in_table)
+    Respondus_table['Choice 2'] = ['sedimentary'] * len(in_table)
+    Respondus_table['Choice 3'] = ['extrusive igneous'] * len(in_table)
+    Respondus_table['Choice 4'] = ['intrusive igneous'] * len(in_table)
+    Respondus_table['Choice 5'] = ['metamorphic'] * len(in_table)
+    # Feedback
+    Respondus_table['General Feedback'] = in_table['Description']
+    
+    # Generate correct answers from values in the input table
+    #   (choice number for each rock type label)
+    answer_key = {
+        'mineral'           : 1,
+        'sedimentary'       : 2,
+        'sedimentary rock'  : 2,
+        'extrusive igneous' : 3,
+        'intrusive igneous' : 4,
+        'metamorphic'       : 5
+        }
+    Respondus_table['Correct Answer'] = mapAnswerKey(
+        in_table['Type'], answer_key)
+    
+    return Respondus_table
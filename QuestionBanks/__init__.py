@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+"""
+@author: cariefrantz
+
+Question bank types for GenerateQuestionBanks.py.
+
+Each module in this folder is one type of question bank. The module's file
+name is the name of the bank type, and the module defines a script named
+format_ + the bank type, e.g. RockOrMineral3D.py defines
+format_RockOrMineral3D. That script takes the arguments
+    input_file, difficulty, out_path, chunksize
+and generates and saves the question bank.
+
+Bank types are found by their file names alone. A module is only imported
+when its bank type is used, so adding bank types here does not slow down
+starting GenerateQuestionBanks.py.
+
+To add a new question bank type, copy one of the modules here (such as
+RockOrMineral3D.py), rename it, and modify its scripts.
+
+"""
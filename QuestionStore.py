@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+@author: cariefrantz
+
+A compact, columnar table for Respondus questions.
+
+Most of the 34 Respondus columns are empty for a typical multiple choice bank,
+and many of the filled ones hold the same value on every row (the question
+type, title, points, or fixed choices such as 'rock' and 'mineral').
+A QuestionStore therefore
+    - interns every distinct value once, in a single pool shared by all
+      columns, and stores each cell as an integer code into that pool
+    - stores a column that is empty on every row as nothing at all, and a
+      column with the same value on every row as a single code
+
+Columns are filled and read like DataFrame columns:
+    Respondus_table = QuestionStore()
+    Respondus_table['Type'] = ['MC'] * 100
+    Respondus_table['Choice 1'] = 'rock'
+    wording = Respondus_table['Question Wording']
+
+This module only uses the standard library.
+
+"""
+
+####################
+# IMPORTS
+####################
+import os
+import sys
+import csv
+from array import array
+from RespondusText import Respondus_columns, isBlank
+
+
+####################
+# SCRIPTS
+####################
+class QuestionStore:
+    '''
+    A columnar table of questions with interned values and sparse storage of
+    empty and constant columns.
+
+    Parameters
+    ----------
+    columns : list of str
+        Column names. Defaults to the Respondus columns.
+    '''
+
+    # Marker for an empty cell in a column's codes
+    BLANK = -1
+
+    def __init__(self, columns = Respondus_columns):
+        self.columns = list(columns)
+        self._n_rows = 0
+        self._pool = []         # Distinct values
+        self._codes = {}        # (type, value) : index in the pool
+        # Each column is None (empty), an int (the same code on every row)
+        #   or an array of codes (one per row)
+        self._data = {col : None for col in self.columns}
+
+    def __len__(self):
+        return self._n_rows
+
+    def __contains__(self, col):
+        return col in self._data
+
+    def _intern(self, value):
+        # Return the pool code for a value, adding it to the pool if new.
+        #   Values are keyed by type too, so that 1, 1.0 and True stay apart.
+        if isBlank(value):
+            return self.BLANK
+        key = (type(value), value)
+        code = self._codes.get(key)
+        if code is None:
+            code = self._codes[key] = len(self._pool)
+            self._pool.append(value)
+        return code
+
+    def __setitem__(self, col, values):
+        if col not in self._data:
+            self.columns.append(col)
+
+        # numpy arrays and pandas Series are converted to lists of plain
+        #   values, and numpy scalars to plain values
+        if hasattr(values, 'tolist'):
+            values = values.tolist()
+
+        # A single value fills the whole column
+        if isinstance(values, str) or not hasattr(values, '__iter__'):
+            self._data[col] = self._intern(values)
+            return
+
+        values = list(values)
+        if not self._n_rows:
+            self._n_rows = len(values)
+        elif len(values) != self._n_rows:
+            raise ValueError(
+                'Length of values (' + str(len(values)) + ') does not match '
+                + 'the number of questions (' + str(self._n_rows) + ')')
+
+        codes = array('i', [self._intern(x) for x in values])
+        if not codes:
+            self._data[col] = None
+        elif codes.count(codes[0]) == len(codes):
+            self._data[col] = codes[0]
+        else:
+            self._data[col] = codes
+
+    def column(self, col, start = 0, stop = None):
+        '''
+        Returns rows start:stop of a column as a list. Empty cells are None.
+        '''
+        rows = range(self._n_rows)[start:stop]
+        codes = self._data[col]
+        if isinstance(codes, int):
+            value = self._pool[codes] if codes != self.BLANK else None
+            return [value] * len(rows)
+        if codes is None:
+            return [None] * len(rows)
+        pool = self._pool
+        return [pool[c] if c != self.BLANK else None
+                for c in codes[rows.start:rows.stop]]
+
+    def __getitem__(self, col):
+        return self.column(col)
+
+    def row(self, i):
+        '''
+        Returns one question as a dict of column : value.
+        '''
+        return {col : self.column(col, i, i+1)[0] for col in self.columns}
+
+    def nbytes(self):
+        '''
+        Returns the approximate memory used by the cell codes and the pool of
+        distinct values, in bytes.
+        '''
+        size = sum(sys.getsizeof(x) for x in self._pool)
+        size += sum(codes.itemsize * len(codes)
+                    for codes in self._data.values()
+                    if isinstance(codes, array))
+        return size
+
+    def to_csv(self, fpath, index = False, mode = 'w', header = True,
+               chunk_size = 10000):
+        '''
+        Saves the table as a CSV file, in the same layout as
+        pandas.DataFrame.to_csv. Empty cells are written as empty fields.
+        Use mode='a' and header=False to append to an existing file.
+        index is accepted for compatibility with DataFrame.to_csv and ignored.
+        '''
+        with open(fpath, mode, newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, lineterminator=os.linesep)
+            if header:
+                writer.writerow(self.columns)
+            for start in range(0, self._n_rows, chunk_size):
+                cols = [self.column(col, start, start + chunk_size)
+                        for col in self.columns]
+                writer.writerows(
+                    ['' if x is None else x for x in row]
+                    for row in zip(*cols))
+
+    def to_dataframe(self):
+        '''
+        Returns the table as a pandas DataFrame.
+        '''
+        import pandas as pd
+        return pd.DataFrame(
+            {col : self.column(col) for col in self.columns},
+            columns=self.columns)
+
+    @classmethod
+    def from_table(cls, table):
+        '''
+        Builds a QuestionStore from a DataFrame or dict-of-lists table.
+        '''
+        store = cls(list(table.keys()))
+        for col in store.columns:
+            store[col] = table[col]
+        return store
@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+"""
+@author: cariefrantz
+
+Generates question banks from parametric question templates.
+
+A template declares a question as text with parameter ranges and answer
+formulas. Every parameter combination is drawn and evaluated with numpy in a
+single vectorized pass, so a template can produce anything from a few dozen
+to millions of questions.
+
+A template is a dict with the keys
+    'title'         Title/ID of each question
+    'points'        Points per question
+    'wording'       Question wording, with {name} fields for the parameters
+    'parameters'    Dict of parameter name : list of possible values
+    'each'          List of parameters to enumerate. One question is made
+                        for every combination of their values; all other
+                        parameters are drawn at random for each question.
+    'derived'       Dict of name : function(params) for values calculated
+                        from the parameters (evaluated in order)
+    'valid'         Function(params) returning False for combinations that
+                        are not allowed. The random parameters of those
+                        questions are drawn again.
+    'formats'       Dict of name : printf-style format (such as '%.1f') for
+                        the {name} fields in the wording. Default is '%s'.
+    'answer'        Function(params) returning the correct answers
+    'choices'       Sorted list of all possible answers
+    'n_choices'     Number of choices per question
+Each function receives a dict of numpy arrays (one value per question) and
+returns an array.
+
+To add a new question bank of the same kind, declare a new template (see
+LogScaleTemplates below) and pass it to generateTemplateBank.
+
+Example in command line:
+    python QuestionTemplates.py Amplitude Energy --n 10 --seed 1
+
+"""
+
+####################
+# IMPORTS
+####################
+import os
+import argparse
+import warnings
+from string import Formatter
+import numpy as np
+from GenerateQuestionBanks import (
+    newRespondusTable, genRandomAnswerSets, getRNG, saveBank)
+
+
+####################
+# TEMPLATE SCRIPTS
+####################
+def lookup(mapping, values):
+    '''
+    Maps an array of values through a dict, looking up each distinct value
+    only once.
+
+    Parameters
+    ----------
+    mapping : dict
+        Dict of value : result.
+    values : numpy.ndarray
+        Values to map.
+
+    Returns
+    -------
+    results : numpy.ndarray
+        The mapped value for each input value.
+
+    '''
+    keys, inverse = np.unique(np.asarray(values), return_inverse=True)
+    results = np.array([mapping[k] for k in keys.tolist()])
+    return results[inverse.reshape(-1)]
+
+
+def deriveParameters(template, params):
+    '''
+    Calculates a template's derived values from its parameters.
+    '''
+    for name, func in template.get('derived', {}).items():
+        params[name] = np.asarray(func(params))
+    return params
+
+
+def drawParameters(template, n = 1, rng = None, max_tries = 100):
+    '''
+    Draws the parameters for every question generated from a template.
+
+    Parameters
+    ----------
+    template : dict
+        The question template.
+    n : int
+        Number of questions for each combination of the enumerated ('each')
+        parameters, or the total number of questions if there are none.
+    rng : numpy.random.Generator or int
+        Random number generator, or a seed for one. Defaults to a Generator
+        seeded from numpy's global random state (see getRNG).
+    max_tries : int
+        Number of times to redraw parameters that are not valid. Questions
+        that are still not valid after that are dropped, with a warning.
+
+    Returns
+    -------
+    params : dict of numpy.ndarray
+        The parameter and derived values of each question.
+
+    '''
+    rng = getRNG(rng)
+    spec = template['parameters']
+    each = template.get('each', [])
+
+    # Enumerate every combination of the 'each' parameters
+    params = {}
+    size = n
+    if each:
+        grids = np.meshgrid(*[np.asarray(spec[p]) for p in each],
+                            indexing='ij')
+        for p, grid in zip(each, grids):
+            params[p] = np.repeat(grid.reshape(-1), n)
+        size = len(params[each[0]])
+
+    # Draw the rest at random
+    random_params = [p for p in spec if p not in each]
+    for p in random_params:
+        params[p] = rng.choice(np.asarray(spec[p]), size)
+    params = deriveParameters(template, params)
+
+    # Redraw the random parameters of any invalid combinations
+    if 'valid' in template:
+        ok = np.asarray(template['valid'](params), dtype=bool)
+        tries = 0
+        while not ok.all() and random_params and tries < max_tries:
+            redraw = ~ok
+            for p in random_params:
+                params[p][redraw] = rng.choice(
+                    np.asarray(spec[p]), redraw.sum())
+            params = deriveParameters(template, params)
+            ok = np.asarray(template['valid'](params), dtype=bool)
+            tries += 1
+        if not ok.all():
+            warnings.warn(
+                str((~ok).sum()) + ' of ' + str(len(ok)) + ' questions from '
+                'template ' + repr(template.get('title')) + ' were dropped: '
+                'no valid parameters were drawn for them in '
+                + str(max_tries) + ' tries')
+        params = {name : values[ok] for name, values in params.items()}
+
+    return params
+
+
+def renderWording(template, params):
+    '''
+    Fills in the {name} fields of a template's wording for every question.
+
+    Parameters
+    ----------
+    template : dict
+        The question template.
+    params : dict of numpy.ndarray
+        The parameter values of each question, as returned by drawParameters.
+
+    Returns
+    -------
+    wording : numpy.ndarray of str objects
+        The question wording of each question.
+
+    '''
+    formats = template.get('formats', {})
+    size = len(next(iter(params.values())))
+    wording = np.full(size, '', dtype=object)
+    for literal, field, spec, conversion in Formatter().parse(
+            template['wording']):
+        if literal:
+            wording = wording + literal
+        if field is not None:
+            # Format each distinct value once
+            fmt = formats.get(field, '%s')
+            values, inverse = np.unique(params[field], return_inverse=True)
+            text = np.array([fmt % x for x in values.tolist()], dtype=object)
+            wording = wording + text[inverse.reshape(-1)]
+    return wording
+
+
+def generateTemplateBank(template, params = None, n = 1, rng = None):
+    '''
+    Generates a Respondus table from a question template.
+
+    Parameters
+    ----------
+    template : dict
+        The question template.
+    params : dict of numpy.ndarray
+        Parameter values to use, as returned by drawParameters. Templates
+        that share the same parameters can pass the same values to ask the
+        same questions in different ways. If not given, new values are drawn.
+    n : int
+        Number of questions per combination of the enumerated parameters
+        (see drawParameters). Ignored if params is given.
+    rng : numpy.random.Generator or int
+        Random number generator, or a seed for one. Defaults to a Generator
+        seeded from numpy's global random state (see getRNG).
+
+    Returns
+    -------
+    Respondus_table : QuestionStore
+        The generated Respondus table.
+
+    '''
+    rng = getRNG(rng)
+    if params is None:
+        params = drawParameters(template, n, rng)
+    wording = renderWording(template, params)
+    answers = np.asarray(template['answer'](params))
+    n_q = len(wording)
+
+    # Fill in Respondus table
+    Respondus_table = newRespondusTable()
+    Respondus_table['Type'] = ['MC'] * n_q
+    Respondus_table['Title/ID'] = [template['title']] * n_q
+    Respondus_table['Points'] = [template.get('points', 1)] * n_q
+    Respondus_table['Question Wording'] = wording
+
+    # Multiple choice possible answers
+    # Select random incorrect answers for every question at once
+    choices = list(template['choices'])
+    n_ans = template.get('n_choices', len(choices))
+    ans_sets, i = genRandomAnswerSets(choices, answers, n_ans, rng)
+    for n in range(n_ans):
+        Respondus_table['Choice ' + str(n + 1)] = ans_sets[:, n]
+    Respondus_table['Correct Answer'] = i + 1
+
+    return Respondus_table
+
+
+####################
+# TEMPLATES
+####################
+
+# Earthquake magnitude scales
+#   Two earthquakes, the second a whole number of magnitudes larger
+magnitude_parameters = {
+    'x1'    : [x/10 for x in range(30,70,1)],
+    'step'  : [1,2,3,4]
+    }
+magnitude_answers = [
+    '3 x', '10 x', '30 x', '100 x', '1,000 x', '10,000 x', '33,000 x',
+    '100,000 x', '1,000,000 x']
+
+LogScaleTemplates = {
+    'Amplitude' : {
+        'title'         : 'Amplitude scale',
+        'points'        : 1,
+        'wording'       : (
+            'Two earthquakes occur in a city. The first measures {x1} on the '
+            'Richter scale. The second measures {x2}. How much larger is the '
+            'amplitude of shaking in the second earthquake compared to the '
+            'first?'),
+        'parameters'    : magnitude_parameters,
+        'each'          : ['x1'],
+        'derived'       : {'x2' : lambda p: np.round(p['x1'] + p['step'], 1)},
+        'valid'         : lambda p: p['x2'] < 10,
+        'formats'       : {'x1' : '%.1f', 'x2' : '%.1f'},
+        # Shaking amplitude increases 10x per magnitude
+        'answer'        : lambda p: lookup(
+            {1 : '10 x', 2 : '100 x', 3 : '1,000 x', 4 : '10,000 x'},
+            p['step']),
+        'choices'       : magnitude_answers,
+        'n_choices'     : 5
+        },
+    'Energy'    : {
+        'title'         : 'Energy scale',
+        'points'        : 1,
+        'wording'       : (
+            'Two earthquakes occur in a city. The first has a moment '
+            'magnitude of {x1}. The second has a moment magnitude of {x2}. '
+            'Roughly how much more energy was released in the second '
+            'earthquake compared to the first?'),
+        'parameters'    : magnitude_parameters,
+        'each'          : ['x1'],
+        'derived'       : {'x2' : lambda p: np.round(p['x1'] + p['step'], 1)},
+        'valid'         : lambda p: p['x2'] < 10,
+        'formats'       : {'x1' : '%.1f', 'x2' : '%.1f'},
+        # Energy released increases ~32x per magnitude
+        'answer'        : lambda p: lookup(
+            {1 : '30 x', 2 : '1,000 x', 3 : '33,000 x', 4 : '1,000,000 x'},
+            p['step']),
+        'choices'       : magnitude_answers,
+        'n_choices'     : 5
+        }
+    }
+
+# All of the templates available from the command line
+Templates = dict(LogScaleTemplates)
+
+
+#%%
+####################
+# MAIN FUNCTION
+####################
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Generates question banks from question templates.')
+    parser.add_argument(
+        'templates', nargs='+', choices=list(Templates),
+        help='Templates to generate question banks from.')
+    parser.add_argument(
+        '--n', type=int, default=1,
+        help='Questions per combination of the enumerated parameters.')
+    parser.add_argument(
+        '--seed', type=int, default=None,
+        help='Random seed, for reproducible question banks.')
+    parser.add_argument(
+        '--out', default=os.getcwd(),
+        help='Directory to save the question banks to.')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    for name in args.templates:
+        Respondus_table = generateTemplateBank(
+            Templates[name], n = args.n, rng = rng)
+        saveBank(Respondus_table, name, args.out, 'Respondus_' + name)
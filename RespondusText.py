@@ -0,0 +1,766 @@
+# -*- coding: utf-8 -*-
+"""
+@author: cariefrantz
+
+Reads and writes the Respondus multiple choice text format.
+
+This module only uses the standard library, so Respondus text files can be
+built from Respondus-formatted CSV files without loading pandas or numpy.
+The question tables it reads from can be QuestionStores, pandas DataFrames or
+plain dicts of column lists.
+
+Example in command line:
+    python RespondusText.py Respondus_Energy.csv Respondus_Energy.txt
+or, to read a Respondus text file back into a Respondus-formatted CSV file:
+    python RespondusText.py Respondus_Energy.txt Respondus_Energy.csv
+
+"""
+
+####################
+# IMPORTS
+####################
+import os
+import re
+import csv
+import sys
+import json
+import mmap
+import hashlib
+import itertools
+
+
+####################
+# VARIABLES
+####################
+Respondus_columns=[
+    'Type', 'Title/ID', 'Points', 'Question Wording', 'Correct Answer',
+    'Choice 1', 'Choice 2', 'Choice 3', 'Choice 4', 'Choice 5',
+    'Choice 6', 'Choice 7', 'Choice 8', 'Choice 9', 'Choice 10',
+    'General Feedback', 'Correct Feedback', 'Incorrect Feedback',
+    'Feedback 1', 'Feedback 2', 'Feedback 3', 'Feedback 4', 'Feedback 5',
+    'Feedback 6', 'Feedback 7', 'Feedback 8', 'Feedback 9', 'Feedback 10',
+    'Topic', 'Difficulty Level', 'Meta 1', 'Meta 2', 'Meta 3', 'Meta 4']
+MC_letters = ['a','b','c','d','e','f','g','h','i','j']
+choice_columns = ['Choice ' + str(n) for n in range(1, 11)]
+# One multiple choice question in a Respondus text file, as written by
+#   iterMCQuestions
+MC_question_re = re.compile(
+    r'Points: (?P<points>[^\n]*)\n\n'
+    r'Title: (?P<title>[^\n]*)\n'
+    r'(?P<number>\d+)\) (?P<wording>.*?)\n\n'
+    r'(?:(?:~ (?P<correct>.*?)\n)?(?:@ (?P<incorrect>.*?)\n)?\n)?'
+    r'(?P<answers>(?:\*?[a-j]\) [^\n]*\n)*)'
+    r'\n\Z', re.DOTALL)
+MC_answer_re = re.compile(r'(\*?)[a-j]\) ([^\n]*)\n')
+# Columns that go into the rendered text of a multiple choice question
+rendered_columns = [
+    'Points', 'Title/ID', 'Question Wording', 'Correct Answer',
+    'General Feedback', 'Correct Feedback', 'Incorrect Feedback'
+    ] + choice_columns
+
+
+####################
+# TABLE ACCESS
+####################
+def isBlank(value):
+    '''
+    Returns True for an empty cell (NaN in a DataFrame, None in a dict table).
+    '''
+    return value is None or str(value) == 'nan'
+
+
+def countRows(table):
+    '''
+    Returns the number of questions in a DataFrame, QuestionStore or
+    dict-of-lists table.
+    '''
+    if isinstance(table, dict):
+        return len(next(iter(table.values()))) if table else 0
+    return len(table)
+
+
+def getColumn(table, col, start, stop):
+    '''
+    Returns rows start:stop of one column of a DataFrame, QuestionStore or
+    dict-of-lists table. Missing columns are returned as empty cells.
+    '''
+    if hasattr(table, 'column') and col in table:
+        return table.column(col, start, stop)
+    if col not in table:
+        return [None] * (min(stop, countRows(table)) - start)
+    values = table[col]
+    if hasattr(values, 'iloc'):
+        return values.iloc[start:stop]
+    return values[start:stop]
+
+
+####################
+# WRITING
+####################
+def build_MC_bank(Respondus_table, fpath, chunk_size=10000):
+    '''
+    Generates a Respondus-formatted text file from a table containing
+    Respondus variables.
+
+    Questions are rendered chunk by chunk and streamed straight to a buffered
+    file handle, so memory use does not grow with the size of the bank.
+
+    Parameters
+    ----------
+    Respondus_table : QuestionStore, pandas.DataFrame or dict of lists
+        A Respondus-formatted table for all of the questions to format to a
+        text file
+
+    fpath : str
+        Filepath to save the text file to
+
+    chunk_size : int
+        Number of questions to precompute at a time.
+
+    Returns
+    -------
+    None.
+
+    '''
+    # The file is rebuilt from scratch, so any incremental build manifest
+    #   for it no longer applies
+    removeManifest(fpath)
+    with open(fpath, 'w', encoding='utf-8') as f:
+        writeMCQuestions(f, iterMCQuestions(Respondus_table, chunk_size))
+
+
+def writeMCQuestions(f, questions, start=1):
+    '''
+    Writes rendered questions to an open text file, numbering them from start.
+
+    Parameters
+    ----------
+    f : file
+        Text file opened for writing.
+    questions : iterable of (str, str)
+        (head, body) pairs as yielded by iterMCQuestions.
+    start : int
+        Number of the first question.
+
+    Returns
+    -------
+    n : int
+        Number of questions written.
+
+    '''
+    n = 0
+    for n, (head, body) in enumerate(questions, 1):
+        f.write(head + str(start + n - 1) + ') ' + body)
+    return n
+
+
+def iterMCQuestions(Respondus_table, chunk_size=10000):
+    '''
+    Renders the questions in a Respondus table one at a time.
+
+    The "Points:/Title:" headers, feedback lines and lettered choices are
+    precomputed column-wise for each chunk of rows.
+
+    Parameters
+    ----------
+    Respondus_table : QuestionStore, pandas.DataFrame or dict of lists
+        A Respondus-formatted table for all of the questions to format.
+    chunk_size : int
+        Number of questions to precompute at a time.
+
+    Yields
+    ------
+    head : str
+        The "Points:" and "Title:" lines of the question.
+    body : str
+        Everything after the question number: the question wording,
+        feedback and possible answers, including the trailing blank line.
+
+    '''
+    for start in range(0, countRows(Respondus_table), chunk_size):
+        def column(col):
+            return getColumn(
+                Respondus_table, col, start, start + chunk_size)
+
+        # Question text
+        heads = [
+            'Points: ' + str(points) + '\n\n' + 'Title: ' + title + '\n'
+            for points, title in zip(column('Points'), column('Title/ID'))]
+        wordings = [x + '\n\n' for x in column('Question Wording')]
+
+        # Feedback text
+        # General feedback
+        #   Note: Due to quirks with Respondus, there is no general feedback
+        #           allowed in multiple choice questions.
+        #           If general feedback is present in the table, it will be
+        #           overwritten by any Correct and Incorrect Feedback.
+        feedbacks = []
+        for general, correct, incorrect in zip(
+                column('General Feedback'), column('Correct Feedback'),
+                column('Incorrect Feedback')):
+            fb_correct = fb_incorrect = ''
+            if not isBlank(general):
+                fb_correct = fb_incorrect = general
+            if not isBlank(correct):
+                fb_correct = correct
+            if not isBlank(incorrect):
+                fb_incorrect = incorrect
+            # Write the feedback
+            fb_text = ''
+            if fb_correct:
+                fb_text = fb_text + '~ ' + fb_correct + '\n'
+            if fb_incorrect:
+                fb_text = fb_text + '@ ' + fb_incorrect + '\n'
+            if fb_correct or fb_incorrect:
+                fb_text = fb_text + '\n'
+            feedbacks.append(fb_text)
+
+        # Possible answer text
+        answer_texts = []
+        for row in zip(column('Correct Answer'),
+                       *[column(col) for col in choice_columns]):
+            answers = [x for x in row[1:] if not isBlank(x)]
+            # Add a * for correct answers
+            answer_texts.append(''.join([
+                ('*' if n+1 == row[0] else '')
+                + MC_letters[n] + ') ' + answer + '\n'
+                for n, answer in enumerate(answers)]))
+
+        for head, wording, fb_text, ans_text in zip(
+                heads, wordings, feedbacks, answer_texts):
+            yield head, wording + fb_text + ans_text + '\n'
+
+
+####################
+# INCREMENTAL WRITING
+####################
+def hashRows(Respondus_table, start, stop):
+    '''
+    Hashes the rendered columns of rows start:stop of a Respondus table.
+    Two rows with the same hash render to the same question text (apart
+    from the question number). Rows are hashed by the repr of their values,
+    so that empty cells and the text 'None' or 'nan' hash differently. numpy
+    scalars are hashed as the plain values they render the same as, and NaN
+    as an empty cell, so a table read from a CSV file hashes the same as
+    the table it was saved from.
+    '''
+    cols = [map(plainValue, getColumn(Respondus_table, col, start, stop))
+            for col in rendered_columns]
+    return [
+        hashlib.blake2b(repr(row).encode('utf-8'), digest_size=16).hexdigest()
+        for row in zip(*cols)]
+
+
+def plainValue(value):
+    '''
+    Converts a numpy scalar to the plain value it holds, and NaN to None.
+    '''
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def build_MC_bank_incremental(Respondus_table, fpath, chunk_size=10000):
+    '''
+    Generates a Respondus-formatted text file like build_MC_bank, but only
+    renders the questions that changed since the file was last built.
+    
+    A manifest saved beside the text file (fpath + '.manifest.json') records
+    a hash of each question's row in the table and where its rendered text
+    sits in the file. On the next build, questions whose rows hash the same
+    are copied from the old file (with their question number updated)
+    instead of being rendered again. The manifest also records the text
+    file's size, modification time and content hash; if the text file or
+    manifest is missing, or the text file has changed since (such as by a
+    full build_MC_bank or a hand edit), the whole bank is rendered.
+
+    Parameters
+    ----------
+    Respondus_table : QuestionStore, pandas.DataFrame or dict of lists
+        A Respondus-formatted table for all of the questions to format to a
+        text file
+    fpath : str
+        Filepath to save the text file to
+    chunk_size : int
+        Number of questions to hash and render at a time.
+
+    Returns
+    -------
+    n_rendered : int
+        Number of questions that were rendered.
+    n_reused : int
+        Number of questions that were copied from the old file.
+
+    '''
+    manifest_path = fpath + '.manifest.json'
+    newline = os.linesep.encode('utf-8')
+    
+    # Load the old manifest, if it matches the old text file
+    old_questions = {}
+    manifest = loadManifest(fpath)
+    try:
+        # row hash : (offset, length, head length, number length,
+        #   question number - 1)
+        for k, (row_hash, offset, length, head_len, number_len) in (
+                enumerate(manifest['questions'] if manifest else [])):
+            old_questions.setdefault(
+                row_hash, (offset, length, head_len, number_len, k))
+    except (TypeError, ValueError, KeyError):
+        old_questions = {}
+    
+    # Map the old text file, if there is anything to reuse
+    old_file = old_text = None
+    if old_questions and os.path.getsize(fpath):
+        old_file = open(fpath, 'rb')
+        old_text = mmap.mmap(old_file.fileno(), 0, access=mmap.ACCESS_READ)
+    
+    questions = []
+    n_rendered = 0
+    offset = 0
+    run = None      # [start, end] of old text waiting to be copied
+    tmp_path = fpath + '.' + str(os.getpid())
+    try:
+        with open(tmp_path, 'wb') as f:
+            for start in range(0, countRows(Respondus_table), chunk_size):
+                stop = start + chunk_size
+                row_hashes = hashRows(Respondus_table, start, stop)
+                
+                # Render only the rows that aren't in the old file
+                new_rows = [i for i, row_hash in enumerate(row_hashes)
+                            if row_hash not in old_questions]
+                rendered = {}
+                if new_rows:
+                    # (Columns are indexed by position, whatever the index
+                    #   of the table)
+                    cols = {col : list(getColumn(
+                                Respondus_table, col, start, stop))
+                            for col in rendered_columns}
+                    cols = {col : [values[i] for i in new_rows]
+                            for col, values in cols.items()}
+                    rendered = dict(zip(new_rows, iterMCQuestions(cols)))
+                    n_rendered = n_rendered + len(new_rows)
+                
+                for i, row_hash in enumerate(row_hashes):
+                    number = (str(start + i + 1) + ') ').encode('utf-8')
+                    if i in rendered:
+                        head, body = rendered[i]
+                        head = head.encode('utf-8').replace(b'\n', newline)
+                        body = body.encode('utf-8').replace(b'\n', newline)
+                        head_len = len(head)
+                        length = head_len + len(number) + len(body)
+                        run = copyRun(f, old_text, run)
+                        f.write(head + number + body)
+                    else:
+                        old_offset, length, head_len, number_len, k = (
+                            old_questions[row_hash])
+                        if k == start + i:
+                            # Same text and same number: copy it as part of
+                            #   a run of unchanged questions
+                            if run and run[1] == old_offset:
+                                run[1] = old_offset + length
+                            else:
+                                run = copyRun(f, old_text, run)
+                                run = [old_offset, old_offset + length]
+                        else:
+                            # Splice in the old text around the new number
+                            run = copyRun(f, old_text, run)
+                            body = old_text[
+                                old_offset + head_len + number_len:
+                                old_offset + length]
+                            f.write(old_text[old_offset:old_offset + head_len]
+                                    + number + body)
+                            length = head_len + len(number) + len(body)
+                    questions.append(
+                        [row_hash, offset, length, head_len, len(number)])
+                    offset = offset + length
+            copyRun(f, old_text, run)
+    finally:
+        if old_text is not None:
+            old_text.close()
+            old_file.close()
+    os.replace(tmp_path, fpath)
+    
+    # Save the new manifest
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({
+            'size' : offset, 'mtime_ns' : os.stat(fpath).st_mtime_ns,
+            'hash' : hashFile(fpath), 'questions' : questions}))
+    
+    return n_rendered, len(questions) - n_rendered
+
+
+def loadManifest(fpath):
+    '''
+    Returns the incremental build manifest of a Respondus text file (see
+    build_MC_bank_incremental), or None if it is missing or the text file
+    has changed since the manifest was saved. The text file is only hashed
+    if its modification time doesn't match.
+    '''
+    try:
+        with open(fpath + '.manifest.json', encoding='utf-8') as f:
+            manifest = json.load(f)
+        stat = os.stat(fpath)
+        if stat.st_size == manifest['size'] and (
+                stat.st_mtime_ns == manifest['mtime_ns']
+                or hashFile(fpath) == manifest['hash']):
+            return manifest
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def hashFile(fpath):
+    '''
+    Returns a hash of a file's contents.
+    '''
+    blake2b = hashlib.blake2b(digest_size=16)
+    with open(fpath, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            blake2b.update(block)
+    return blake2b.hexdigest()
+
+
+def removeManifest(fpath):
+    '''
+    Removes the incremental build manifest of a Respondus text file (see
+    build_MC_bank_incremental), if it has one. Used when the text file is
+    written some other way.
+    '''
+    try:
+        os.remove(fpath + '.manifest.json')
+    except FileNotFoundError:
+        pass
+
+
+def copyRun(f, old_text, run):
+    '''
+    Writes a run of unchanged old text (see build_MC_bank_incremental) and
+    returns None, the new empty run.
+    '''
+    if run:
+        f.write(old_text[run[0]:run[1]])
+    return None
+
+
+####################
+# READING
+####################
+def parseNumber(value):
+    '''
+    Converts a numeric CSV cell to an int (or a float if it is fractional).
+    Non-numeric cells are returned unchanged.
+    '''
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return value
+    return int(number) if number.is_integer() else number
+
+
+def iterCSVTables(csv_path, chunk_size=10000):
+    '''
+    Reads a Respondus-formatted CSV file (such as the Respondus_*.csv files
+    saved by GenerateQuestionBanks.py) in chunks of rows.
+
+    Parameters
+    ----------
+    csv_path : str
+        Path to the CSV file.
+    chunk_size : int
+        Number of rows per chunk.
+
+    Yields
+    ------
+    table : dict of lists
+        The Respondus columns of the next chunk of rows. Empty cells are None.
+
+    '''
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        while True:
+            rows = list(itertools.islice(reader, chunk_size))
+            if not rows:
+                break
+            table = {}
+            for col in Respondus_columns:
+                if col not in reader.fieldnames:
+                    continue
+                table[col] = [row[col] if row[col] != '' else None
+                              for row in rows]
+            table['Correct Answer'] = [
+                parseNumber(x) for x in table.get('Correct Answer', [])]
+            yield table
+
+
+def csv_to_MC_bank(csv_path, fpath, chunk_size=10000):
+    '''
+    Generates a Respondus-formatted text file from a Respondus-formatted CSV
+    file, using only the standard library. Memory use is bounded by
+    chunk_size.
+
+    Parameters
+    ----------
+    csv_path : str
+        Path to the Respondus-formatted CSV file.
+    fpath : str
+        Filepath to save the text file to.
+    chunk_size : int
+        Number of questions to read and render at a time.
+
+    Returns
+    -------
+    n : int
+        Number of questions written.
+
+    '''
+    with open(fpath, 'w', encoding='utf-8') as f:
+        questions = itertools.chain.from_iterable(
+            iterMCQuestions(table, chunk_size)
+            for table in iterCSVTables(csv_path, chunk_size))
+        return writeMCQuestions(f, questions)
+
+
+####################
+# READING RESPONDUS TEXT
+####################
+def iterMCRecords(fpath):
+    '''
+    Reads the questions in a Respondus text file one at a time, without
+    parsing them.
+    
+    A question starts at each "Points:" line that follows a blank line (or
+    starts the file).
+
+    Parameters
+    ----------
+    fpath : str
+        Path to the Respondus text file.
+
+    Yields
+    ------
+    offset : int
+        Byte offset of the question in the file.
+    record : bytes
+        The question's text, up to the start of the next question.
+
+    '''
+    with open(fpath, 'rb') as f:
+        lines = []
+        start = offset = 0
+        blank = True
+        for line in f:
+            if blank and lines and line.startswith(b'Points: '):
+                yield start, b''.join(lines)
+                lines = []
+                start = offset
+            lines.append(line)
+            offset = offset + len(line)
+            blank = not line.strip()
+        if lines:
+            yield start, b''.join(lines)
+
+
+def parseMCQuestion(record):
+    '''
+    Parses the text of one multiple choice question from a Respondus text
+    file back into its Respondus columns.
+    
+    Feedback is read back the way iterMCQuestions writes it: the same text
+    after ~ and @ becomes the General Feedback, and different texts become
+    the Correct and Incorrect Feedback. Writing the question again with
+    iterMCQuestions gives back the same text.
+
+    Parameters
+    ----------
+    record : bytes or str
+        The question's text, as yielded by iterMCRecords.
+
+    Raises
+    ------
+    ValueError
+        If the text is not a Respondus multiple choice question.
+
+    Returns
+    -------
+    question : dict
+        The question's value for each of the Respondus columns.
+        Empty cells are None.
+
+    '''
+    if isinstance(record, bytes):
+        record = record.decode('utf-8')
+    record = record.replace('\r\n', '\n')
+    match = MC_question_re.match(record)
+    if not match:
+        raise ValueError(
+            'Not a Respondus multiple choice question: ' + repr(record[:80]))
+    
+    question = dict.fromkeys(Respondus_columns)
+    question['Type'] = 'MC'
+    # Keep the points as text if they wouldn't be written back the same way
+    points = parseNumber(match.group('points'))
+    if str(points) != match.group('points'):
+        points = match.group('points')
+    question['Points'] = points
+    question['Title/ID'] = match.group('title')
+    question['Question Wording'] = match.group('wording')
+    
+    # Feedback
+    correct = match.group('correct')
+    incorrect = match.group('incorrect')
+    if correct is not None and correct == incorrect:
+        question['General Feedback'] = correct
+    else:
+        question['Correct Feedback'] = correct
+        question['Incorrect Feedback'] = incorrect
+    
+    # Possible answers
+    for n, (star, answer) in enumerate(
+            MC_answer_re.findall(match.group('answers'))):
+        question[choice_columns[n]] = answer
+        if star:
+            question['Correct Answer'] = n + 1
+    
+    return question
+
+
+def iterMCBank(fpath):
+    '''
+    Reads the questions in a Respondus text file back into their Respondus
+    columns, one question at a time (see parseMCQuestion).
+    '''
+    for offset, record in iterMCRecords(fpath):
+        try:
+            yield parseMCQuestion(record)
+        except ValueError as e:
+            raise ValueError(
+                fpath + ', byte ' + str(offset) + ': ' + str(e)) from None
+
+
+def iterMCTables(fpath, chunk_size=10000):
+    '''
+    Reads a Respondus text file in chunks of questions, as Respondus tables
+    that can be written again with build_MC_bank or iterMCQuestions.
+
+    Parameters
+    ----------
+    fpath : str
+        Path to the Respondus text file.
+    chunk_size : int
+        Number of questions per chunk.
+
+    Yields
+    ------
+    table : dict of lists
+        The Respondus columns of the next chunk of questions.
+        Empty cells are None.
+
+    '''
+    questions = iterMCBank(fpath)
+    while True:
+        rows = list(itertools.islice(questions, chunk_size))
+        if not rows:
+            break
+        yield {col : [row[col] for row in rows] for col in Respondus_columns}
+
+
+def indexMCBank(fpath):
+    '''
+    Finds where each question sits in a Respondus text file, so that single
+    questions can be read with readMCQuestion without parsing the whole file.
+    If the file was built by build_MC_bank_incremental and hasn't changed
+    since, the index is taken from its manifest instead of reading the file.
+
+    Parameters
+    ----------
+    fpath : str
+        Path to the Respondus text file.
+
+    Returns
+    -------
+    index : list of (int, int)
+        The byte offset and length of each question, in order.
+
+    '''
+    manifest = loadManifest(fpath)
+    try:
+        if manifest:
+            return [(q[1], q[2]) for q in manifest['questions']]
+    except (TypeError, KeyError, IndexError):
+        pass
+    return [(offset, len(record)) for offset, record in iterMCRecords(fpath)]
+
+
+def readMCQuestion(fpath, number, index=None):
+    '''
+    Reads a single question from a Respondus text file.
+
+    Parameters
+    ----------
+    fpath : str
+        Path to the Respondus text file.
+    number : int
+        Number of the question (1 for the first question).
+    index : list of (int, int)
+        The file's index, as returned by indexMCBank. If not given, the file
+        is indexed first; pass the index in when reading many questions.
+
+    Returns
+    -------
+    question : dict
+        The question's value for each of the Respondus columns
+        (see parseMCQuestion).
+
+    '''
+    if index is None:
+        index = indexMCBank(fpath)
+    offset, length = index[number - 1]
+    with open(fpath, 'rb') as f:
+        f.seek(offset)
+        return parseMCQuestion(f.read(length))
+
+
+def MC_bank_to_csv(fpath, csv_path):
+    '''
+    Reads a Respondus text file back into a Respondus-formatted CSV file, in
+    the same layout as the Respondus_*.csv files saved by
+    GenerateQuestionBanks.py. Memory use does not grow with the size of the
+    bank.
+
+    Parameters
+    ----------
+    fpath : str
+        Path to the Respondus text file.
+    csv_path : str
+        Path to save the CSV file to.
+
+    Returns
+    -------
+    n : int
+        Number of questions read.
+
+    '''
+    n = 0
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, lineterminator=os.linesep)
+        writer.writerow(Respondus_columns)
+        for question in iterMCBank(fpath):
+            writer.writerow(['' if question[col] is None else question[col]
+                             for col in Respondus_columns])
+            n = n + 1
+    return n
+
+
+#%%
+####################
+# MAIN FUNCTION
+####################
+if __name__ == '__main__':
+    if sys.argv[1].endswith('.txt'):
+        n = MC_bank_to_csv(sys.argv[1], sys.argv[2])
+        print('Read ' + str(n) + ' questions into ' + sys.argv[2])
+    else:
+        n = csv_to_MC_bank(sys.argv[1], sys.argv[2])
+        print('Wrote ' + str(n) + ' questions to ' + sys.argv[2])
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""
+@author: cariefrantz
+
+Settings for a run of GenerateQuestionBanks.py, shared by every copy of it.
+
+These are kept in their own module rather than in GenerateQuestionBanks.py
+because that script can be loaded twice in the same process: once as the
+script being run, and once when a bank type in the QuestionBanks folder
+imports its shared scripts (as happens in worker processes that are
+started fresh, the default on Windows and macOS). Both copies import this
+module, so a setting made by one is seen by the other, and the files saved
+through either one are listed in the same place.
+
+"""
+
+####################
+# VARIABLES
+####################
+# When True (batch mode), nothing prompts the user: input tables must be given
+#   as file paths and a missing difficulty level defaults to 'all'.
+HEADLESS = False
+
+# When True, saveBank only re-renders the questions that changed since the
+#   Respondus text file was last built (see build_MC_bank_incremental)
+INCREMENTAL = False
+
+# When True, saveBank also exports each bank as a QTI package (zip file) that
+#   can be imported straight into Canvas (see QTIExport.py)
+QTI = False
+
+# When True, the embed code in each question is normalized and minified (see
+#   normalizeEmbeds); when False, it is kept exactly as in the input table
+MINIFY_EMBEDS = False
+
+# Paths of the CSV, text and QTI files saved by saveBank in this process
+saved_files = []
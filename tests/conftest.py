@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""
+Shared fixtures for the tests. The scripts are run from the repository
+folder, so it is added to the path here.
+
+"""
+import os
+import csv
+import sys
+
+import pytest
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if repo_dir not in sys.path:
+    sys.path.insert(0, repo_dir)
+
+
+# Small, fixed inputs for the tests. These are kept apart from the synthetic
+#   workloads in Benchmarks.py, so that changing a benchmark doesn't change
+#   what the tests check.
+rock_types = ['mineral', 'sedimentary', 'extrusive igneous',
+              'intrusive igneous', 'metamorphic']
+compositions = ['felsic', 'intermediate', 'mafic']
+difficulties = ['easy', 'moderate', 'hard']
+
+
+def embedCode(i):
+    # Embed code for 3D model number i
+    return ('<iframe title="Rock ' + str(i) + '" frameborder="0" '
+            'allowfullscreen width="640" height="480" '
+            'src="https://sketchfab.com/models/' + format(i, '032x')
+            + '/embed"></iframe>')
+
+
+def writeRockTable(fpath, n = 60):
+    # Rock and mineral 3D model list: the rock types in turn, each block of
+    #   five rows at the next difficulty level
+    with open(fpath, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            ['Type', 'Felsic-Mafic', 'Difficulty', 'Embed', 'Description'])
+        for i in range(n):
+            rock_type = rock_types[i % 5]
+            writer.writerow([
+                rock_type, compositions[i % 3], difficulties[(i // 5) % 3],
+                embedCode(i), 'Sample ' + str(i) + ' is a ' + rock_type
+                + '.'])
+    return fpath
+
+
+def writeGenericTable(fpath, n = 30):
+    # Multiple choice question table, with the difficulty levels in turn
+    with open(fpath, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(
+            ['Question group', 'Difficulty', 'Points', 'Question',
+             'Choice 1', 'Choice 2', 'Choice 3', 'Choice 4', 'Choice 5',
+             'Correct Answer', 'General'])
+        for i in range(n):
+            writer.writerow([
+                'Test questions', difficulties[i % 3], 1,
+                'Question ' + str(i) + '?', 'first ' + str(i),
+                'second ' + str(i), 'third ' + str(i), 'fourth ' + str(i),
+                '', i % 4 + 1, 'Feedback ' + str(i) + '.'])
+    return fpath
+
+
+def makeRespondusTable(n):
+    # Respondus table with five choices and feedback, whose wordings hold
+    #   three different embeds in turn
+    from QuestionStore import QuestionStore
+    Respondus_table = QuestionStore()
+    Respondus_table['Type'] = ['MC'] * n
+    Respondus_table['Title/ID'] = ['Test bank'] * n
+    Respondus_table['Points'] = [1] * n
+    Respondus_table['Question Wording'] = [
+        '[HTML]<p>What kind of rock is this?</p>' + embedCode(i % 3)
+        + '[/HTML]' for i in range(n)]
+    for c, rock_type in enumerate(rock_types):
+        Respondus_table['Choice ' + str(c + 1)] = rock_type
+    Respondus_table['Correct Answer'] = [i % 5 + 1 for i in range(n)]
+    Respondus_table['General Feedback'] = [
+        'Sample ' + str(i) + ' feedback.' for i in range(n)]
+    return Respondus_table
+
+
+@pytest.fixture
+def rocks_csv(tmp_path):
+    return writeRockTable(str(tmp_path / 'rocks.csv'))
+
+
+@pytest.fixture
+def generic_csv(tmp_path):
+    return writeGenericTable(str(tmp_path / 'generic.csv'))
+
+
+@pytest.fixture
+def run_settings():
+    # Restore the run settings after a test changes them
+    import RunSettings
+    saved = (RunSettings.HEADLESS, RunSettings.INCREMENTAL, RunSettings.QTI,
+             RunSettings.MINIFY_EMBEDS, list(RunSettings.saved_files))
+    yield RunSettings
+    (RunSettings.HEADLESS, RunSettings.INCREMENTAL, RunSettings.QTI,
+     RunSettings.MINIFY_EMBEDS, RunSettings.saved_files[:]) = saved
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for Benchmarks.py.
+
+"""
+import os
+
+import Benchmarks
+
+
+def test_bank_cases_parse_their_input(tmp_path, run_settings):
+    # Each bank type case times a parse of the shared input table, not the
+    #   parsed-table cache left by the case before it
+    workdir = str(tmp_path)
+    cache = os.path.join(workdir, '.rocks_50.csv.cache')
+    for bank_type in ['IgneousClassification3D', 'RockOrMineral3D']:
+        Benchmarks.caseFormatBank(bank_type)(50, workdir)
+        assert os.path.exists(cache)
+        os.utime(cache, ns = (0, 0))
+    Benchmarks.caseFormatBank('RockCycleClassification3D')(50, workdir)
+    assert os.stat(cache).st_mtime_ns != 0
+
+
+def test_cases_scale_with_size(tmp_path):
+    # Every case processes about as many questions as asked for
+    cases = Benchmarks.getCases()
+    assert 'format_LogScaleIntensity' not in cases
+    for size in [400, 4000]:
+        items, seconds = cases['generateTemplateBank'][0](
+            size, str(tmp_path))
+        assert 0.9 * size <= items <= size
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for DedupQuestions.py.
+
+"""
+import numpy as np
+
+from DedupQuestions import (
+    clusterPairs, findNearPairs, minHashSignatures, num_perm)
+
+
+def pairSet(pairs, rows = None):
+    if rows is None:
+        rows = np.arange(pairs.max() + 1 if len(pairs) else 0)
+    return {tuple(sorted((int(rows[i]), int(rows[j])))) for i, j in pairs}
+
+
+def clusterSet(roots, rows):
+    clusters = {}
+    for i, root in enumerate(roots):
+        clusters.setdefault(root, set()).add(int(rows[i]))
+    return {frozenset(c) for c in clusters.values()}
+
+
+def test_all_pairs_in_bucket_compared():
+    # Rows 1 and 2 are near duplicates of each other but not of row 0. Every
+    #   band they share is shared with row 0 too, and row 0 sorts first in
+    #   those buckets.
+    rng = np.random.default_rng(0)
+    signatures = rng.integers(0, 2**31, size = (3, num_perm))
+    half = num_perm // 2
+    signatures[1:, :half] = signatures[0, :half]
+    signatures[2, half:] = signatures[1, half:]
+    signatures[2, half::4] += 1
+    assert pairSet(findNearPairs(signatures, 0.8)) == {(1, 2)}
+
+
+def test_pairs_do_not_depend_on_order():
+    words = ['rock', 'mineral', 'granite', 'basalt', 'shale', 'quartz']
+    keys = [' '.join(words[(i + k) % 6] for k in range(5)) + ' ' + str(i)
+            for i in range(40)]
+    signatures = minHashSignatures(keys)
+    expected = pairSet(findNearPairs(signatures, 0.5))
+    assert expected
+    for seed in range(3):
+        rows = np.random.default_rng(seed).permutation(len(keys))
+        found = findNearPairs(signatures[rows], 0.5)
+        assert pairSet(found, rows) == expected
+
+
+def test_repeated_signatures_cluster_the_same():
+    # Questions with the same signature are only indexed once, so which one
+    #   is paired depends on the order, but the clusters do not
+    words = ['rock', 'mineral', 'granite', 'basalt', 'shale', 'quartz']
+    keys = [' '.join(words[(i + k) % 6] for k in range(5)) + ' ' + str(i)
+            for i in range(20)]
+    signatures = minHashSignatures(keys + keys[:5])
+    n = len(signatures)
+    expected = clusterSet(
+        clusterPairs(n, findNearPairs(signatures, 0.5)), range(n))
+    assert len(expected) < 20
+    for seed in range(3):
+        rows = np.random.default_rng(seed).permutation(n)
+        roots = clusterPairs(n, findNearPairs(signatures[rows], 0.5))
+        assert clusterSet(roots, rows) == expected
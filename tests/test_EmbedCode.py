@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for EmbedCode.py.
+
+"""
+import pandas as pd
+
+from EmbedCode import minifyEmbed
+import GenerateQuestionBanks as gqb
+
+
+def test_minify_drops_what_does_not_display():
+    embed = ('<div  class=" model ">\n  <!-- model -->\n  <iframe '
+             'mozallowfullscreen="true" allowfullscreen="true" '
+             'style="width : 100% ; " src="https://x/1"></iframe>\n</div>')
+    assert minifyEmbed(embed) == (
+        '<div class="model"><iframe allowfullscreen style="width:100%" '
+        'src="https://x/1"></iframe></div>')
+
+
+def test_nonbreaking_spaces_are_kept():
+    assert minifyEmbed('<p>a&nbsp;&nbsp;  b</p>') == '<p>a&nbsp;&nbsp; b</p>'
+    assert minifyEmbed('<p> &nbsp; </p>') == '<p>&nbsp;</p>'
+
+
+def test_cdata_and_processing_instructions_are_kept():
+    embed = '<div><![CDATA[ x  y ]]></div><?xml version="1.0"?>'
+    assert minifyEmbed(embed) == embed
+
+
+def test_content_attributes_are_kept():
+    embed = ('<iframe srcdoc="<p>a\n   b</p>" title=" Rock  1 "></iframe>')
+    assert minifyEmbed(embed) == embed
+
+
+def test_empty_alt_and_title_are_kept():
+    # alt="" marks an image as decorative for screen readers
+    embed = '<img src="a.png" alt=""><iframe title="" src="x"></iframe>'
+    assert minifyEmbed(embed) == embed
+
+
+def test_minifying_is_opt_in(run_settings):
+    # Embed code is kept as it is unless minifying is turned on
+    embeds = pd.Series(['<iframe  src="x"></iframe>'] * 2)
+    assert list(gqb.normalizeEmbeds(embeds)) == list(embeds)
+    run_settings.MINIFY_EMBEDS = True
+    assert list(gqb.normalizeEmbeds(embeds)) == [
+        '<iframe src="x"></iframe>'] * 2
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for ExamVariants.py.
+
+"""
+import os
+
+from conftest import makeRespondusTable
+from ExamVariants import saveVariants
+from RespondusText import choice_columns, iterMCBank
+
+
+def readBytes(fpath):
+    with open(fpath, 'rb') as f:
+        return f.read()
+
+
+def correctAnswer(question):
+    return question[choice_columns[int(question['Correct Answer']) - 1]]
+
+
+def makeBank(tmp_path, n = 20):
+    fpath = str(tmp_path / 'bank.csv')
+    makeRespondusTable(n).to_csv(fpath)
+    return fpath
+
+
+def test_variants_are_reproducible(tmp_path):
+    source = makeBank(tmp_path)
+    runs = {}
+    for name, n, processes in [('a', 3, 1), ('b', 3, 2), ('c', 5, 1)]:
+        paths = saveVariants(source, n, seed = 7, processes = processes,
+                             out_dir = str(tmp_path / name))
+        runs[name] = [readBytes(fpath) for fpath in paths]
+    # The same seed gives the same variants, in this process or in workers,
+    #   and variant k does not depend on how many variants are made
+    assert runs['a'] == runs['b'] == runs['c'][:3]
+    assert len(set(runs['c'])) == 5
+    other = saveVariants(source, 3, seed = 8, processes = 1,
+                         out_dir = str(tmp_path / 'd'))
+    assert [readBytes(fpath) for fpath in other] != runs['a']
+    assert os.path.basename(other[0]) == 'bank_001.txt'
+
+
+def test_variants_keep_correct_answers(tmp_path):
+    source = makeBank(tmp_path)
+    originals = list(iterMCBank(saveVariants(
+        source, 1, seed = 0, processes = 1, keep = 5,
+        out_dir = str(tmp_path / 'all'))[0]))
+    for keep in [None, 2]:
+        moved = 0
+        fpath = saveVariants(source, 1, seed = 1, processes = 1, keep = keep,
+                             out_dir = str(tmp_path / str(keep)))[0]
+        for original, question in zip(originals, iterMCBank(fpath)):
+            assert correctAnswer(question) == correctAnswer(original)
+            choices = [question[col] for col in choice_columns
+                       if question[col] is not None]
+            assert len(choices) == (keep or 5)
+            assert set(choices) <= {original[col] for col in choice_columns}
+            moved += question['Correct Answer'] != original['Correct Answer']
+        assert moved
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for GenerateQuestionBanks.py batch runs.
+
+"""
+import os
+import sys
+import subprocess
+
+import numpy as np
+import pytest
+
+import GenerateQuestionBanks as gqb
+from conftest import repo_dir
+
+
+def writeManifest(fpath, rows):
+    with open(fpath, 'w', encoding='utf-8') as f:
+        f.write('BankType,Input,Difficulty,Output\n')
+        for row in rows:
+            f.write(','.join(row) + '\n')
+    return fpath
+
+
+def readOutputs(out_dir, exts = ('.csv', '.txt')):
+    outputs = {}
+    for name in sorted(os.listdir(out_dir)):
+        if name.endswith(exts):
+            with open(os.path.join(out_dir, name), 'rb') as f:
+                outputs[name] = f.read()
+    return outputs
+
+
+def test_parallel_matches_serial(tmp_path, rocks_csv, generic_csv,
+                                 run_settings):
+    # The bank types used here don't draw random answers
+    results = {}
+    for mode in ['serial', 'parallel']:
+        out_dir = tmp_path / mode
+        out_dir.mkdir()
+        manifest = writeManifest(str(tmp_path / (mode + '.csv')), [
+            ('RockOrMineral3D', rocks_csv, 'easy', mode + '/rom'),
+            ('RockCycleClassification3D', rocks_csv, '*', mode + '/rcc'),
+            ('GenericMC', generic_csv, '', mode + '/gen')])
+        if mode == 'serial':
+            gqb.runBatch(manifest, qti = True)
+        else:
+            jobs = gqb.runParallel(manifest, processes = 2, qti = True)
+            for job in jobs:
+                assert job['Files'], job
+                assert any(f.endswith('.zip') for f in job['Files'])
+        results[mode] = readOutputs(str(out_dir))
+    assert results['serial'] == results['parallel']
+    assert len(results['serial']) == 12
+
+
+def test_spawned_workers_share_settings(tmp_path, rocks_csv, generic_csv):
+    # Workers started fresh load a second copy of GenerateQuestionBanks;
+    #   the run settings and saved files must still reach the bank types
+    (tmp_path / 'out').mkdir()
+    manifest = writeManifest(str(tmp_path / 'manifest.csv'), [
+        ('RockOrMineral3D', rocks_csv, 'easy', 'out/rom'),
+        ('GenericMC', generic_csv, '', 'out/gen')])
+    script = os.path.join(repo_dir, 'GenerateQuestionBanks.py')
+    runner = tmp_path / 'run_spawn.py'
+    runner.write_text(
+        'import sys, multiprocessing\n'
+        "if __name__ == '__main__':\n"
+        "    multiprocessing.set_start_method('spawn')\n"
+        '    sys.path.insert(0, ' + repr(repo_dir) + ')\n'
+        '    sys.argv = [' + repr(script) + '] + sys.argv[1:]\n'
+        '    __file__ = ' + repr(script) + '\n'
+        '    exec(compile(open(__file__).read(), __file__, "exec"))\n')
+    subprocess.run(
+        [sys.executable, str(runner), '--batch', manifest, '--parallel',
+         '--processes', '2', '--qti', '--variants', '2', '--seed', '1'],
+        cwd = str(tmp_path), check = True, capture_output = True)
+    names = set(os.listdir(tmp_path / 'out'))
+    assert {'rom.zip', 'gen.zip', 'rom_variants', 'gen_variants'} <= names
+    assert sorted(os.listdir(tmp_path / 'out' / 'rom_variants')) == [
+        'rom_001.txt', 'rom_001.zip', 'rom_002.txt', 'rom_002.zip']
+
+
+def test_expanded_levels_keep_their_own_rows(tmp_path, rocks_csv,
+                                             run_settings):
+    # Every level found in the data (not just easy and moderate) gets only
+    #   its own rows
+    import pandas as pd
+    manifest = writeManifest(str(tmp_path / 'manifest.csv'), [
+        ('RockOrMineral3D', rocks_csv, '*', 'rom')])
+    gqb.runBatch(manifest)
+    levels = pd.read_csv(rocks_csv)['Difficulty'].value_counts()
+    assert len(pd.read_csv(str(tmp_path / 'rom_all.csv'))) == 60
+    for level in ['easy', 'moderate', 'hard']:
+        bank = pd.read_csv(str(tmp_path / ('rom_' + level + '.csv')))
+        assert len(bank) == levels[level]
+        assert set(bank['Title/ID']) == {'Rock or mineral? Level ' + level}
+
+
+def test_trimDifficulty():
+    import pandas as pd
+    table = pd.DataFrame({'Difficulty' : ['easy', 'hard', 'hard', 'expert'],
+                          'Type' : list('abcd')})
+    assert list(gqb.trimDifficulty(table, 'hard')['Type']) == ['b', 'c']
+    assert list(gqb.trimDifficulty(table, 'expert')['Type']) == ['d']
+    assert len(gqb.trimDifficulty(table, 'all')) == 4
+    assert len(gqb.trimDifficulty(table, None)) == 4
+
+
+def test_answer_sets_follow_global_seed():
+    # Without an rng, answer sets are drawn from numpy's global random
+    #   state, like genRandomAnswerSet
+    answers = ['a', 'b', 'c', 'd', 'e', 'f']
+    draws = []
+    for k in range(2):
+        np.random.seed(5)
+        choices, i = gqb.genRandomAnswerSets(answers, ['c'] * 50, 3)
+        draws.append(choices.tolist())
+    assert draws[0] == draws[1]
+    assert len({tuple(row) for row in draws[0]}) > 1
+
+
+def test_seeded_batch_is_reproducible(tmp_path, run_settings):
+    outputs = []
+    for mode in ['serial', 'parallel', 'again']:
+        (tmp_path / mode).mkdir()
+        manifest = writeManifest(str(tmp_path / (mode + '.csv')), [
+            ('LogScaleIntensity', '', '', mode + '/log')])
+        if mode == 'parallel':
+            gqb.runParallel(manifest, processes = 2, seed = 4)
+        else:
+            gqb.runBatch(manifest, seed = 4)
+        outputs.append(readOutputs(str(tmp_path / mode)))
+    assert outputs[0] == outputs[1] == outputs[2]
+    assert len(outputs[0]) == 4
+
+
+def test_batch_restores_settings(tmp_path, generic_csv, run_settings):
+    # An interactive session is not left headless by a batch run, even one
+    #   that fails
+    manifest = writeManifest(str(tmp_path / 'manifest.csv'), [
+        ('GenericMC', generic_csv, '', 'gen')])
+    gqb.runBatch(manifest, incremental = True, qti = True,
+                 minify_embeds = True)
+    assert (run_settings.HEADLESS, run_settings.INCREMENTAL,
+            run_settings.QTI, run_settings.MINIFY_EMBEDS) == (
+                False, False, False, False)
+    bad = writeManifest(str(tmp_path / 'bad.csv'), [
+        ('GenericMC', str(tmp_path / 'missing.csv'), '', 'gen')])
+    with pytest.raises(FileNotFoundError):
+        gqb.runBatch(bad)
+    assert not run_settings.HEADLESS
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the GenericMC bank type.
+
+"""
+import os
+
+import pandas as pd
+
+import GenerateQuestionBanks as gqb
+from conftest import writeGenericTable
+
+
+def test_streamed_titles_match_loaded(tmp_path, run_settings):
+    # The title and points come from the first row of the whole table, not
+    #   from the first row of each chunk
+    fpath = str(tmp_path / 'generic.csv')
+    writeGenericTable(fpath, 12)
+    table = pd.read_csv(fpath)
+    table['Question group'] = ['Group ' + str(i) for i in range(len(table))]
+    table['Points'] = range(1, len(table) + 1)
+    table.to_csv(fpath, index = False)
+    
+    run_settings.HEADLESS = True
+    format_GenericMC = gqb.getBankType('GenericMC')
+    outputs = {}
+    for chunksize in [None, 5]:
+        out_path = str(tmp_path / ('out_' + str(chunksize)))
+        format_GenericMC(input_file = fpath, difficulty = 'all',
+                         out_path = out_path, chunksize = chunksize)
+        outputs[chunksize] = pd.read_csv(out_path + '.csv')
+    loaded, streamed = outputs[None], outputs[5]
+    assert set(loaded['Title/ID']) == {'Group 0 Level all'}
+    assert set(loaded['Points']) == {1}
+    pd.testing.assert_frame_equal(loaded, streamed)
+
+
+def test_saved_under_own_name(generic_csv, run_settings):
+    run_settings.HEADLESS = True
+    gqb.getBankType('GenericMC')(input_file = generic_csv, difficulty = 'all')
+    names = os.listdir(os.path.dirname(generic_csv))
+    assert 'Respondus_GenericMC.txt' in names
+    assert 'Respondus_RockCycleClassification.txt' not in names
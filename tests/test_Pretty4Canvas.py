@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for Pretty4Canvas.py.
+
+"""
+import os
+
+import Pretty4Canvas as p4c
+
+
+def writeDoc(tmp_path, text, name = 'doc.html'):
+    fpath = str(tmp_path / name)
+    with open(fpath, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return fpath
+
+
+def readPages(filepath):
+    out_dir = os.path.splitext(filepath)[0] + '_pages'
+    pages = {}
+    for name in sorted(os.listdir(out_dir)):
+        if name.startswith('.'):
+            continue
+        with open(os.path.join(out_dir, name), encoding='utf-8') as f:
+            pages[name] = f.read()
+    return pages
+
+
+doc = '''<p>Introduction to the lab.</p>
+<h1>A. First</h1>
+<p>First tab text.</p>
+<h1>B. Second</h1>
+<h2>Part one</h2>
+<p>''' + 'x' * 300 + '''</p>
+<h2>Part two</h2>
+<p>''' + 'y' * 300 + '''</p>
+<p>final paragraph of the document</p>'''
+
+
+def test_pages_keep_the_whole_document(tmp_path):
+    fpath = writeDoc(tmp_path, doc)
+    p4c.convert_file(fpath, ask = False, table_cache = False, pages = True)
+    pages = readPages(fpath)
+    assert list(pages) == ['00_index.txt', '01_a-first.txt',
+                           '02_b-second.txt']
+    assert 'Introduction to the lab.' in pages['00_index.txt']
+    assert 'href="b-second"' in pages['00_index.txt']
+    assert pages['02_b-second.txt'].endswith(
+        '<p>final paragraph of the document</p>')
+    # Put together, the pages are the whole document
+    assert pages['00_index.txt'].startswith(
+        '<p>Introduction to the lab.</p>\n')
+    body = ''.join(pages[name] for name in list(pages)[1:])
+    assert body == p4c.rewrite_tags(doc, p4c.compile_rules(
+        p4c.header_shift, p4c.strip_tags)).split('\n', 1)[1]
+
+
+def test_pages_without_tabs_keep_the_last_line(tmp_path):
+    fpath = writeDoc(tmp_path, '<p>One</p>\n<p>Last</p>')
+    p4c.convert_file(fpath, ask = False, table_cache = False, pages = True)
+    assert '<p>Last</p>' in readPages(fpath)['00_index.txt']
+
+
+def test_pages_split_at_h3_over_budget(tmp_path):
+    fpath = writeDoc(tmp_path, doc)
+    p4c.convert_file(fpath, ask = False, table_cache = False, pages = True,
+                     budget = 400)
+    pages = readPages(fpath)
+    # The heading and Part one fit together; Part two goes on its own page
+    assert list(pages) == [
+        '00_index.txt', '01_a-first.txt', '02_b-second-1-of-2.txt',
+        '03_b-second-2-of-2.txt']
+    assert '<h3>Part one</h3>' in pages['02_b-second-1-of-2.txt']
+    assert pages['03_b-second-2-of-2.txt'].startswith('<h3>Part two</h3>')
+    assert pages['03_b-second-2-of-2.txt'].endswith(
+        '<p>final paragraph of the document</p>')
+
+
+def test_pages_only_replace_their_own_files(tmp_path):
+    # Pages from an earlier run that this run doesn't save are removed, but
+    #   files made by hand are kept
+    fpath = writeDoc(tmp_path, doc)
+    p4c.convert_file(fpath, ask = False, table_cache = False, pages = True,
+                     budget = 400)
+    out_dir = os.path.splitext(fpath)[0] + '_pages'
+    writeDoc(tmp_path, 'notes', os.path.join('doc_pages', '05_notes.txt'))
+    p4c.convert_file(fpath, ask = False, table_cache = False, pages = True)
+    assert list(readPages(fpath)) == [
+        '00_index.txt', '01_a-first.txt', '02_b-second.txt', '05_notes.txt']
+    assert os.path.exists(os.path.join(out_dir, '05_notes.txt'))
+
+
+def test_big_sections_split_at_smaller_headers(tmp_path, capsys):
+    # Part one is over the budget on its own, so it is split at its h4
+    #   headers; the paragraph after them can't be split and is warned about
+    big = doc.replace('<h2>Part two</h2>', '<h3>Detail</h3>\n<p>' + 'z' * 300
+                      + '</p>\n<h3>More</h3>\n<p>' + 'w' * 900
+                      + '</p>\n<h2>Part two</h2>')
+    fpath = writeDoc(tmp_path, big)
+    p4c.convert_file(fpath, ask = False, table_cache = False, pages = True,
+                     budget = 400)
+    pages = readPages(fpath)
+    assert len(pages) == 6
+    assert pages['04_b-second-3-of-4.txt'].startswith('<h4>More</h4>')
+    assert all(len(text.encode('utf-8')) <= 400
+               for name, text in pages.items()
+               if name not in ['00_index.txt', '04_b-second-3-of-4.txt'])
+    assert 'Warning: page "B. Second (3 of 4)"' in capsys.readouterr().out
+
+
+gdocs_table = '''<h1>A. Data</h1>
+<table><tbody>
+<tr><td><p><span style="font-weight:700">Mineral</span></p></td>
+<td><p><span style="font-weight:700">Hardness</span></p></td></tr>
+<tr><td><p><span style="font-weight:400">Quartz</span></p></td>
+<td><p><span style="font-weight:400">7</span></p></td></tr>
+<tr><td><p><span style="font-weight:400">Talc</span></p></td>
+<td><p><span style="font-weight:400">1</span></p></td></tr>
+</tbody></table>
+'''
+
+layout_table = '''<h1>A. Layout</h1>
+<table><tr><td>Name</td><td>Photo</td></tr>
+<tr><td>Read the lab handout</td><td>Then go</td></tr></table>
+'''
+
+
+def convertTables(tmp_path, text, **kwargs):
+    fpath = writeDoc(tmp_path, text)
+    p4c.convert_file(fpath, ask = False, **kwargs)
+    with open(p4c.output_path(fpath), encoding='utf-8') as f:
+        return fpath, f.read()
+
+
+def test_bold_spans_mark_a_header_row(tmp_path):
+    # Google Docs marks bold with spans, which are stripped from the output
+    fpath, html = convertTables(tmp_path, gdocs_table)
+    assert 'span' not in html
+    assert html.count('</th>') == 2
+    decision, = p4c.load_table_cache(fpath).values()
+    assert decision['header'] and decision['score'] >= 3
+
+
+def test_unsure_layout_table_is_left_alone(tmp_path):
+    fpath, html = convertTables(tmp_path, layout_table)
+    assert '<th' not in html
+    decision, = p4c.load_table_cache(fpath).values()
+    assert not decision['header'] and abs(decision['score']) < 3
+
+
+def test_unsure_table_is_asked_about(tmp_path, monkeypatch):
+    questions = []
+    monkeypatch.setattr('builtins.input',
+                        lambda q = '': questions.append(q) or 'Y')
+    fpath = writeDoc(tmp_path, layout_table)
+    p4c.convert_file(fpath, ask = True)
+    monkeypatch.setattr(p4c, 'ask_tables', False)
+    assert len(questions) == 1 and 'Name | Photo' in questions[0]
+    decision, = p4c.load_table_cache(fpath).values()
+    assert decision['header'] and decision['by'] == 'user'
+
+
+def test_cached_decision_is_reused(tmp_path):
+    fpath, html = convertTables(tmp_path, gdocs_table)
+    decisions = p4c.load_table_cache(fpath)
+    for decision in decisions.values():
+        decision['header'] = False
+    p4c.save_table_cache(fpath, decisions)
+    fpath, html = convertTables(tmp_path, gdocs_table)
+    assert '<th' not in html
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for QTIExport.py.
+
+"""
+import re
+import zipfile
+
+from conftest import makeRespondusTable
+from QTIExport import build_QTI_package
+
+
+def readPackage(fpath):
+    with zipfile.ZipFile(fpath) as zf:
+        return {name : zf.read(name).decode('utf-8')
+                for name in zf.namelist()}
+
+
+def assessmentIdent(files):
+    return re.search(r'<resource identifier="(\w+)" type="imsqti',
+                     files['imsmanifest.xml']).group(1)
+
+
+def test_package_contents(tmp_path):
+    fpath = str(tmp_path / 'bank.zip')
+    n, n_embeds = build_QTI_package(makeRespondusTable(12), fpath)
+    files = readPackage(fpath)
+    ident = assessmentIdent(files)
+    xml = files[ident + '/' + ident + '.xml']
+    assert n == 12 and xml.count('<item ident=') == 12
+    # Each embed is saved once and linked from its questions
+    embeds = [name for name in files if name.startswith('web_resources/')]
+    assert len(embeds) == n_embeds > 0
+    assert '&lt;iframe src=&quot;$IMS-CC-FILEBASE$/embeds/' in xml
+
+
+def test_same_title_banks_do_not_collide(tmp_path):
+    # Banks saved under the same name at different difficulty levels, or
+    #   from different files, get different identifiers
+    idents = set()
+    for level in ['easy', 'hard']:
+        for folder in ['a', 'b']:
+            (tmp_path / (folder + level)).mkdir()
+            table = makeRespondusTable(4)
+            table['Title/ID'] = ['Bank Level ' + level] * 4
+            fpath = str(tmp_path / (folder + level) / 'Respondus_Bank.zip')
+            build_QTI_package(table, fpath, title = 'Respondus_Bank')
+            idents.add(assessmentIdent(readPackage(fpath)))
+    assert len(idents) == 4
+    # The same bank gets the same identifier each time it is exported
+    build_QTI_package(table, fpath, title = 'Respondus_Bank')
+    assert assessmentIdent(readPackage(fpath)) in idents
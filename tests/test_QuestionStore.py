@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for QuestionStore.py.
+
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from QuestionStore import QuestionStore
+
+
+def test_numpy_scalars_fill_column():
+    # numpy scalars (as from DataFrame.iloc) fill the whole column like
+    #   plain values, rather than being read as a sequence
+    table = QuestionStore()
+    table['Type'] = ['MC'] * 3
+    table['Points'] = np.int64(2)
+    table['Title/ID'] = np.str_('Bank')
+    table['Correct Answer'] = np.array([1, 2, 3])
+    assert table['Points'] == [2, 2, 2]
+    assert type(table['Points'][0]) is int
+    assert table['Title/ID'] == ['Bank'] * 3
+    assert table['Correct Answer'] == [1, 2, 3]
+    # The same value is interned once whatever its numpy type
+    table['Choice 1'] = pd.Series([2, 2, 2])
+    assert table._data['Choice 1'] == table._data['Points']
+
+
+def test_length_mismatch():
+    table = QuestionStore()
+    table['Type'] = ['MC'] * 3
+    table['Choice 1'] = (x for x in 'abc')
+    assert table['Choice 1'] == ['a', 'b', 'c']
+    with pytest.raises(ValueError):
+        table['Choice 2'] = ['a', 'b']
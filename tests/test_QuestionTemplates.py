@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for QuestionTemplates.py and the LogScaleIntensity bank type.
+
+"""
+import inspect
+
+import pytest
+
+import GenerateQuestionBanks as gqb
+from QuestionTemplates import LogScaleTemplates, drawParameters
+
+
+def test_dropped_questions_warn():
+    # Steps of 4 are never valid from a first magnitude of 6.0 or more
+    template = dict(LogScaleTemplates['Amplitude'],
+                    parameters = {'x1' : [6.0, 6.5], 'step' : [4]})
+    with pytest.warns(UserWarning, match = '6 of 6 questions'):
+        params = drawParameters(template, n = 3, rng = 0, max_tries = 2)
+    assert len(params['x1']) == 0
+
+
+def test_valid_questions_are_all_kept():
+    params = drawParameters(LogScaleTemplates['Amplitude'], n = 5, rng = 0)
+    assert len(params['x1']) == 200
+    assert (params['x2'] < 10).all()
+
+
+def test_log_scale_arguments_match_other_bank_types(tmp_path, run_settings):
+    # Positional arguments line up with the other format_* scripts
+    format_LogScaleIntensity = gqb.getBankType('LogScaleIntensity')
+    format_GenericMC = gqb.getBankType('GenericMC')
+    names = list(inspect.signature(format_LogScaleIntensity).parameters)
+    assert names[:4] == list(
+        inspect.signature(format_GenericMC).parameters)
+    texts = []
+    for k in range(2):
+        out_path = str(tmp_path / ('bank' + str(k)))
+        format_LogScaleIntensity(None, None, out_path, None, seed = 3)
+        with open(out_path + '_Energy.txt', 'rb') as f:
+            texts.append(f.read())
+    assert texts[0] == texts[1]
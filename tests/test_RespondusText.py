@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for RespondusText.py.
+
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from RespondusText import (
+    MC_bank_to_csv, build_MC_bank, build_MC_bank_incremental, csv_to_MC_bank,
+    iterMCBank, readMCQuestion)
+
+
+def makeTable(n, tag = ''):
+    return pd.DataFrame({
+        'Type' : ['MC'] * n,
+        'Title/ID' : ['Bank'] * n,
+        'Points' : [1] * n,
+        'Question Wording' : ['Question ' + str(i) + tag for i in range(n)],
+        'Correct Answer' : [i % 3 + 1 for i in range(n)],
+        'Choice 1' : ['a' + str(i) for i in range(n)],
+        'Choice 2' : ['b' + str(i) for i in range(n)],
+        'Choice 3' : ['c' + str(i) for i in range(n)],
+        'General Feedback' : ['Feedback ' + str(i) for i in range(n)]})
+
+
+def fullBuild(table, fpath):
+    build_MC_bank(table, fpath)
+    with open(fpath, 'rb') as f:
+        return f.read()
+
+
+def readBytes(fpath):
+    with open(fpath, 'rb') as f:
+        return f.read()
+
+
+def test_incremental_dataframe_past_first_chunk(tmp_path):
+    fpath = str(tmp_path / 'bank.txt')
+    table = makeTable(25)
+    build_MC_bank_incremental(table, fpath, chunk_size = 10)
+    # Change questions in the later chunks
+    table.loc[12, 'Question Wording'] = 'Changed 12'
+    table.loc[24, 'Choice 1'] = 'changed'
+    n_rendered, n_reused = build_MC_bank_incremental(
+        table, fpath, chunk_size = 10)
+    assert (n_rendered, n_reused) == (2, 23)
+    assert readBytes(fpath) == fullBuild(table, str(tmp_path / 'full.txt'))
+
+
+def test_incremental_without_range_index(tmp_path):
+    fpath = str(tmp_path / 'bank.txt')
+    table = makeTable(8)
+    table.index = [100 + 3 * i for i in range(8)]
+    build_MC_bank_incremental(table, fpath, chunk_size = 5)
+    table.iloc[6, table.columns.get_loc('Question Wording')] = 'Changed'
+    assert build_MC_bank_incremental(table, fpath, chunk_size = 5) == (1, 7)
+    assert readBytes(fpath) == fullBuild(table, str(tmp_path / 'full.txt'))
+
+
+def test_full_build_invalidates_manifest(tmp_path):
+    # A same-size rebuild by build_MC_bank must not be spliced from
+    fpath = str(tmp_path / 'bank.txt')
+    build_MC_bank_incremental(makeTable(6, 'x'), fpath)
+    build_MC_bank(makeTable(6, 'y'), fpath)
+    assert not os.path.exists(fpath + '.manifest.json')
+    assert build_MC_bank_incremental(makeTable(6, 'x'), fpath) == (6, 0)
+    assert readBytes(fpath) == fullBuild(
+        makeTable(6, 'x'), str(tmp_path / 'full.txt'))
+
+
+def test_hand_edit_is_not_reused(tmp_path):
+    fpath = str(tmp_path / 'bank.txt')
+    table = makeTable(6)
+    build_MC_bank_incremental(table, fpath)
+    text = readBytes(fpath)
+    with open(fpath, 'wb') as f:
+        f.write(text.replace(b'Question 3', b'Qu3stion 3'))
+    assert build_MC_bank_incremental(table, fpath) == (6, 0)
+    assert readBytes(fpath) == text
+
+
+def test_unchanged_rebuild_reuses_everything(tmp_path):
+    fpath = str(tmp_path / 'bank.txt')
+    table = makeTable(6)
+    build_MC_bank_incremental(table, fpath)
+    assert build_MC_bank_incremental(table, fpath) == (0, 6)
+    assert readBytes(fpath) == fullBuild(table, str(tmp_path / 'full.txt'))
+
+
+def test_numpy_values_reuse_plain_rows(tmp_path):
+    # Values that render the same hash the same, whatever their type: numpy
+    #   scalars and plain values, and NaN and None for empty cells
+    fpath = str(tmp_path / 'bank.txt')
+    table = makeTable(6)
+    table['Correct Feedback'] = [None, 'Right', None, None, None, None]
+    build_MC_bank_incremental(table.to_dict('list'), fpath)
+    arrays = {col : np.array(values) for col, values in table.items()}
+    table['Correct Feedback'] = [np.nan, 'Right'] + [np.nan] * 4
+    assert build_MC_bank_incremental(table, fpath) == (0, 6)
+    assert build_MC_bank_incremental(arrays, fpath) == (0, 6)
+    assert readBytes(fpath) == fullBuild(table, str(tmp_path / 'full.txt'))
+
+
+def test_index_checks_manifest(tmp_path):
+    # An edit that keeps the file size moves the questions, so the offsets
+    #   in the manifest can't be used
+    fpath = str(tmp_path / 'bank.txt')
+    build_MC_bank_incremental(makeTable(6), fpath)
+    text = readBytes(fpath)
+    with open(fpath, 'wb') as f:
+        f.write(text.replace(b'Question 1\n', b'Question 1 edited\n')
+                .replace(b'~ Feedback 4\n', b'~ F 4\n'))
+    assert os.path.getsize(fpath) == len(text)
+    question = readMCQuestion(fpath, 3)
+    assert question['Question Wording'] == 'Question 2'
+
+
+def test_text_csv_round_trip(tmp_path):
+    # Respondus text -> CSV -> Respondus text gives back the same file, and
+    #   the questions are read back with the values they were written with
+    table = makeTable(7)
+    table['Points'] = pd.Series([1, 2, 0.5, 1, 1, 3, 1], dtype = object)
+    table['Choice 4'] = [None, 'd1', None, 'd3', None, None, 'd6']
+    table.loc[2, 'General Feedback'] = None
+    table['Correct Feedback'] = [None, None, 'Right', None, None, None, None]
+    table['Incorrect Feedback'] = [None, None, 'Wrong', None, None, None,
+                                   None]
+    fpath = str(tmp_path / 'bank.txt')
+    text = fullBuild(table, fpath)
+    csv_path = str(tmp_path / 'bank.csv')
+    assert MC_bank_to_csv(fpath, csv_path) == 7
+    again = str(tmp_path / 'again.txt')
+    assert csv_to_MC_bank(csv_path, again) == 7
+    assert readBytes(again) == text
+
+    questions = list(iterMCBank(fpath))
+    for i, question in enumerate(questions):
+        for col in ['Title/ID', 'Points', 'Question Wording',
+                    'Correct Answer', 'Choice 1', 'Choice 4',
+                    'General Feedback', 'Correct Feedback']:
+            expected = table.loc[i, col]
+            assert question[col] == (None if pd.isna(expected)
+                                     else expected), (i, col)
+    assert type(questions[0]['Points']) is int